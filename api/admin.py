@@ -1,3 +1,16 @@
 from django.contrib import admin
+from api.models import OutgoingEmail, JobRun
 
 # Register your models here.
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'started_at', 'duration_ms', 'metrics')
+    list_filter = ('name', 'status')
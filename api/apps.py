@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api import instrumentation, scheduler  # noqa: F401 (scheduler registers its system check)
+        from news_ique.db import track_connections
+
+        track_connections()
+        instrumentation.install()
@@ -0,0 +1,382 @@
+"""
+Per-route request instrumentation.
+
+``InstrumentationMiddleware`` times every request and attributes it to its
+route name (the URL name, e.g. ``public_articles-homepage`` or
+``article-review-list``). It records:
+
+- wall time of the whole request,
+- number and total time of DB queries (every connection gets an execute
+  wrapper when it is opened, so queries made from sync_to_async threads count
+  towards the request too),
+- serialize time: building ``serializer.data`` from model instances, less any
+  DB queries that runs (install() wraps DRF's ``BaseSerializer.data``),
+- render time: turning ``response.data`` into the response body,
+- response size.
+
+Each response carries a ``Server-Timing`` header with these numbers. Totals
+are kept in process memory (``registry``). ``prometheus_text()`` renders them
+for ``GET /api/v1/ops/metrics``, and ``summary()`` returns a rolling JSON view
+for ``GET /api/v1/ops/metrics/summary``. Queries slower than
+``INSTRUMENTATION['SLOW_QUERY_MS']`` are sampled with their SQL normalized:
+literals become ``?`` and ``IN`` lists collapse, so repeats of the same
+statement group together. Prometheus only gets a short fingerprint of each
+statement as its label; the summary maps fingerprints to the SQL.
+"""
+import hashlib
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'SLOW_QUERY_MS': 100,
+    'SLOW_QUERY_SAMPLE_RATE': 1.0,
+    'MAX_SLOW_QUERIES': 200,
+    # Recent request durations kept per route for the percentiles in summary()
+    'WINDOW': 500,
+}
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BACKGROUND_ROUTE = 'background'
+UNMATCHED_ROUTE = 'unmatched'
+
+_current = ContextVar('instrumented_request', default=None)
+_serializing = ContextVar('serializing', default=False)
+
+
+def instrumentation_setting(name):
+    return getattr(settings, 'INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Strip literals and parameter lists so the same statement always normalizes the same way."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def sql_fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+class RequestTimings:
+    __slots__ = ('started', 'queries', 'db_ms', 'serialize_ms', 'render_started', 'render_ms', 'slow_queries')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.serialize_ms = 0.0
+        self.render_started = None
+        self.render_ms = 0.0
+        self.slow_queries = []
+
+
+class RouteStats:
+    def __init__(self, window):
+        self.requests = 0
+        self.errors = 0
+        self.by_status = defaultdict(int)
+        self.duration_s = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = 0
+        self.db_s = 0.0
+        self.serialize_s = 0.0
+        self.render_s = 0.0
+        self.response_bytes = 0
+        self.max_ms = 0.0
+        self.recent_ms = deque(maxlen=window)
+
+
+class Registry:
+    """Process-wide totals per (route, method) and the slow query sample."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.routes = {}
+        self.slow_queries = {}
+        self.started_at = time.time()
+
+    def record_request(self, route, method, status, duration_ms, timings, response_bytes):
+        with self.lock:
+            stats = self.routes.get((route, method))
+            if stats is None:
+                stats = self.routes[(route, method)] = RouteStats(instrumentation_setting('WINDOW'))
+            stats.requests += 1
+            stats.errors += status >= 500
+            stats.by_status[f"{status // 100}xx"] += 1
+            stats.duration_s += duration_ms / 1000
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration_ms / 1000 <= bound:
+                    stats.buckets[index] += 1
+            stats.queries += timings.queries
+            stats.db_s += timings.db_ms / 1000
+            stats.serialize_s += timings.serialize_ms / 1000
+            stats.render_s += timings.render_ms / 1000
+            stats.response_bytes += response_bytes or 0
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.recent_ms.append(duration_ms)
+        for sql, duration in timings.slow_queries:
+            self.record_slow_query(sql, duration, route)
+
+    def record_slow_query(self, sql, duration_ms, route):
+        normalized = normalize_sql(sql)
+        with self.lock:
+            entry = self.slow_queries.get(normalized)
+            if entry is None:
+                if len(self.slow_queries) >= instrumentation_setting('MAX_SLOW_QUERIES'):
+                    # Make room by forgetting the statement with the least total time
+                    cheapest = min(self.slow_queries, key=lambda key: self.slow_queries[key]['total_ms'])
+                    del self.slow_queries[cheapest]
+                entry = self.slow_queries[normalized] = {
+                    'fingerprint': sql_fingerprint(normalized), 'sql': normalized, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'routes': set(),
+                }
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['routes'].add(route)
+
+
+registry = Registry()
+
+
+def instrument_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every DB connection (see install())."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        timings = _current.get()
+        if timings is not None:
+            timings.queries += 1
+            timings.db_ms += duration_ms
+        if (
+            duration_ms >= instrumentation_setting('SLOW_QUERY_MS')
+            and random.random() < instrumentation_setting('SLOW_QUERY_SAMPLE_RATE')
+        ):
+            if timings is not None:
+                # The route is only known once the request is resolved; recorded with it
+                timings.slow_queries.append((sql, duration_ms))
+            else:
+                registry.record_slow_query(sql, duration_ms, BACKGROUND_ROUTE)
+
+
+def _wrap_connection(sender, connection, **kwargs):
+    if instrument_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(instrument_query)
+
+
+def timed_serializer_data(data):
+    """Wrap a serializer ``data`` getter so building it counts as serialize time (queries it runs excepted)."""
+    def timed(serializer):
+        timings = _current.get()
+        if timings is None or _serializing.get():
+            # Outside a request, or nested inside a serializer already being timed
+            return data(serializer)
+        token = _serializing.set(True)
+        started, db_ms = time.perf_counter(), timings.db_ms
+        try:
+            return data(serializer)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            timings.serialize_ms += max(0.0, elapsed - (timings.db_ms - db_ms))
+            _serializing.reset(token)
+    timed.instrumented = True
+    return timed
+
+
+def install():
+    """Instrument every DB connection opened from now on and serializer output; called once from ApiConfig.ready()."""
+    connection_created.connect(_wrap_connection, dispatch_uid='api.instrumentation.install')
+    # Serializer.data and ListSerializer.data both build their output through BaseSerializer.data
+    if not getattr(BaseSerializer.data.fget, 'instrumented', False):
+        BaseSerializer.data = property(timed_serializer_data(BaseSerializer.data.fget))
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED_ROUTE
+    return match.url_name or match.view_name or UNMATCHED_ROUTE
+
+
+def response_size(response):
+    if getattr(response, 'streaming', False):
+        return None
+    return len(response.content)
+
+
+class InstrumentationMiddleware:
+    """Time each request per route and add a Server-Timing header (see module docstring)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = instrumentation_setting('ENABLED')
+        self.server_timing = instrumentation_setting('SERVER_TIMING')
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook; time that step
+        timings = _current.get()
+        if timings is not None:
+            timings.render_started = time.perf_counter()
+
+            def rendered(response):
+                timings.render_ms = (time.perf_counter() - timings.render_started) * 1000
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, timings):
+        duration_ms = (time.perf_counter() - timings.started) * 1000
+        registry.record_request(
+            route_name(request), request.method, response.status_code, duration_ms, timings, response_size(response),
+        )
+        if self.server_timing:
+            app_ms = max(0.0, duration_ms - timings.db_ms - timings.serialize_ms - timings.render_ms)
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={timings.db_ms:.1f};desc="{timings.queries} queries"',
+                f'app;dur={app_ms:.1f}',
+                f'serialize;dur={timings.serialize_ms:.1f}',
+                f'render;dur={timings.render_ms:.1f}',
+                f'total;dur={duration_ms:.1f}',
+            ])
+        return response
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        rendered = ','.join(f'{key}="{_label(val)}"' for key, val in labels.items())
+        lines.append(f"{name}{{{rendered}}} {value}")
+
+
+def prometheus_text(extra_samples=()):
+    """All route counters in the Prometheus text exposition format."""
+    with registry.lock:
+        routes = {key: stats for key, stats in registry.routes.items()}
+        requests, durations, buckets, queries, db, serialize, render, sizes = [], [], [], [], [], [], [], []
+        for (route, method), stats in sorted(routes.items()):
+            labels = {'route': route, 'method': method}
+            for status, count in sorted(stats.by_status.items()):
+                requests.append(({**labels, 'status': status}, count))
+            for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                buckets.append(({**labels, 'le': bound}, count))
+            buckets.append(({**labels, 'le': '+Inf'}, stats.requests))
+            durations.append((labels, stats))
+            queries.append((labels, stats.queries))
+            db.append((labels, round(stats.db_s, 6)))
+            serialize.append((labels, round(stats.serialize_s, 6)))
+            render.append((labels, round(stats.render_s, 6)))
+            sizes.append((labels, stats.response_bytes))
+        # Fingerprints, not SQL, as labels: short, and free of anything normalize_sql() missed
+        slow = [({'fingerprint': entry['fingerprint']}, entry['count']) for entry in registry.slow_queries.values()]
+        slow_time = [({'fingerprint': entry['fingerprint']}, round(entry['total_ms'] / 1000, 6))
+                     for entry in registry.slow_queries.values()]
+
+    lines = []
+    _metric(lines, 'newsique_http_requests_total', 'counter', "Requests handled, by route, method and status class.", requests)
+    lines.append("# HELP newsique_http_request_duration_seconds Request wall time.")
+    lines.append("# TYPE newsique_http_request_duration_seconds histogram")
+    for labels, value in buckets:
+        rendered = ','.join(f'{key}="{_label(val)}"' for key, val in labels.items())
+        lines.append(f"newsique_http_request_duration_seconds_bucket{{{rendered}}} {value}")
+    for labels, stats in durations:
+        rendered = ','.join(f'{key}="{_label(val)}"' for key, val in labels.items())
+        lines.append(f"newsique_http_request_duration_seconds_sum{{{rendered}}} {round(stats.duration_s, 6)}")
+        lines.append(f"newsique_http_request_duration_seconds_count{{{rendered}}} {stats.requests}")
+    _metric(lines, 'newsique_db_queries_total', 'counter', "DB queries issued while handling requests.", queries)
+    _metric(lines, 'newsique_db_query_seconds_total', 'counter', "Time spent in DB queries.", db)
+    _metric(lines, 'newsique_serialize_seconds_total', 'counter', "Time spent building serializer output, DB queries excluded.", serialize)
+    _metric(lines, 'newsique_render_seconds_total', 'counter', "Time spent rendering response bodies.", render)
+    _metric(lines, 'newsique_response_bytes_total', 'counter', "Response body bytes (streaming responses excluded).", sizes)
+    _metric(lines, 'newsique_slow_queries_total', 'counter',
+            "Sampled slow queries, by statement fingerprint (SQL in ops/metrics/summary).", slow)
+    _metric(lines, 'newsique_slow_query_seconds_total', 'counter', "Time spent in sampled slow queries, by fingerprint.", slow_time)
+    for name, kind, help_text, samples in extra_samples:
+        _metric(lines, name, kind, help_text, samples)
+    return '\n'.join(lines) + '\n'
+
+
+def summary(slow_limit=20):
+    """Rolling per-route view: percentiles over the recent window and per-request averages."""
+    with registry.lock:
+        routes = []
+        for (route, method), stats in registry.routes.items():
+            recent = sorted(stats.recent_ms)
+            routes.append({
+                'route': route,
+                'method': method,
+                'requests': stats.requests,
+                'errors': stats.errors,
+                'p50_ms': round(statistics.median(recent), 2) if recent else 0,
+                'p95_ms': round(recent[max(0, round(0.95 * len(recent)) - 1)], 2) if recent else 0,
+                'max_ms': round(stats.max_ms, 2),
+                'queries_per_request': round(stats.queries / stats.requests, 2),
+                'db_ms_per_request': round(stats.db_s * 1000 / stats.requests, 2),
+                'serialize_ms_per_request': round(stats.serialize_s * 1000 / stats.requests, 2),
+                'render_ms_per_request': round(stats.render_s * 1000 / stats.requests, 2),
+                'bytes_per_request': round(stats.response_bytes / stats.requests),
+            })
+        slow = sorted(registry.slow_queries.values(), key=lambda entry: -entry['total_ms'])[:slow_limit]
+        slow = [
+            {**entry, 'total_ms': round(entry['total_ms'], 2), 'max_ms': round(entry['max_ms'], 2),
+             'routes': sorted(entry['routes'])}
+            for entry in slow
+        ]
+        since = registry.started_at
+    routes.sort(key=lambda route: -route['requests'])
+    return {'since': since, 'routes': routes, 'slow_queries': slow}
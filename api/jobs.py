@@ -0,0 +1,8 @@
+from api.mail import deliver_pending
+from api.scheduler import job
+
+
+@job(interval=30)
+def send_queued_mail():
+    sent, failed = deliver_pending()
+    return {'sent': sent, 'failed': failed}
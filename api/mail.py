@@ -0,0 +1,195 @@
+"""
+Outbound email queue.
+
+``OutboxEmailBackend`` is installed as ``EMAIL_BACKEND``, so ``send_mail`` and
+Djoser's activation/reset mails only insert ``OutgoingEmail`` rows. The
+``send_queued_mail`` command delivers them in batches over one connection to
+``MAIL_DELIVERY_BACKEND`` and retries failures with exponential backoff.
+"""
+import base64
+import logging
+from datetime import timedelta
+from email import message_from_bytes
+from email.message import Message
+from email.mime.base import MIMEBase
+from email.policy import compat32
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 60,
+    'MAX_BACKOFF_SECONDS': 6 * 60 * 60,
+    # A claimed batch not reported back within this long (worker died) is picked up again
+    'CLAIM_TIMEOUT_SECONDS': 10 * 60,
+}
+
+
+def queue_setting(name):
+    return getattr(settings, 'MAIL_QUEUE', {}).get(name, DEFAULTS[name])
+
+
+class StoredMIMEPart(MIMEBase):
+    """A MIME attachment parsed back from the outbox; EmailMessage.attach() only takes MIMEBase parts as is."""
+
+    def __init__(self, policy=compat32):
+        Message.__init__(self, policy=policy)
+
+
+def _dump_attachment(attachment):
+    if isinstance(attachment, MIMEBase):
+        return {'mime': base64.b64encode(attachment.as_bytes()).decode('ascii')}
+    filename, content, mimetype = attachment
+    if isinstance(content, bytes):
+        return {'filename': filename, 'mimetype': mimetype,
+                'content': base64.b64encode(content).decode('ascii'), 'encoding': 'base64'}
+    return {'filename': filename, 'mimetype': mimetype, 'content': content, 'encoding': 'text'}
+
+
+def _load_attachment(data):
+    if 'mime' in data:
+        return message_from_bytes(base64.b64decode(data['mime']), _class=StoredMIMEPart), None, None
+    content = data['content']
+    if data.get('encoding') == 'base64':
+        content = base64.b64decode(content)
+    return data['filename'], content, data['mimetype']
+
+
+def _from_message(message):
+    return OutgoingEmail(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(message.to),
+        cc=list(message.cc),
+        bcc=list(message.bcc),
+        reply_to=list(message.reply_to),
+        headers=dict(message.extra_headers),
+        alternatives=[list(alt) for alt in getattr(message, 'alternatives', [])],
+        attachments=[_dump_attachment(attachment) for attachment in message.attachments],
+    )
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None, html_message=None):
+    """Queue a single email; same arguments as django.core.mail.send_mail."""
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+        alternatives=[[html_message, 'text/html']] if html_message else [],
+    )
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Email backend that writes messages to the outbox instead of sending them."""
+
+    def send_messages(self, email_messages):
+        rows = [_from_message(message) for message in email_messages if message.recipients()]
+        OutgoingEmail.objects.bulk_create(rows)
+        return len(rows)
+
+
+def _to_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        cc=email.cc,
+        bcc=email.bcc,
+        reply_to=email.reply_to,
+        headers=email.headers,
+        connection=connection,
+    )
+    for content, mimetype in email.alternatives:
+        message.attach_alternative(content, mimetype)
+    for attachment in email.attachments:
+        message.attach(*_load_attachment(attachment))
+    return message
+
+
+def backoff(attempts):
+    delay = queue_setting('BACKOFF_SECONDS') * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, queue_setting('MAX_BACKOFF_SECONDS')))
+
+
+def claim_batch(batch_size):
+    """
+    Mark up to ``batch_size`` due emails SENDING and return them.
+
+    The claim is its own short transaction: rows are locked with SKIP LOCKED
+    only while they are marked, so several workers can drain the queue side
+    by side without holding locks during SMTP. A claim lasts
+    CLAIM_TIMEOUT_SECONDS; after that an unreported SENDING row is due again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=('PENDING', 'SENDING'), next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if batch:
+            claimed_until = now + timedelta(seconds=queue_setting('CLAIM_TIMEOUT_SECONDS'))
+            OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                status='SENDING', next_attempt_at=claimed_until,
+            )
+    return batch
+
+
+def deliver_pending(batch_size=None):
+    """
+    Claim one batch of due emails, then send it over a single connection.
+
+    Sending happens outside any transaction; each outcome is written back at
+    the end. Returns ``(sent, failed)``.
+    """
+    batch_size = batch_size or queue_setting('BATCH_SIZE')
+    max_attempts = queue_setting('MAX_ATTEMPTS')
+    sent = failed = 0
+    batch = claim_batch(batch_size)
+    if not batch:
+        return sent, failed
+
+    connection = get_connection(settings.MAIL_DELIVERY_BACKEND)
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Could not open mail connection: %s", exc)
+        connection = None
+
+    now = timezone.now()
+    for email in batch:
+        try:
+            if connection is None:
+                raise ConnectionError("mail connection unavailable")
+            _to_message(email, connection).send()
+        except Exception as exc:
+            email.attempts += 1
+            email.last_error = str(exc)[:1000]
+            email.next_attempt_at = now + backoff(email.attempts)
+            email.status = 'FAILED' if email.attempts >= max_attempts else 'PENDING'
+            failed += 1
+        else:
+            email.attempts += 1
+            email.status = 'SENT'
+            email.sent_at = now
+            email.last_error = ''
+            sent += 1
+
+    if connection is not None:
+        connection.close()
+    OutgoingEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at']
+    )
+    return sent, failed
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from news_ique.openapi import get_api_info
+
+
+class Command(BaseCommand):
+    help = "Write the OpenAPI schema to settings.OPENAPI_SCHEMA_FILE, where /swagger/ and /redoc/ serve it from."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Write here instead of settings.OPENAPI_SCHEMA_FILE ('-' for stdout).")
+        parser.add_argument('--url', help="Base URL to record in the schema (default: none, clients use their own host).")
+
+    def handle(self, *args, **options):
+        from drf_yasg.codecs import OpenAPICodecJson
+        from drf_yasg.generators import OpenAPISchemaGenerator
+        from rest_framework.test import APIRequestFactory
+        from rest_framework.views import APIView
+
+        # Views inspect self.request while the schema is built, as they do for /swagger/?format=openapi
+        factory = APIRequestFactory()
+        request = APIView().initialize_request(factory.get('/swagger/', {'format': 'openapi'}, HTTP_HOST='127.0.0.1'))
+        generator = OpenAPISchemaGenerator(get_api_info(), url=options['url'] or None)
+        schema = generator.get_schema(request=request, public=True)
+        if not options['url']:
+            # Without a host, Swagger UI and other clients use the one serving the file
+            schema.pop('host', None)
+            schema.pop('schemes', None)
+        content = OpenAPICodecJson(validators=[], pretty=True).encode(schema).decode()
+
+        output = options['output'] or settings.OPENAPI_SCHEMA_FILE
+        if output == '-':
+            self.stdout.write(content)
+            return
+        path = Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(schema['paths'])} paths to {path}"))
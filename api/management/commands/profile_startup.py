@@ -0,0 +1,81 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a cold serverless instance does before answering its first request
+BOOT_SCRIPT = """
+import time
+started = time.perf_counter()
+import news_ique.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(round((time.perf_counter() - started) * 1000, 1))
+"""
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def profile_boot():
+    """Boot the app in a fresh interpreter; returns (total_ms, [(module, self_us, cumulative_us, depth)])."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+        capture_output=True, text=True, cwd=settings.BASE_DIR, env=os.environ.copy(),
+    )
+    if result.returncode:
+        raise CommandError(f"Booting the app failed:\n{result.stderr[-2000:]}")
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the WSGI app in a fresh interpreter with -X importtime, report where the time goes "
+        "and fail when it exceeds settings.STARTUP_BUDGET_MS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help="Boots to measure; the fastest one is reported.")
+        parser.add_argument('--budget', type=float, help="Budget in ms (default: settings.STARTUP_BUDGET_MS).")
+        parser.add_argument('--limit', type=int, default=20, help="Rows to show per table.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        budget = options['budget'] or settings.STARTUP_BUDGET_MS
+        total_ms, modules = min((profile_boot() for _ in range(max(1, options['runs']))), key=lambda run: run[0])
+
+        packages = defaultdict(int)
+        for name, self_us, _, _ in modules:
+            packages[name.split('.')[0]] += self_us
+        top_packages = sorted(packages.items(), key=lambda item: -item[1])[:options['limit']]
+        top_modules = sorted(modules, key=lambda module: -module[1])[:options['limit']]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'total_ms': total_ms,
+                'budget_ms': budget,
+                'import_ms': round(sum(packages.values()) / 1000, 1),
+                'packages': {name: round(us / 1000, 1) for name, us in top_packages},
+                'modules': {name: round(self_us / 1000, 1) for name, self_us, _, _ in top_modules},
+            }, indent=2))
+        else:
+            self.stdout.write(f"Boot: {total_ms}ms (imports {sum(packages.values()) / 1000:.1f}ms), budget {budget}ms\n")
+            self.stdout.write("Slowest packages (self time, ms):")
+            for name, us in top_packages:
+                self.stdout.write(f"  {us / 1000:8.1f}  {name}")
+            self.stdout.write("Slowest modules (self / cumulative, ms):")
+            for name, self_us, cumulative_us, _ in top_modules:
+                self.stdout.write(f"  {self_us / 1000:8.1f} {cumulative_us / 1000:8.1f}  {name}")
+
+        if total_ms > budget:
+            raise CommandError(f"Startup took {total_ms}ms, over the {budget}ms budget.")
+        self.stderr.write(self.style.SUCCESS(f"Startup within budget ({total_ms}ms <= {budget}ms)."))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from api import scheduler
+
+
+class Command(BaseCommand):
+    help = "Run due scheduled jobs (see api.scheduler) once, or keep running them with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', action='append', dest='jobs', help="Run this job now, due or not (repeatable).")
+        parser.add_argument('--loop', action='store_true', help="Keep checking for due jobs.")
+        parser.add_argument('--tick', type=float, default=10.0, help="Seconds between checks in --loop mode.")
+        parser.add_argument('--list', action='store_true', help="List registered jobs and exit.")
+        parser.add_argument(
+            '--allow-local-cache', action='store_true',
+            help="Run even though the default cache is process-local (its invalidations will not reach the web workers).",
+        )
+
+    def handle(self, *args, **options):
+        registry = scheduler.autodiscover()
+        if options['list']:
+            for name, scheduled in sorted(registry.items()):
+                self.stdout.write(f"{name:32} every {scheduled.interval}s")
+            return
+
+        if scheduler.cache_is_process_local() and not options['allow_local_cache']:
+            raise CommandError(
+                "The default cache is process-local: cache invalidations from jobs would never reach the web "
+                "workers. Configure a shared CACHE_BACKEND (file or database) or pass --allow-local-cache."
+            )
+
+        if options['jobs']:
+            unknown = set(options['jobs']) - set(registry)
+            if unknown:
+                raise CommandError(f"Unknown job(s): {', '.join(sorted(unknown))}")
+            self.report([scheduler.run_job(registry[name]) for name in options['jobs']])
+            return
+
+        while True:
+            self.report(scheduler.run_due_jobs())
+            if not options['loop']:
+                break
+            time.sleep(options['tick'])
+
+    def report(self, runs):
+        for run in runs:
+            style = self.style.SUCCESS if run.status == 'OK' else self.style.ERROR
+            self.stdout.write(style(f"{run.name}: {run.status} in {run.duration_ms}ms {run.metrics or run.error}"))
@@ -1,3 +1,65 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+
+class OutgoingEmail(models.Model):
+    """A queued email, written by api.mail.OutboxEmailBackend and sent by `manage.py send_queued_mail`."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        # Claimed by a send_queued_mail worker until next_attempt_at (see api.mail.deliver_pending)
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    # [[content, mimetype], ...], e.g. the HTML part of Djoser mails
+    alternatives = models.JSONField(default=list, blank=True)
+    # [{"filename", "mimetype", "content", "encoding": "text"|"base64"}, ...]; MIME parts are
+    # stored whole as {"mime": <base64 of the part>} (see api.mail)
+    attachments = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='api_outgoingemail_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class JobRun(models.Model):
+    """One execution of a scheduled job (api.scheduler), with the metrics it reported."""
+    STATUS_CHOICES = [
+        ('RUNNING', 'Running'),
+        ('OK', 'OK'),
+        ('FAILED', 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='RUNNING')
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    metrics = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', '-started_at'], name='api_jobrun_name_started_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} @ {self.started_at:%Y-%m-%d %H:%M:%S} ({self.status})"
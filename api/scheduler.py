@@ -0,0 +1,112 @@
+"""
+Periodic job scheduler.
+
+Apps declare jobs in a ``jobs.py`` module::
+
+    from api.scheduler import job
+
+    @job(interval=60)
+    def expire_subscriptions():
+        ...
+        return {'expired': count}
+
+``manage.py run_scheduler`` discovers them, runs whichever are due (no
+successful run within ``interval`` seconds) and records every execution,
+with the metrics dict the job returns, as a ``JobRun`` row.
+
+Jobs invalidate cached responses and entitlements. The scheduler runs in its
+own process, so the default cache has to be shared with the web workers (file
+or database backend); with a process-local one ``run_scheduler`` refuses to
+start and ``manage.py check --deploy`` warns (api.W001). The warning is a
+deployment check so everyday commands on the locmem default stay quiet.
+"""
+import logging
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core import checks
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from api.models import JobRun
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+# Cache backends whose entries other processes never see
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@dataclass
+class Job:
+    name: str
+    func: object
+    interval: int
+
+
+def job(name=None, interval=60):
+    def decorator(func):
+        job_name = name or func.__name__
+        registry[job_name] = Job(job_name, func, interval)
+        return func
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('jobs')
+    return registry
+
+
+def run_job(scheduled):
+    """Run one job now and record it; returns the JobRun."""
+    run = JobRun.objects.create(name=scheduled.name)
+    started = time.perf_counter()
+    try:
+        metrics = scheduled.func() or {}
+    except Exception as exc:
+        logger.exception("Scheduled job %s failed", scheduled.name)
+        run.status = 'FAILED'
+        run.error = repr(exc)[:2000]
+    else:
+        run.status = 'OK'
+        run.metrics = metrics
+    run.finished_at = timezone.now()
+    run.duration_ms = int((time.perf_counter() - started) * 1000)
+    run.save(update_fields=['status', 'error', 'metrics', 'finished_at', 'duration_ms'])
+    return run
+
+
+def due_jobs(now=None):
+    now = now or timezone.now()
+    last_ok = dict(
+        JobRun.objects.filter(name__in=registry, status='OK')
+        .values('name').annotate(last=Max('started_at')).values_list('name', 'last')
+    )
+    return [
+        scheduled for name, scheduled in registry.items()
+        if name not in last_ok or (now - last_ok[name]).total_seconds() >= scheduled.interval
+    ]
+
+
+def run_due_jobs():
+    return [run_job(scheduled) for scheduled in due_jobs()]
+
+
+def cache_is_process_local(alias='default'):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_CACHES
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not cache_is_process_local():
+        return []
+    return [checks.Warning(
+        "The default cache is process-local, so cache invalidations made by run_scheduler jobs "
+        "never reach the web workers.",
+        hint="Set CACHE_BACKEND to django.core.cache.backends.filebased.FileBasedCache or "
+             "django.core.cache.backends.db.DatabaseCache.",
+        id='api.W001',
+    )]
@@ -1,3 +1,231 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from email.mime.base import MIMEBase
+from email.mime.text import MIMEText
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core import checks, mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api import instrumentation
+from api.instrumentation import RequestTimings, prometheus_text, registry, summary, timed_serializer_data
+from api.mail import OutboxEmailBackend, claim_batch, deliver_pending
+from api.models import OutgoingEmail
+from api.scheduler import check_shared_cache
+from api.throttling import ANON, EDITOR, SUBSCRIBER, USER, CounterStore, client_ident, client_tier, parse_rate
+from news.models import Category
+from users.models import User
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+FILEBASED = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/news-ique'}}
+
+
+class SharedCacheTests(SimpleTestCase):
+    @override_settings(CACHES=LOCMEM)
+    def test_process_local_cache_warns(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['api.W001'])
+
+    @override_settings(CACHES=FILEBASED)
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(CACHES=LOCMEM)
+    def test_warning_is_a_deployment_check(self):
+        self.assertNotIn('api.W001', [message.id for message in checks.run_checks()])
+        self.assertIn('api.W001', [message.id for message in checks.run_checks(include_deployment_checks=True)])
+
+    @override_settings(CACHES=LOCMEM)
+    def test_scheduler_refuses_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, 'process-local'):
+            call_command('run_scheduler')
+
+
+@override_settings(MAIL_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class MailQueueTests(TestCase):
+    def queue(self, **kwargs):
+        message = EmailMessage('Invoice', 'See attached.', 'billing@example.com', ['reader@example.com'], **kwargs)
+        OutboxEmailBackend().send_messages([message])
+        return OutgoingEmail.objects.latest('id')
+
+    def test_attachments_and_reply_to_survive_the_queue(self):
+        part = MIMEText('inline note', 'plain')
+        part.add_header('Content-Disposition', 'attachment', filename='note.txt')
+        self.queue(
+            reply_to=['support@example.com'],
+            attachments=[('invoice.pdf', b'%PDF-1.4 \x00\xff', 'application/pdf'), ('notes.csv', 'a,b\n1,2\n', 'text/csv'), part],
+        )
+        self.assertEqual(deliver_pending(), (1, 0))
+        sent = mail.outbox[0]
+        self.assertEqual(sent.reply_to, ['support@example.com'])
+        self.assertEqual(sent.attachments[0][:3], ('invoice.pdf', b'%PDF-1.4 \x00\xff', 'application/pdf'))
+        self.assertEqual(sent.attachments[1][:3], ('notes.csv', 'a,b\n1,2\n', 'text/csv'))
+        self.assertIsInstance(sent.attachments[2], MIMEBase)
+        self.assertEqual(sent.attachments[2].get_filename(), 'note.txt')
+        self.assertIn('inline note', sent.message().as_string())
+
+    def test_claimed_batch_is_not_claimed_twice(self):
+        email = self.queue()
+        self.assertEqual([claimed.pk for claimed in claim_batch(10)], [email.pk])
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'SENDING')
+        self.assertEqual(claim_batch(10), [])
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    def test_expired_claim_is_picked_up_again(self):
+        email = self.queue()
+        claim_batch(10)
+        OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(deliver_pending(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'SENT')
+
+    def test_failed_send_goes_back_to_pending(self):
+        email = self.queue()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(deliver_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), ('PENDING', 1, 'down'))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+
+SEARCH_ONLY = {
+    'ENABLED': True, 'CACHE': 'default',
+    'SCOPES': {'search': {'algorithm': 'token_bucket', 'rates': {'anon': '2/min', 'user': '3/min', 'subscriber': '5/min'}}},
+}
+
+
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = CounterStore()
+        self.category = Category.objects.create(name='World')
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('30/min'), (30, 60))
+        self.assertEqual(parse_rate('5/hour'), (5, 3600))
+        self.assertEqual(parse_rate('1/s'), (1, 1))
+
+    def test_client_tiers(self):
+        reader = User.objects.create_user('reader@example.com', 'pw')
+        editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        self.assertEqual(client_tier(AnonymousUser()), ANON)
+        self.assertEqual(client_tier(reader), USER)
+        self.assertEqual(client_tier(editor), EDITOR)
+        with mock.patch('api.throttling.has_premium_access', return_value=True):
+            self.assertEqual(client_tier(reader), SUBSCRIBER)
+
+    def test_token_bucket_bursts_then_refills(self):
+        allowed = [self.store.token_bucket('bucket', 3, 60, now=1000).allowed for _ in range(4)]
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertAlmostEqual(self.store.token_bucket('bucket', 3, 60, now=1000).wait, 20)
+        # One token back every 20 seconds
+        self.assertTrue(self.store.token_bucket('bucket', 3, 60, now=1020).allowed)
+        self.assertFalse(self.store.token_bucket('bucket', 3, 60, now=1020).allowed)
+
+    def test_sliding_window(self):
+        allowed = [self.store.sliding_window('window', 2, 60, now=6000 + second).allowed for second in range(3)]
+        self.assertEqual(allowed, [True, True, False])
+        # A quarter into the next window the previous one still counts for 1.5 requests
+        self.assertTrue(self.store.sliding_window('window', 2, 60, now=6075).allowed)
+        decision = self.store.sliding_window('window', 2, 60, now=6075)
+        self.assertFalse(decision.allowed)
+        self.assertGreater(decision.wait, 0)
+
+    @override_settings(THROTTLING=SEARCH_ONLY)
+    def test_search_is_throttled_per_tier(self):
+        def statuses(client, count):
+            return [client.get('/api/v1/public_articles/', {'search': 'budget'}).status_code for _ in range(count)]
+
+        self.assertEqual(statuses(APIClient(), 3), [200, 200, 429])
+        reader = APIClient()
+        reader.force_authenticate(User.objects.create_user('reader@example.com', 'pw'))
+        self.assertEqual(statuses(reader, 4), [200, 200, 200, 429])
+        # Editors have no rate for this scope; plain lists are not counted at all
+        editor = APIClient()
+        editor.force_authenticate(User.objects.create_user('editor@example.com', 'pw', role='EDITOR'))
+        self.assertEqual(statuses(editor, 10), [200] * 10)
+        self.assertEqual(APIClient().get('/api/v1/public_articles/').status_code, 200)
+
+    @override_settings(THROTTLING=SEARCH_ONLY)
+    def test_throttled_response_has_retry_after(self):
+        client = APIClient()
+        for _ in range(2):
+            client.get('/api/v1/public_articles/', {'search': 'budget'})
+        response = client.get('/api/v1/public_articles/', {'search': 'budget'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    @override_settings(THROTTLING={**SEARCH_ONLY, 'ENABLED': False})
+    def test_disabled(self):
+        client = APIClient()
+        self.assertEqual({client.get('/api/v1/public_articles/', {'search': 'x'}).status_code for _ in range(5)}, {200})
+
+    def test_anonymous_clients_are_keyed_on_remote_addr(self):
+        request = APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.9')
+        # Without trusted proxies a client can't pick its own key through the header
+        self.assertEqual(client_ident(request, AnonymousUser()), 'ip:10.0.0.1')
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(client_ident(request, AnonymousUser()), 'ip:203.0.113.9')
+        user = User.objects.create_user('reader@example.com', 'pw')
+        self.assertEqual(client_ident(request, user), f'user:{user.pk}')
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_server_timing(self):
+        response = self.client.get('/api/v1/categories/')
+        parts = dict(part.split(';', 1)[0:2] for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(parts), {'db', 'app', 'serialize', 'render', 'total'})
+        self.assertIn(('category-list', 'GET'), registry.routes)
+
+    def test_serialize_time_excludes_queries(self):
+        timings = RequestTimings()
+
+        def query(serializer):
+            time.sleep(0.02)
+            timings.db_ms += 20
+            return serializer
+
+        def data(serializer):
+            time.sleep(0.02)
+            # Nested serializer output is already covered by the outer timer
+            return timed_serializer_data(query)(serializer)
+
+        token = instrumentation._current.set(timings)
+        started = time.perf_counter()
+        try:
+            timed_serializer_data(data)(None)
+        finally:
+            instrumentation._current.reset(token)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.assertGreaterEqual(timings.serialize_ms, 20)
+        self.assertLessEqual(timings.serialize_ms, elapsed_ms - 20)
+
+    def test_serializer_data_is_wrapped_once(self):
+        instrumentation.install()
+        self.assertTrue(BaseSerializer.data.fget.instrumented)
+        self.assertFalse(getattr(BaseSerializer.data.fget.__closure__[0].cell_contents, 'instrumented', False))
+
+    def test_slow_queries_are_labelled_by_fingerprint(self):
+        registry.record_slow_query("SELECT * FROM users_user WHERE email = 'someone@example.com'", 150, 'user-list')
+        registry.record_slow_query("SELECT * FROM users_user WHERE email = 'other@example.com'", 250, 'user-list')
+        text = prometheus_text()
+        self.assertNotIn('SELECT', text)
+        self.assertNotIn('example.com', text)
+        [slow] = summary()['slow_queries']
+        self.assertEqual(slow['sql'], 'SELECT * FROM users_user WHERE email = ?')
+        self.assertEqual(slow['count'], 2)
+        self.assertIn(f'newsique_slow_queries_total{{fingerprint="{slow["fingerprint"]}"}} 2', text)
+        self.assertIn(f'newsique_slow_query_seconds_total{{fingerprint="{slow["fingerprint"]}"}} 0.4', text)
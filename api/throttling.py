@@ -0,0 +1,200 @@
+"""
+Request throttling for the endpoints scrapers and abusers go for.
+
+Each scope in ``settings.THROTTLING['SCOPES']`` has an algorithm and a rate
+per client tier:
+
+- ``anon``: not signed in, counted per client IP (``REMOTE_ADDR``, or the
+  ``X-Forwarded-For`` entry the ``REST_FRAMEWORK['NUM_PROXIES']`` trusted
+  proxies added),
+- ``user``: signed in without an active subscription,
+- ``subscriber``: ``has_premium_access()``,
+- ``editor``: editors, admins and staff.
+
+Signed-in clients are counted per user. A tier without a rate is not
+limited. Rates are ``"<requests>/<period>"`` with a period of s, min, hour or
+day.
+
+Algorithms:
+
+- ``token_bucket``: a bucket holds up to ``requests`` tokens and refills at
+  ``requests / period``, so a client may burst up to the full budget and then
+  continue at the sustained rate.
+- ``sliding_window``: at most ``requests`` per rolling ``period``. It is
+  estimated from the counts of the current and previous fixed windows, which
+  suits strict caps like login attempts.
+
+Counters live in the cache alias ``THROTTLING['CACHE']``. That is process
+local with locmem, and shared between workers with the file or database cache
+backends; no external service is involved. Updates are serialized within a
+process only: the file and database backends read and write a counter in two
+steps, so concurrent requests in different worker processes can each spend
+the same token. The real bound is therefore about N times the configured rate
+with N worker processes (reached only when every worker serves the same client
+at once); a single process never exceeds it.
+
+The DRF throttle classes below run in ``APIView.initial()``, after
+authentication and before the handler, so shed requests never reach the
+ORM. They answer 429 with ``Retry-After``.
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from users.entitlements import has_premium_access
+
+ANON, USER, SUBSCRIBER, EDITOR = 'anon', 'user', 'subscriber', 'editor'
+EDITOR_ROLES = ('ADMIN', 'EDITOR')
+TOKEN_BUCKET, SLIDING_WINDOW = 'token_bucket', 'sliding_window'
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+KEY_PREFIX = 'throttle'
+
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def throttling_setting(name, default):
+    return getattr(settings, 'THROTTLING', {}).get(name, default)
+
+
+def parse_rate(rate):
+    """``"30/min"`` -> ``(30, 60)``: requests allowed and the period in seconds."""
+    requests, period = rate.split('/')
+    return int(requests), PERIODS[period.strip()[0]]
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    wait: float = 0.0
+
+
+class CounterStore:
+    """Token buckets and sliding-window counters kept in a Django cache."""
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def lock(self, key):
+        return _locks[hash(key) % len(_locks)]
+
+    def token_bucket(self, key, capacity, period, now=None):
+        now = time.time() if now is None else now
+        refill = capacity / period
+        with self.lock(key):
+            tokens, updated = self.cache.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            if tokens >= 1:
+                decision = Decision(True)
+                tokens -= 1
+            else:
+                decision = Decision(False, (1 - tokens) / refill)
+            # A bucket untouched for a whole period is full again; let it expire
+            self.cache.set(key, (tokens, now), math.ceil(period) + 1)
+        return decision
+
+    def sliding_window(self, key, limit, period, now=None):
+        now = time.time() if now is None else now
+        window, elapsed = divmod(now, period)
+        current_key, previous_key = f"{key}:{int(window)}", f"{key}:{int(window) - 1}"
+        with self.lock(key):
+            counts = self.cache.get_many([current_key, previous_key])
+            current, previous = counts.get(current_key, 0), counts.get(previous_key, 0)
+            weight = 1 - elapsed / period
+            if current + previous * weight >= limit:
+                if current >= limit or not previous:
+                    wait = period - elapsed
+                else:
+                    # When the previous window's share has faded enough for one more request
+                    wait = (1 - (limit - current) / previous) * period - elapsed
+                return Decision(False, max(wait, 0.0))
+            if not self.cache.add(current_key, 1, math.ceil(period * 2)):
+                self.cache.incr(current_key)
+        return Decision(True)
+
+
+def get_store():
+    return CounterStore(throttling_setting('CACHE', 'default'))
+
+
+def client_tier(user):
+    if user is None or not user.is_authenticated:
+        return ANON
+    if user.is_staff or getattr(user, 'role', None) in EDITOR_ROLES:
+        return EDITOR
+    if has_premium_access(user):
+        return SUBSCRIBER
+    return USER
+
+
+def client_ident(request, user):
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{BaseThrottle().get_ident(request)}"
+
+
+def check_rate(scope, request, user):
+    """Count one request of ``user`` (or of the client IP) against ``scope``."""
+    if not throttling_setting('ENABLED', True):
+        return Decision(True)
+    config = throttling_setting('SCOPES', {}).get(scope)
+    if not config:
+        return Decision(True)
+    rate = config['rates'].get(client_tier(user))
+    if not rate:
+        return Decision(True)
+    requests, period = parse_rate(rate)
+    key = f"{KEY_PREFIX}:{scope}:{client_ident(request, user)}"
+    if config.get('algorithm', TOKEN_BUCKET) == SLIDING_WINDOW:
+        return get_store().sliding_window(key, requests, period)
+    return get_store().token_bucket(key, requests, period)
+
+
+class TieredRateThrottle(BaseThrottle):
+    """DRF throttle for one ``scope`` of THROTTLING['SCOPES']; subclasses narrow it with ``applies()``."""
+    scope = None
+
+    def applies(self, request, view):
+        return True
+
+    def allow_request(self, request, view):
+        if not self.applies(request, view):
+            return True
+        self.decision = check_rate(self.scope, request, request.user)
+        return self.decision.allowed
+
+    def wait(self):
+        return self.decision.wait
+
+
+class SearchThrottle(TieredRateThrottle):
+    """Article lists with ``?search=``: the full-text query is the expensive part."""
+    scope = 'search'
+
+    def applies(self, request, view):
+        return bool(request.query_params.get(api_settings.SEARCH_PARAM))
+
+
+class ReviewCreateThrottle(TieredRateThrottle):
+    scope = 'review_create'
+
+    def applies(self, request, view):
+        return request.method == 'POST'
+
+
+class PaymentInitiateThrottle(TieredRateThrottle):
+    scope = 'payment_initiate'
+
+
+class AuthThrottle(TieredRateThrottle):
+    """Login, registration, activation and password reset posts to the djoser/simplejwt views."""
+    scope = 'auth'
+    auth_packages = ('djoser', 'rest_framework_simplejwt')
+
+    def applies(self, request, view):
+        return request.method == 'POST' and type(view).__module__.split('.')[0] in self.auth_packages
@@ -2,6 +2,11 @@ from django.urls import path,include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
 from users.views import UserListView
+from news.async_views import (
+    initiate_payment_async,public_article_list_async,public_article_detail_async,public_article_homepage_async,
+    category_list_async,category_detail_async,
+)
+from api.views import database_stats,metrics,metrics_summary
 from news.views import CategoryViewSet,ArticleViewSet,ReviewViewSet,PublicArticleViewSet,SubscriptionPlanViewSet,initiate_payment,payment_success,payment_cancel,payment_failed
 
 router = DefaultRouter()
@@ -22,8 +27,17 @@ urlpatterns = [
     path('',include(articles_router.urls)),
     path('',include(public_article_router.urls)),
     path('payment/initiate',initiate_payment,name='initiate-payment'),
+    path('payment/initiate/async',initiate_payment_async,name='initiate-payment-async'),
+    path('async/public_articles/',public_article_list_async,name='public_articles-list-async'),
+    path('async/public_articles/homepage/',public_article_homepage_async,name='public_articles-homepage-async'),
+    path('async/public_articles/<int:pk>/',public_article_detail_async,name='public_articles-detail-async'),
+    path('async/categories/',category_list_async,name='category-list-async'),
+    path('async/categories/<int:pk>/',category_detail_async,name='category-detail-async'),
     path('payment/success',payment_success,name='payment-success'),
     path('payment/fail',payment_failed,name='payment-failed'),
-    path('payment/cancel',payment_cancel,name='payment-cancel')
+    path('payment/cancel',payment_cancel,name='payment-cancel'),
+    path('ops/db',database_stats,name='database-stats'),
+    path('ops/metrics',metrics,name='metrics'),
+    path('ops/metrics/summary',metrics_summary,name='metrics-summary'),
 ]
 
@@ -1,8 +1,13 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny,IsAdminUser
+from rest_framework.decorators import api_view,permission_classes
 from .serializers import UserRegistrationSerializer
 from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from api import instrumentation
+from api.permissions import HasMetricsToken
+from news_ique.db import connection_stats
 
 User = get_user_model()
 
@@ -19,3 +24,48 @@ class UserRegistrationViewSet(viewsets.ModelViewSet):
             "message": "User registered successfully",
             "user": serializer.data
         }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def database_stats(request):
+    """Connection reuse and pool metrics (size, waits, checkout latency) for this worker process."""
+    return Response(connection_stats())
+
+
+def connection_samples():
+    """connection_stats() as extra series for instrumentation.prometheus_text()."""
+    opened, pool_size, pool_available, pool_waiting, wait_seconds = [], [], [], [], []
+    for alias, stats in connection_stats().items():
+        labels = {'alias': alias}
+        opened.append((labels, stats['connections_opened']))
+        pool = stats['pool']
+        if pool:
+            pool_size.append((labels, pool['size']))
+            pool_available.append((labels, pool['available']))
+            pool_waiting.append((labels, pool['waiting']))
+            wait_seconds.append((labels, pool['checkout_wait_ms_total'] / 1000))
+    return [
+        ('newsique_db_connections_opened_total', 'counter', "DB connections opened by this process.", opened),
+        ('newsique_db_pool_size', 'gauge', "Connections held by the pool.", pool_size),
+        ('newsique_db_pool_available', 'gauge', "Idle connections in the pool.", pool_available),
+        ('newsique_db_pool_waiting', 'gauge', "Requests waiting for a pooled connection.", pool_waiting),
+        ('newsique_db_pool_wait_seconds_total', 'counter', "Time spent waiting for pooled connections.", wait_seconds),
+    ]
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser | HasMetricsToken])
+def metrics(request):
+    """Per-route request, query, render and size counters of this worker process, in Prometheus text format."""
+    return HttpResponse(
+        instrumentation.prometheus_text(connection_samples()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser | HasMetricsToken])
+def metrics_summary(request):
+    """Rolling per-route latency percentiles and averages, plus the slowest sampled queries (normalized SQL)."""
+    return Response(instrumentation.summary())
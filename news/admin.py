@@ -1,6 +1,19 @@
 from django.contrib import admin
+from django.utils import timezone
 from news.models import * 
 # Register your models here.
 admin.site.register(Category)
-admin.site.register(Article)
-admin.site.register(Review)
\ No newline at end of file
+admin.site.register(Review)
+
+
+@admin.register(Article)
+class ArticleAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        # Same rules as ArticleWriteSerializer: an unpublished article only keeps
+        # published_at as a future schedule; a past one would be republished by
+        # news.jobs.publish_due_articles
+        if obj.is_published:
+            obj.schedule(obj.published_at)
+        elif obj.published_at and obj.published_at <= timezone.now():
+            obj.published_at = None
+        super().save_model(request, obj, form, change)
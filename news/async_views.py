@@ -0,0 +1,188 @@
+"""
+Native async (ASGI) views.
+
+These run on the event loop when served by ``news_ique.asgi``: database work
+uses Django's async ORM and blocking third-party calls are pushed to worker
+threads, so a slow upstream no longer pins a request worker.
+
+The public reads are also served here, under ``/api/v1/async/``, with the
+same responses as their viewset counterparts (filters, ``?view=``/``?fields=``
+projections, pagination, response cache, ETags and the premium paywall).
+``async_action`` sets up the viewset exactly as DRF would and then runs a
+coroutine handler in place of the action. The handler fetches rows with the
+async ORM and serializes the already loaded objects on the event loop.
+``manage.py bench_concurrency`` compares them with the WSGI path under
+concurrent load.
+"""
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
+from rest_framework import exceptions
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from api.throttling import check_rate
+from news.cache import async_cache_response
+from news.conditional import (
+    async_conditional_response, article_list_validators, article_detail_validators, category_list_validators,
+    category_detail_validators,
+)
+from news.pagination import apaginate_queryset
+from news.payments import get_gateway, build_session_request, make_tran_id
+from news.views import CategoryViewSet, PublicArticleViewSet, paywall_response
+from news_ique.db import replica_reads
+from users.entitlements import has_premium_access
+from users.models import SubscriptionPlan, PaymentTransaction
+
+
+async def authenticate(request):
+    """Resolve the JWT user the same way DRF does; returns None when unauthenticated."""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except exceptions.AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+    return request.POST
+
+
+@csrf_exempt
+@require_POST
+async def initiate_payment_async(request):
+    """Async variant of news.views.initiate_payment; same request and response shape."""
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    decision = await sync_to_async(check_rate)('payment_initiate', request, user)
+    if not decision.allowed:
+        throttled = exceptions.Throttled(decision.wait)
+        response = JsonResponse({"detail": str(throttled.detail)}, status=throttled.status_code)
+        response['Retry-After'] = str(math.ceil(decision.wait))
+        return response
+
+    plan_id = request_data(request).get('plan_id')
+    if not plan_id:
+        return JsonResponse({"error": "Subscription plan ID is required"}, status=400)
+    try:
+        plan = await SubscriptionPlan.objects.aget(id=plan_id)
+    except (SubscriptionPlan.DoesNotExist, ValueError):
+        return JsonResponse({"error": "Invalid subscription plan"}, status=404)
+
+    tran_id = make_tran_id(user, plan)
+    await PaymentTransaction.objects.acreate(tran_id=tran_id, user=user, plan=plan, amount_cents=plan.price_cents)
+    post_body = build_session_request(user, plan, tran_id)
+    # The gateway client is blocking; run it off the event loop
+    response = await sync_to_async(get_gateway().create_session, thread_sensitive=False)(post_body)
+    if response.get('status') == 'SUCCESS':
+        return JsonResponse({'payment_url': response['GatewayPageURL']})
+    await sync_to_async(PaymentTransaction.close)(tran_id, 'FAILED', response)
+    return JsonResponse({"error": "payment initation failed"}, status=400)
+
+
+async def filtered_queryset(view):
+    # Filter backends may query while filtering (the SQLite search fallback builds its index)
+    return await sync_to_async(view.filter_queryset)(view.get_queryset())
+
+
+async def aget_object(view):
+    """``GenericAPIView.get_object()`` with the row fetched through the async ORM."""
+    queryset = await filtered_queryset(view)
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    try:
+        obj = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+    except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+    view.check_object_permissions(view.request, obj)
+    return obj
+
+
+async def list_objects(view, request):
+    queryset = await filtered_queryset(view)
+    page = await apaginate_queryset(view, queryset)
+    if page is not None:
+        return view.get_paginated_response(view.get_serializer(page, many=True).data)
+    return Response(view.get_serializer([obj async for obj in queryset], many=True).data)
+
+
+async def retrieve_object(view, request, pk):
+    return Response(view.get_serializer(await aget_object(view)).data)
+
+
+async def retrieve_article(view, request, pk):
+    article = await aget_object(view)
+    if article.category.is_premium and not await sync_to_async(has_premium_access)(request.user):
+        return paywall_response(article)
+    return Response(view.get_serializer(article).data)
+
+
+async def article_homepage(view, request):
+    page = await apaginate_queryset(view, view.homepage_queryset())
+    return view.homepage_response(page)
+
+
+def async_action(viewset_class, basename, action, handler, replica=False):
+    """
+    An async URL view that answers GET/HEAD like ``viewset_class`` does for ``action``.
+
+    ``handler(view, request, **kwargs)`` is a coroutine standing in for the
+    action method. With ``replica`` its reads go to the read replica, as
+    ReplicaReadMixin does for the sync viewset.
+    """
+    @require_safe
+    async def view_func(request, **kwargs):
+        view = viewset_class(basename=basename, detail=bool(kwargs), action_map={'get': action, 'head': action})
+        view.args, view.kwargs = (), kwargs
+        drf_request = view.initialize_request(request, **kwargs)
+        view.request, view.headers = drf_request, view.default_response_headers
+        view.format_kwarg = view.get_format_suffix(**kwargs)
+        try:
+            # Authentication (a user lookup), permission and throttle checks may all block
+            await sync_to_async(view.initial)(drf_request)
+            if replica:
+                with replica_reads():
+                    response = await handler(view, drf_request, **kwargs)
+            else:
+                response = await handler(view, drf_request, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        return view.finalize_response(drf_request, response)
+
+    view_func.__name__ = f"{basename}_{action}_async"
+    return view_func
+
+
+public_article_list_async = async_action(
+    PublicArticleViewSet, 'public_articles', 'list',
+    async_conditional_response(article_list_validators, 'articles')(async_cache_response('articles')(list_objects)),
+    replica=True,
+)
+public_article_detail_async = async_action(
+    PublicArticleViewSet, 'public_articles', 'retrieve',
+    async_conditional_response(article_detail_validators, 'articles')(async_cache_response('articles')(retrieve_article)),
+    replica=True,
+)
+public_article_homepage_async = async_action(
+    PublicArticleViewSet, 'public_articles', 'homepage',
+    async_conditional_response(article_list_validators, 'articles')(async_cache_response('articles')(article_homepage)),
+    replica=True,
+)
+category_list_async = async_action(
+    CategoryViewSet, 'category', 'list',
+    async_conditional_response(category_list_validators, 'categories')(async_cache_response('categories')(list_objects)),
+)
+category_detail_async = async_action(
+    CategoryViewSet, 'category', 'retrieve',
+    async_conditional_response(category_detail_validators, 'categories')(async_cache_response('categories')(retrieve_object)),
+)
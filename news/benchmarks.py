@@ -0,0 +1,380 @@
+"""
+Benchmark harness for the public API hot paths.
+
+``seed_corpus`` fills the database with a synthetic corpus (all rows are
+tagged with the ``bench.local`` email domain or the ``Bench`` category prefix
+so they can be flushed again); ``bench_api`` replays scripted requests against
+it in-process and reports latency percentiles, queries per request and
+throughput, optionally comparing them against a stored baseline.
+``bench_concurrency`` drives the same read scenarios with many concurrent
+clients, through a threaded WSGI setup and through the ASGI handler (the
+async views under /api/v1/async/), to compare the two.
+"""
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+BENCH_DOMAIN = 'bench.local'
+BENCH_CATEGORY_PREFIX = 'Bench'
+BENCH_PASSWORD = 'bench-password'
+WORDS = (
+    "election minister budget storm flood market river city council court police health school "
+    "energy climate cricket football transport railway bridge festival harvest export import bank "
+    "policy reform protest airport hospital vaccine monsoon cyclone garment factory port border "
+    "summit treaty startup technology internet mobile power grid tax inflation rupee dollar"
+).split()
+
+
+def words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def seed_corpus(categories=10, articles=1000, reviews=5000, users=500, subscribed=0.2, seed=42, batch_size=1000):
+    """Insert a synthetic corpus with bulk_create; returns a dict of row counts."""
+    from news.models import Article, Category, Review
+    from news.cache import invalidate
+    from news.search import invalidate_index
+    from users.models import Subscription, SubscriptionPlan, User
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(BENCH_PASSWORD)
+
+    User.objects.bulk_create([
+        User(email=f'bench-admin@{BENCH_DOMAIN}', password=password, role='ADMIN', is_staff=True, is_superuser=True),
+        User(email=f'bench-editor@{BENCH_DOMAIN}', password=password, role='EDITOR'),
+    ] + [
+        User(email=f'reader{i}@{BENCH_DOMAIN}', password=password, first_name=f'Reader{i}', role='SUBSCRIBER')
+        for i in range(users)
+    ], batch_size=batch_size, ignore_conflicts=True)
+    editor = User.objects.get(email=f'bench-editor@{BENCH_DOMAIN}')
+    reader_ids = list(User.objects.filter(email__startswith='reader', email__endswith=BENCH_DOMAIN).values_list('id', flat=True))
+
+    plan, _ = SubscriptionPlan.objects.get_or_create(name='Bench plan', defaults={'price_cents': 500})
+    Subscription.objects.bulk_create([
+        Subscription(user_id=user_id, plan=plan, is_active=True, started_at=now, ends_at=now + timezone.timedelta(days=30))
+        for user_id in rng.sample(reader_ids, int(len(reader_ids) * subscribed))
+    ], batch_size=batch_size, ignore_conflicts=True)
+
+    Category.objects.bulk_create([
+        Category(name=f'{BENCH_CATEGORY_PREFIX} {i}', is_premium=(i % 4 == 3))
+        for i in range(categories)
+    ], ignore_conflicts=True)
+    category_ids = list(Category.objects.filter(name__startswith=BENCH_CATEGORY_PREFIX).values_list('id', flat=True))
+
+    Article.objects.bulk_create([
+        Article(
+            headline=words(rng, rng.randint(5, 12)).capitalize(),
+            body='\n\n'.join(words(rng, rng.randint(60, 120)) for _ in range(rng.randint(3, 8))),
+            category_id=rng.choice(category_ids),
+            author=editor,
+            is_published=rng.random() < 0.9,
+            published_at=now - timezone.timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+        )
+        for _ in range(articles)
+    ], batch_size=batch_size)
+    article_ids = list(Article.objects.filter(author=editor).values_list('id', flat=True))
+
+    Review.objects.bulk_create([
+        Review(article_id=rng.choice(article_ids), user_id=rng.choice(reader_ids),
+               ratings=rng.randint(0, 4), comment=words(rng, rng.randint(5, 25)))
+        for _ in range(reviews if reader_ids else 0)
+    ], batch_size=batch_size)
+
+    # bulk_create bypasses the model hooks that keep these current
+    Article.rebuild_ratings(Article.objects.filter(author=editor))
+    invalidate_index()
+    invalidate('articles', 'categories', 'plans')
+    return {
+        'users': len(reader_ids) + 2,
+        'categories': len(category_ids),
+        'articles': len(article_ids),
+        'reviews': Review.objects.filter(article__author=editor).count(),
+    }
+
+
+def flush_corpus():
+    from news.models import Category
+    from users.models import SubscriptionPlan, User
+
+    # Articles, reviews and subscriptions cascade from these
+    Category.objects.filter(name__startswith=BENCH_CATEGORY_PREFIX).delete()
+    User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+    SubscriptionPlan.objects.filter(name='Bench plan').delete()
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int = 0
+    errors: int = 0
+    latencies_ms: list = field(default_factory=list, repr=False)
+    queries: list = field(default_factory=list, repr=False)
+    elapsed_s: float = 0.0
+
+    def percentile(self, pct):
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'p50_ms': round(self.percentile(50), 2),
+            'p95_ms': round(self.percentile(95), 2),
+            'p99_ms': round(self.percentile(99), 2),
+            'queries_per_request': round(statistics.mean(self.queries), 2) if self.queries else 0,
+            'throughput_rps': round(self.requests / self.elapsed_s, 1) if self.elapsed_s else 0,
+        }
+
+
+class BenchContext:
+    """Ids and credentials the scenarios draw from, loaded once from the seeded corpus."""
+
+    def __init__(self, seed=7):
+        from news.models import Article
+        from users.models import User
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        self.rng = random.Random(seed)
+        published = Article.objects.published()
+        self.article_ids = list(published.filter(category__is_premium=False).values_list('id', flat=True))
+        self.page_count = max(1, published.count() // 10)
+        self.user_page_count = max(1, User.objects.count() // 10)
+        admin = User.objects.filter(email=f'bench-admin@{BENCH_DOMAIN}').first()
+        readers = User.objects.filter(email__startswith='reader', email__endswith=BENCH_DOMAIN)[:50]
+        if admin is None or not self.article_ids or not readers:
+            raise ValueError("No benchmark corpus found; run `manage.py seed_corpus` first.")
+        self.admin_auth = f'JWT {AccessToken.for_user(admin)}'
+        self.reader_auths = [f'JWT {AccessToken.for_user(user)}' for user in readers]
+
+    def page(self, page_count=None):
+        return self.rng.randint(1, min(page_count or self.page_count, 50))
+
+    def article_id(self):
+        return self.rng.choice(self.article_ids)
+
+
+# name -> (method, path, data, auth) builder
+SCENARIOS = {
+    'public_articles-list': lambda ctx: ('get', '/api/v1/public_articles/', {'page': ctx.page()}, None),
+    'public_articles-detail': lambda ctx: ('get', f'/api/v1/public_articles/{ctx.article_id()}/', {}, None),
+    'public_articles-homepage': lambda ctx: ('get', '/api/v1/public_articles/homepage/', {'page': ctx.page()}, None),
+    'public_articles-search': lambda ctx: ('get', '/api/v1/public_articles/', {'search': ctx.rng.choice(WORDS)}, None),
+    'review-create': lambda ctx: (
+        'post', f'/api/v1/public_articles/{ctx.article_id()}/reviews/',
+        {'comment': 'Benchmark review', 'ratings': ctx.rng.randint(0, 4)}, ctx.rng.choice(ctx.reader_auths),
+    ),
+    'users_list': lambda ctx: ('get', '/api/v1/users_list/', {'page': ctx.page(ctx.user_page_count)}, ctx.admin_auth),
+}
+
+
+def without_throttling():
+    """Benchmarks replay thousands of requests from one client; keep them under the rate limits."""
+    return override_settings(THROTTLING={**getattr(settings, 'THROTTLING', {}), 'ENABLED': False})
+
+
+def make_client():
+    return Client(HTTP_HOST='127.0.0.1')
+
+
+def run_scenario(name, ctx, requests=100, warmup=5, warm_cache=False, client=None):
+    client = client or make_client()
+    build = SCENARIOS[name]
+    result = ScenarioResult(name)
+    started = None
+    with without_throttling():
+        for i in range(warmup + requests):
+            if i == warmup:
+                started = time.perf_counter()
+            method, path, data, auth = build(ctx)
+            if not warm_cache:
+                cache.clear()
+            headers = {'HTTP_AUTHORIZATION': auth} if auth else {}
+            with CaptureQueriesContext(connection) as queries:
+                t0 = time.perf_counter()
+                response = getattr(client, method)(path, data, **headers)
+                elapsed = (time.perf_counter() - t0) * 1000
+            if i < warmup:
+                continue
+            result.requests += 1
+            result.latencies_ms.append(elapsed)
+            result.queries.append(len(queries.captured_queries))
+            if response.status_code >= 400:
+                result.errors += 1
+    result.elapsed_s = time.perf_counter() - started
+    return result
+
+
+# Read scenarios that have an async counterpart under ASYNC_API_PREFIX
+CONCURRENCY_SCENARIOS = (
+    'public_articles-list', 'public_articles-detail', 'public_articles-homepage', 'public_articles-search',
+)
+API_PREFIX = '/api/v1/'
+ASYNC_API_PREFIX = '/api/v1/async/'
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def async_path(path):
+    return ASYNC_API_PREFIX + path[len(API_PREFIX):]
+
+
+def run_wsgi_concurrency(plan, result, concurrency, workers, client_delay_ms):
+    """
+    Serve ``plan`` with ``workers`` threads while ``concurrency`` clients each keep one request in flight.
+
+    Latency includes the wait for a free worker. A worker stays busy for
+    ``client_delay_ms`` after each response, as it does while a slow client
+    reads the body.
+    """
+    local = threading.local()
+
+    def serve(method, path, data, auth, submitted):
+        if not hasattr(local, 'client'):
+            local.client = make_client()
+        headers = {'HTTP_AUTHORIZATION': auth} if auth else {}
+        response = getattr(local.client, method)(path, data, **headers)
+        time.sleep(client_delay_ms / 1000)
+        return response.status_code, (time.perf_counter() - submitted) * 1000
+
+    plan = list(plan)
+    pending = set()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while plan or pending:
+            while plan and len(pending) < concurrency:
+                pending.add(pool.submit(serve, *plan.pop(), time.perf_counter()))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                status_code, elapsed = future.result()
+                result.requests += 1
+                result.latencies_ms.append(elapsed)
+                result.errors += status_code >= 400
+    result.elapsed_s = time.perf_counter() - started
+    return result
+
+
+async def asgi_request(app, method, path, data, auth, client_delay_ms=0):
+    """One request through an ASGI ``app``; the client takes ``client_delay_ms`` to read the body."""
+    headers = [(b'host', b'127.0.0.1')]
+    if auth:
+        headers.append((b'authorization', auth.encode()))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+        'method': method.upper(), 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': urlencode(data or {}).encode(), 'headers': headers,
+        'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80),
+    }
+    body_sent, finished = False, asyncio.Event()
+    status_code = None
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status_code
+        if message['type'] == 'http.response.start':
+            status_code = message['status']
+        elif message['type'] == 'http.response.body' and not message.get('more_body') and client_delay_ms:
+            await asyncio.sleep(client_delay_ms / 1000)
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    return status_code
+
+
+def run_asgi_concurrency(plan, result, concurrency, client_delay_ms):
+    """Serve ``plan`` (sync paths, mapped onto the async views) with ``concurrency`` clients on one event loop."""
+    from django.core.handlers.asgi import ASGIHandler
+
+    app = ASGIHandler()
+    plan = list(plan)
+
+    async def client():
+        while plan:
+            method, path, data, auth = plan.pop()
+            t0 = time.perf_counter()
+            status_code = await asgi_request(app, method, async_path(path), data, auth, client_delay_ms)
+            result.requests += 1
+            result.latencies_ms.append((time.perf_counter() - t0) * 1000)
+            result.errors += status_code is None or status_code >= 400
+
+    async def main():
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    result.elapsed_s = time.perf_counter() - started
+    return result
+
+
+def run_concurrency(name, ctx, mode, requests=500, concurrency=100, workers=8, client_delay_ms=0, warm_cache=False):
+    """
+    Run scenario ``name`` under ``mode`` ('wsgi' or 'asgi') with ``concurrency`` concurrent clients.
+
+    Without ``warm_cache`` the cache is swapped for a dummy one, so every
+    request takes the uncached path (as ``bench_api`` does by default).
+    """
+    build = SCENARIOS[name]
+    plan = [build(ctx) for _ in range(requests)]
+    result = ScenarioResult(f"{name} {mode}")
+    caches = {} if warm_cache else {'CACHES': NO_CACHE}
+    with override_settings(**caches), without_throttling():
+        if mode == 'asgi':
+            return run_asgi_concurrency(plan, result, concurrency, client_delay_ms)
+        return run_wsgi_concurrency(plan, result, concurrency, workers, client_delay_ms)
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Return human-readable regressions of ``results`` against ``baseline`` summaries."""
+    regressions = []
+    for name, summary in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if summary['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {summary['p95_ms']}ms vs baseline {previous['p95_ms']}ms")
+        if summary['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(
+                f"{name}: {summary['queries_per_request']} queries/request vs baseline {previous['queries_per_request']}"
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as handle:
+        return json.load(handle)['results']
+
+
+def save_results(path, results, meta):
+    with open(path, 'w') as handle:
+        json.dump({'meta': meta, 'results': results}, handle, indent=2, sort_keys=True)
+
+
+def results_as_dict(results):
+    return {result.name: result.summary() for result in results}
+
@@ -0,0 +1,147 @@
+"""
+Response cache for anonymous read endpoints.
+
+Cached entries are keyed on the route, the full query string and the current
+version of each data namespace they depend on. Writes never delete entries;
+they bump the namespace version (``invalidate('articles')``), which makes
+every key built from the old version unreachable at once. The stale entries
+then age out through their TTL.
+
+The backend is whatever ``CACHES['default']`` points at (local memory by
+default, file or database based via settings, no external service needed).
+
+With a read replica, an entry rebuilt right after a write could be read from a
+replica that has not caught up yet, and would then be served until its TTL.
+``invalidate`` therefore also marks the namespace as recently written for
+``settings.REPLICA_LAG_WINDOW`` seconds, and misses inside that window are
+rebuilt from the primary (``read_context``).
+"""
+import hashlib
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from news_ique.db import primary_reads, replica_configured
+
+DEFAULT_TTL = 60
+VERSION_KEY = 'respcache:version:{}'
+WRITTEN_KEY = 'respcache:written:{}'
+
+
+def _fresh_version():
+    # Time based so an evicted version key can never come back as an old value
+    return time.time_ns()
+
+
+def get_version(namespace):
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        version = _fresh_version()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def lag_window():
+    if not replica_configured():
+        return 0
+    return getattr(settings, 'REPLICA_LAG_WINDOW', 5)
+
+
+def invalidate(*namespaces):
+    window = lag_window()
+    for namespace in namespaces:
+        key = VERSION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), None)
+        if window:
+            cache.set(WRITTEN_KEY.format(namespace), True, window)
+
+
+def recently_written(namespaces):
+    """True while a write to any of ``namespaces`` may not have reached the read replica."""
+    if not lag_window():
+        return False
+    return bool(cache.get_many([WRITTEN_KEY.format(namespace) for namespace in namespaces]))
+
+
+def read_context(namespaces):
+    """Context manager for rebuilding data from ``namespaces``: the primary if they were just written."""
+    return primary_reads() if recently_written(namespaces) else nullcontext()
+
+
+def get_ttl(endpoint, basename):
+    ttls = getattr(settings, 'RESPONSE_CACHE_TTLS', {})
+    return ttls.get(endpoint, ttls.get(basename, DEFAULT_TTL))
+
+
+def response_cache_key(endpoint, namespaces, request):
+    versions = ':'.join(str(get_version(namespace)) for namespace in namespaces)
+    query = sorted(request.query_params.lists())
+    digest = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+    return f"respcache:{endpoint}:{versions}:{digest}"
+
+
+def cached_data(endpoint, namespaces, request):
+    """``(key, data)``: the cache key for this request and its cached response data, if any."""
+    key = response_cache_key(endpoint, namespaces, request)
+    return key, cache.get(key)
+
+
+def cache_response(*namespaces):
+    """
+    Cache a viewset action's 200 response for anonymous GET requests.
+
+    ``namespaces`` are the data sets the response is built from; a write to
+    any of them (see ``invalidate``) retires the entry. The TTL comes from
+    ``settings.RESPONSE_CACHE_TTLS`` keyed by ``"<basename>-<action>"`` or by
+    the basename alone.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+
+            endpoint = f"{self.basename}-{self.action}"
+            key, data = cached_data(endpoint, namespaces, request)
+            if data is not None:
+                return Response(data)
+
+            with read_context(namespaces):
+                response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, get_ttl(endpoint, self.basename))
+            return response
+        return wrapper
+    return decorator
+
+
+def async_cache_response(*namespaces):
+    """``cache_response`` for the coroutine handlers in news.async_views; same keys and TTLs."""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(view, request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return await handler(view, request, *args, **kwargs)
+
+            endpoint = f"{view.basename}-{view.action}"
+            key, data = await sync_to_async(cached_data)(endpoint, namespaces, request)
+            if data is not None:
+                return Response(data)
+
+            with await sync_to_async(read_context)(namespaces):
+                response = await handler(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.data, get_ttl(endpoint, view.basename))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,200 @@
+"""
+HTTP conditional requests (ETag / Last-Modified) for the public read endpoints.
+
+Validators are computed from the tables the response is built from: lists use
+``Max(updated_at)`` and ``Count`` aggregates, details the row's own
+``updated_at``. They are memoised next to the response cache under the same
+namespace versions (see ``news.cache``), so a repeat request usually costs no
+query at all, and a matching ``If-None-Match``/``If-Modified-Since`` is answered
+with a 304 before the view, the response cache or the serializer run.
+
+Deleting a row lowers the count, which changes the ETag, but not the latest
+``updated_at``; clients revalidating on ``If-Modified-Since`` alone can miss a
+deletion until the next write. ETags are weak: the body is equivalent, not
+byte-for-byte guaranteed.
+"""
+import hashlib
+from dataclasses import dataclass
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from news.cache import get_ttl, read_context, response_cache_key
+from news.models import Article, Category
+from users.entitlements import has_premium_access
+from users.models import SubscriptionPlan
+
+
+@dataclass
+class Validators:
+    seed: str
+    last_modified: object = None
+    # Premium rows render differently for subscribers, so their ETag depends on the caller
+    per_user: bool = False
+
+
+def _latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def table_validators(queryset, *related):
+    """Validators for a list over ``queryset``; ``related`` querysets contribute their latest change."""
+    stats = queryset.aggregate(updated=Max('updated_at'), count=Count('pk'))
+    related_updated = [qs.aggregate(updated=Max('updated_at'))['updated'] for qs in related]
+    last_modified = _latest(stats['updated'], *related_updated)
+    return Validators(f"{stats['count']}:{stats['updated']}:{related_updated}", last_modified)
+
+
+def row_validators(queryset, pk, *fields, premium_field=None):
+    """Validators for one row of ``queryset``; None when it does not exist (the view will 404)."""
+    columns = ('updated_at',) + fields + ((premium_field,) if premium_field else ())
+    try:
+        row = queryset.filter(pk=pk).values_list(*columns).first()
+    except (TypeError, ValueError):
+        return None
+    if row is None:
+        return None
+    timestamps = row[:1 + len(fields)]
+    per_user = bool(premium_field and row[-1])
+    return Validators(':'.join(map(str, timestamps)), _latest(*timestamps), per_user)
+
+
+def article_list_validators(view, request, *args, **kwargs):
+    # Feeds embed each article's category
+    return table_validators(Article.objects.published(), Category.objects.all())
+
+
+def article_detail_validators(view, request, pk=None, **kwargs):
+    return row_validators(
+        Article.objects.published(), pk, 'category__updated_at', premium_field='category__is_premium',
+    )
+
+
+def category_list_validators(view, request, *args, **kwargs):
+    return table_validators(Category.objects.all())
+
+
+def category_detail_validators(view, request, pk=None, **kwargs):
+    return row_validators(Category.objects.all(), pk)
+
+
+def plan_list_validators(view, request, *args, **kwargs):
+    return table_validators(SubscriptionPlan.objects.all())
+
+
+def plan_detail_validators(view, request, pk=None, **kwargs):
+    return row_validators(SubscriptionPlan.objects.all(), pk)
+
+
+def make_etag(endpoint, request, seed):
+    digest = hashlib.md5(f"{endpoint}:{request.get_full_path()}:{seed}".encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def load_validators(compute, namespaces, view, request, *args, **kwargs):
+    """
+    ``(endpoint, validators, premium_access)`` for a request, computing and caching validators on a miss.
+
+    ``validators`` is None when ``compute`` has none (the row does not exist).
+    """
+    endpoint = f"{view.basename}-{view.action}"
+    key = response_cache_key(f"validators:{endpoint}", namespaces, request)
+    validators = cache.get(key)
+    if validators is None:
+        with read_context(namespaces):
+            validators = compute(view, request, *args, **kwargs)
+        if validators is not None:
+            cache.set(key, validators, get_ttl(endpoint, view.basename))
+    premium_access = bool(validators and validators.per_user and has_premium_access(request.user))
+    return endpoint, validators, premium_access
+
+
+def resolve_validators(endpoint, request, validators, premium_access=False):
+    """(etag, last_modified) for ``validators``; ``premium_access`` only matters for per-user ones."""
+    seed = validators.seed
+    if validators.per_user:
+        seed = f"{seed}:{premium_access}"
+    etag = make_etag(endpoint, request, seed)
+    last_modified = int(validators.last_modified.timestamp()) if validators.last_modified else None
+    return etag, last_modified
+
+
+def add_validator_headers(response, etag, last_modified, per_user):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Revalidate every time rather than let clients guess a freshness lifetime
+    patch_cache_control(response, no_cache=True)
+    if per_user:
+        patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def conditional_response(compute, *namespaces):
+    """
+    Emit ETag/Last-Modified on a viewset action's 200 responses and answer 304s.
+
+    ``compute(view, request, *args, **kwargs)`` returns ``Validators`` or None;
+    its result is cached under ``namespaces`` like ``cache_response`` entries.
+    Apply it outside ``cache_response`` so a 304 skips the cache lookup too.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_method(self, request, *args, **kwargs)
+
+            endpoint, validators, premium_access = load_validators(compute, namespaces, self, request, *args, **kwargs)
+            if validators is None:
+                return view_method(self, request, *args, **kwargs)
+
+            etag, last_modified = resolve_validators(endpoint, request, validators, premium_access)
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            else:
+                response = not_modified
+            return add_validator_headers(response, etag, last_modified, validators.per_user)
+        return wrapper
+    return decorator
+
+
+def async_conditional_response(compute, *namespaces):
+    """
+    ``conditional_response`` for the coroutine handlers in news.async_views.
+
+    The cache lookup, ``compute`` on a miss and the entitlement check are all
+    blocking calls; they run together in one ``sync_to_async`` call.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(view, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await handler(view, request, *args, **kwargs)
+
+            endpoint, validators, premium_access = await sync_to_async(load_validators)(
+                compute, namespaces, view, request, *args, **kwargs
+            )
+            if validators is None:
+                return await handler(view, request, *args, **kwargs)
+
+            etag, last_modified = resolve_validators(endpoint, request, validators, premium_access)
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is None:
+                response = await handler(view, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            else:
+                response = not_modified
+            return add_validator_headers(response, etag, last_modified, validators.per_user)
+        return wrapper
+    return decorator
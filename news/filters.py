@@ -12,5 +12,5 @@ class ArticleFilter(filters.FilterSet):
 
     def filter_last_news(self,queryset,name,value):
         if value:
-            return queryset.order_by('-published_at')
+            return queryset.order_by('-published_at', '-id')
         return queryset
\ No newline at end of file
@@ -0,0 +1,371 @@
+"""
+Article image pipeline.
+
+An image is processed once, when it is uploaded: the original is stored
+through the configured backend, its dimensions and an inline blurred
+placeholder are recorded, and the URL of every responsive variant
+(``settings.IMAGE_PIPELINE['VARIANTS']``, by width) is computed up front.
+All of it lands in ``Article.image_variants``, so serializers return stored
+strings and never build URLs per request:
+
+    {
+        "width": 4000, "height": 2667,
+        "original": "https://...",
+        "thumb": {"url": "...", "width": 320, "height": 213},
+        "card": {...}, "hero": {...},
+        "srcset": "... 320w, ... 640w, ... 1280w",
+        "placeholder": "data:image/jpeg;base64,..."
+    }
+
+Backends:
+
+- ``news.images.CloudinaryImageBackend``: uploads the original to Cloudinary;
+  variants are Cloudinary transformation URLs (resized and re-encoded on
+  their CDN), so only one upload happens per image.
+- ``news.images.LocalImageBackend``: writes the original and resized copies
+  under MEDIA_ROOT with Pillow. It needs no network, for tests and offline runs.
+"""
+import base64
+import io
+import ipaddress
+import os
+import socket
+import uuid
+from functools import lru_cache, partial
+from urllib.parse import urljoin, urlparse
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.module_loading import import_string
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_VARIANTS = {'thumb': 320, 'card': 640, 'hero': 1280}
+PLACEHOLDER_SIZE = 16
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+# What Pillow raises for truncated or corrupt files
+UNREADABLE_IMAGE_ERRORS = (OSError, ValueError, SyntaxError)
+
+
+def pipeline_setting(name, default):
+    return getattr(settings, 'IMAGE_PIPELINE', {}).get(name, default)
+
+
+def variant_widths():
+    return pipeline_setting('VARIANTS', DEFAULT_VARIANTS)
+
+
+def scaled_size(width, height, max_width):
+    """(width, height) after shrinking to ``max_width``, never enlarging."""
+    if not width or not height or width <= max_width:
+        return width, height
+    return max_width, max(1, round(height * max_width / width))
+
+
+def open_image(data):
+    from PIL import Image
+
+    return Image.open(io.BytesIO(data))
+
+
+def inspect_image_header(fileobj):
+    """
+    (format, width, height) from the image header alone; nothing is decoded.
+
+    Raises ValueError for files that are not an allowed image type or are
+    larger than ``IMAGE_PIPELINE['MAX_PIXELS']``.
+    """
+    from PIL import Image
+
+    position = fileobj.tell()
+    try:
+        with Image.open(fileobj) as image:
+            image_format, (width, height) = image.format, image.size
+    except (Image.DecompressionBombError, *UNREADABLE_IMAGE_ERRORS) as exc:
+        raise ValueError("Upload a valid image. The file you uploaded was either not an image or a corrupted image.") from exc
+    finally:
+        fileobj.seek(position)
+    if image_format not in ALLOWED_FORMATS:
+        raise ValueError(f"Unsupported image format {image_format}; use one of {', '.join(ALLOWED_FORMATS)}.")
+    if width * height > pipeline_setting('MAX_PIXELS', 50_000_000):
+        raise ValueError(f"Image is too large ({width}x{height}).")
+    return image_format, width, height
+
+
+def verify_image(data):
+    """Check the whole file is intact before it is stored; raises one of UNREADABLE_IMAGE_ERRORS."""
+    with open_image(data) as image:
+        if image.format == 'JPEG':
+            # verify() is a no-op for JPEG; a reduced-scale decode still reads every byte
+            image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+            image.load()
+        else:
+            image.verify()
+
+
+def make_placeholder(data):
+    """A tiny blurred JPEG of the image as a data URI, to paint while the real one loads."""
+    from PIL import ImageFilter
+
+    image = open_image(data)
+    # JPEG decodes straight to a reduced scale here, so big photos stay cheap
+    image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+    image = image.convert('RGB')
+    image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    image = image.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+class ImageBackend:
+    """Interface every image backend implements."""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def store(self, data, name):
+        """
+        Store the original image bytes.
+
+        Returns ``(image_value, original_url)``; ``image_value`` is what goes
+        into ``Article.image``.
+        """
+        raise NotImplementedError
+
+    def variant_url(self, image_value, data, name, width, height):
+        """URL of the image resized to ``width`` x ``height`` (storing it first if the backend has to)."""
+        raise NotImplementedError
+
+
+class CloudinaryImageBackend(ImageBackend):
+    def __init__(self, folder='article', **options):
+        super().__init__(**options)
+        self.folder = folder
+
+    def store(self, data, name):
+        import cloudinary.uploader
+
+        resource = cloudinary.uploader.upload_resource(io.BytesIO(data), folder=self.folder)
+        return resource, resource.build_url(secure=True)
+
+    def variant_url(self, image_value, data, name, width, height):
+        return image_value.build_url(width=width, crop='limit', quality='auto', fetch_format='auto', secure=True)
+
+
+class LocalImageBackend(ImageBackend):
+    def __init__(self, location=None, base_url=None, **options):
+        super().__init__(**options)
+        self.storage = FileSystemStorage(
+            location=location or os.path.join(settings.MEDIA_ROOT, 'article'),
+            base_url=base_url or f"{settings.MEDIA_URL}article/",
+        )
+
+    def store(self, data, name):
+        stored = self.storage.save(name, ContentFile(data))
+        # Article.image is a Cloudinary reference; local images live only in image_variants
+        return 'placeholder', self.storage.url(stored)
+
+    def variant_url(self, image_value, data, name, width, height):
+        image = open_image(data)
+        image.draft('RGB', (width, height))
+        image = image.convert('RGB').resize((width, height))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=82)
+        root, _ = os.path.splitext(name)
+        stored = self.storage.save(f"{root}_{width}w.jpg", ContentFile(buffer.getvalue()))
+        return self.storage.url(stored)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(pipeline_setting('BACKEND', 'news.images.CloudinaryImageBackend'))(
+        **pipeline_setting('OPTIONS', {})
+    )
+
+
+def build_variants(backend, image_value, original_url, data, name, width, height):
+    variants = {'width': width, 'height': height, 'original': original_url}
+    srcset = {}
+    for label, max_width in variant_widths().items():
+        variant_width, variant_height = scaled_size(width, height, max_width)
+        if variant_width == width:
+            url = original_url
+        else:
+            url = backend.variant_url(image_value, data, name, variant_width, variant_height)
+        variants[label] = {'url': url, 'width': variant_width, 'height': variant_height}
+        srcset[variant_width] = url
+    variants['srcset'] = ', '.join(f"{url} {w}w" for w, url in sorted(srcset.items()))
+    return variants
+
+
+def process_image(data, name=None, backend=None, stored=None):
+    """
+    Store ``data`` (the uploaded file's bytes) and compute its variants.
+
+    Returns ``(image_value, variants)`` for ``Article.image`` and
+    ``Article.image_variants``. Pass ``stored=(image_value, original_url)``
+    for an image that is already stored to only compute its variants.
+    """
+    backend = backend or get_backend()
+    width, height = open_image(data).size
+    name = name or f"{uuid.uuid4().hex}.jpg"
+    image_value, original_url = stored or backend.store(data, name)
+    variants = build_variants(backend, image_value, original_url, data, name, width, height)
+    variants['placeholder'] = make_placeholder(data)
+    return image_value, variants
+
+
+def check_remote_url(url):
+    """
+    Refuse URLs an import must not fetch: anything but http(s), and hosts
+    resolving to private, loopback, link-local or otherwise non-public
+    addresses (internal services, cloud metadata endpoints).
+
+    Returns the address to connect to; see PinnedAddressAdapter.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError("Only http and https image URLs are allowed.")
+    try:
+        # dict, not set: keep the resolver's order of preference
+        addresses = dict.fromkeys(info[4][0] for info in socket.getaddrinfo(parsed.hostname, parsed.port, proto=socket.IPPROTO_TCP))
+    except (socket.gaierror, UnicodeError) as exc:
+        raise ValueError(f"Cannot resolve image host {parsed.hostname}.") from exc
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"Image host {parsed.hostname} resolves to a non-public address.")
+    return next(iter(addresses))
+
+
+class PinnedConnectionMixin:
+    pinned_address = None
+
+    def _new_conn(self):
+        if self.pinned_address is None:
+            return super()._new_conn()
+        # Only the socket goes to the pinned address; self.host (Host header, SNI, certificate) is restored
+        host, self._dns_host = self._dns_host, self.pinned_address
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+
+
+class PinnedHTTPConnection(PinnedConnectionMixin, HTTPConnection):
+    pass
+
+
+class PinnedHTTPSConnection(PinnedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class PinnedPoolMixin:
+    def __init__(self, *args, pinned_address=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pinned_address = pinned_address
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.pinned_address = self.pinned_address
+        return conn
+
+
+class PinnedHTTPConnectionPool(PinnedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = PinnedHTTPConnection
+
+
+class PinnedHTTPSConnectionPool(PinnedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = PinnedHTTPSConnection
+
+
+class PinnedAddressAdapter(HTTPAdapter):
+    """
+    requests transport adapter connecting to one address, whatever the URL's
+    host resolves to by then.
+
+    Resolving the host again at connect time would let a DNS answer that
+    changed since check_remote_url() (DNS rebinding) point the request at an
+    internal address. The Host header, TLS SNI and certificate check still use
+    the hostname from the URL.
+    """
+
+    def __init__(self, address, **kwargs):
+        self.address = address
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': partial(PinnedHTTPConnectionPool, pinned_address=self.address),
+            'https': partial(PinnedHTTPSConnectionPool, pinned_address=self.address),
+        }
+
+
+def pinned_session(address):
+    session = requests.Session()
+    # A proxy would resolve the host itself
+    session.trust_env = False
+    adapter = PinnedAddressAdapter(address)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_remote_image(url, max_bytes=None, timeout=(3.05, 20)):
+    """
+    Download an image for process_image(), refusing anything over ``max_bytes``.
+
+    Every URL, including each redirect target, goes through check_remote_url()
+    and is then fetched from the address it vetted.
+    """
+    max_bytes = max_bytes or pipeline_setting('MAX_BYTES', 20 * 1024 * 1024)
+    for _ in range(pipeline_setting('MAX_REDIRECTS', 5) + 1):
+        address = check_remote_url(url)
+        with pinned_session(address) as session, \
+                session.get(url, stream=True, timeout=timeout, allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers['Location'])
+                continue
+            response.raise_for_status()
+            chunks, size = [], 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"Image is larger than {max_bytes} bytes.")
+                chunks.append(chunk)
+        return b''.join(chunks)
+    raise ValueError("Too many redirects while fetching the image.")
+
+
+def image_url(article):
+    """The original image URL of ``article``, or None; reads stored data only."""
+    variants = article.image_variants or {}
+    if variants.get('original'):
+        return variants['original']
+    # Images uploaded before the pipeline existed have no variants yet
+    if article.image and str(article.image) != 'placeholder':
+        return article.image.url
+    return None
+
+
+def image_set(article):
+    """Responsive image data for serializers (variants, srcset, size, placeholder), or None."""
+    variants = article.image_variants or {}
+    if not variants:
+        return None
+    return {key: value for key, value in variants.items() if key != 'original'}
+
+
+def variant_url(article, label):
+    """URL of the ``label`` variant, falling back to the original image."""
+    variant = (article.image_variants or {}).get(label)
+    if variant:
+        return variant['url']
+    return image_url(article)
@@ -0,0 +1,129 @@
+"""
+Bulk article ingestion for wire-feed imports.
+
+``ingest_articles`` takes an iterable of plain dicts (parsed from a JSON array
+or NDJSON), validates them a batch at a time with one category lookup per
+batch, fetches and processes any ``image_url`` (see news.images) concurrently
+through a bounded thread pool, inserts the valid rows with ``bulk_create`` and returns one result per input
+record, in input order.
+"""
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlparse
+
+from django.conf import settings
+from rest_framework import serializers
+
+from news.cache import invalidate
+from news.images import UNREADABLE_IMAGE_ERRORS, fetch_remote_image, inspect_image_header, process_image, verify_image
+from news.models import Article, Category
+from news.search import invalidate_index
+
+
+class ArticleImportSerializer(serializers.Serializer):
+    headline = serializers.CharField(max_length=300)
+    body = serializers.CharField()
+    category = serializers.IntegerField()
+    is_published = serializers.BooleanField(default=False)
+    published_at = serializers.DateTimeField(required=False, allow_null=True)
+    image_url = serializers.URLField(required=False, allow_blank=True)
+
+
+def import_setting(name, default):
+    return getattr(settings, 'ARTICLE_IMPORT', {}).get(name, default)
+
+
+def iter_ndjson(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def upload_remote_image(url):
+    """Download an image by URL and run it through the pipeline; returns (image, image_variants)."""
+    data = fetch_remote_image(url)
+    # Same checks as an upload: allowed format and pixel count first, then the whole file
+    inspect_image_header(io.BytesIO(data))
+    try:
+        verify_image(data)
+    except UNREADABLE_IMAGE_ERRORS as exc:
+        raise ValueError("The image at image_url is corrupt or truncated.") from exc
+    return process_image(data, name=os.path.basename(urlparse(url).path) or None)
+
+
+def _validate_batch(records, offset, known_categories):
+    valid, results = [], []
+    for index, record in enumerate(records, offset):
+        serializer = ArticleImportSerializer(data=record)
+        if not serializer.is_valid():
+            results.append({'index': index, 'status': 'error', 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        if data['category'] not in known_categories:
+            results.append({'index': index, 'status': 'error', 'errors': {'category': ['Unknown category.']}})
+            continue
+        valid.append((index, data))
+        results.append(None)
+    return valid, results
+
+
+def _upload_images(valid, results, offset, executor):
+    futures = {
+        index: executor.submit(upload_remote_image, data['image_url'])
+        for index, data in valid if data.get('image_url')
+    }
+    uploaded, kept = {}, []
+    for index, data in valid:
+        future = futures.get(index)
+        if future is not None:
+            try:
+                uploaded[index] = future.result()
+            except Exception as exc:
+                results[index - offset] = {'index': index, 'status': 'error', 'errors': {'image_url': [str(exc)]}}
+                continue
+        kept.append((index, data))
+    return kept, uploaded
+
+
+def ingest_articles(records, author, batch_size=None, image_workers=None):
+    """Validate, upload and insert ``records`` in batches; returns per-record results."""
+    batch_size = batch_size or import_setting('BATCH_SIZE', 500)
+    image_workers = image_workers or import_setting('IMAGE_WORKERS', 8)
+    known_categories = set(Category.objects.values_list('id', flat=True))
+    records = iter(records)
+    results, offset = [], 0
+
+    with ThreadPoolExecutor(max_workers=image_workers, thread_name_prefix='article-import') as executor:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            valid, batch_results = _validate_batch(batch, offset, known_categories)
+            valid, images = _upload_images(valid, batch_results, offset, executor)
+
+            articles = []
+            for index, data in valid:
+                image, image_variants = images.get(index, ('placeholder', {}))
+                article = Article(
+                    headline=data['headline'], body=data['body'], category_id=data['category'], author=author,
+                    image=image, image_variants=image_variants,
+                )
+                if data['is_published']:
+                    article.schedule(data.get('published_at'))
+                articles.append(article)
+            Article.objects.bulk_create(articles)
+
+            for (index, _), article in zip(valid, articles):
+                batch_results[index - offset] = {'index': index, 'status': 'created', 'id': article.pk}
+            results.extend(batch_results)
+            offset += len(batch)
+
+    if offset:
+        # bulk_create skips Article.save(); refresh derived state once for the whole import
+        invalidate_index()
+        invalidate('articles')
+    return results
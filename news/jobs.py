@@ -0,0 +1,35 @@
+import os
+
+from django.utils import timezone
+
+from api.scheduler import job
+from news.cache import invalidate
+from news.images import pipeline_setting
+from news.models import Article
+from news.uploads import process_staged_image
+
+
+@job(interval=60)
+def publish_due_articles():
+    """Publish every scheduled article whose time has come in one UPDATE."""
+    published = Article.objects.due_for_publication().update(is_published=True, updated_at=timezone.now())
+    if published:
+        # update() skips Article.save(), so invalidate once for the whole batch
+        invalidate('articles')
+    return {'published': published}
+
+
+@job(interval=60)
+def process_pending_images():
+    """Retry image uploads a worker has not finished within IMAGE_PIPELINE['STALE_AFTER'] seconds."""
+    cutoff = timezone.now() - timezone.timedelta(seconds=pipeline_setting('STALE_AFTER', 300))
+    stale = Article.objects.pending_assets().filter(updated_at__lt=cutoff).values_list('id', 'pending_image')
+    processed = failed = 0
+    for article_id, path in stale:
+        try:
+            process_staged_image(article_id, path, os.path.basename(path))
+        except Exception:
+            failed += 1
+        else:
+            processed += 1
+    return {'processed': processed, 'failed': failed}
@@ -0,0 +1,57 @@
+import platform
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from news.benchmarks import (
+    SCENARIOS, BenchContext, run_scenario, compare, load_baseline, save_results, results_as_dict,
+)
+
+
+class Command(BaseCommand):
+    help = "Replay scripted requests against the API hot paths and report latency, queries and throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), dest='scenarios',
+                            help="Run only this scenario (repeatable). Default: all.")
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help="Keep the response cache between requests instead of measuring the uncached path.")
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+        parser.add_argument('--baseline', help="Compare against a results file written by --output.")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed p95 slowdown against the baseline.")
+
+    def handle(self, *args, **options):
+        try:
+            ctx = BenchContext()
+        except Exception as exc:
+            raise CommandError(str(exc))
+
+        results = []
+        self.stdout.write(f"{'scenario':28} {'n':>5} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6} {'req/s':>7}")
+        for name in options['scenarios'] or SCENARIOS:
+            result = run_scenario(name, ctx, options['requests'], options['warmup'], options['warm_cache'])
+            results.append(result)
+            s = result.summary()
+            self.stdout.write(
+                f"{name:28} {s['requests']:>5} {s['errors']:>4} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} "
+                f"{s['p99_ms']:>8.2f} {s['queries_per_request']:>6} {s['throughput_rps']:>7}"
+            )
+
+        summaries = results_as_dict(results)
+        if options['output']:
+            save_results(options['output'], summaries, {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'requests': options['requests'],
+                'warm_cache': options['warm_cache'],
+            })
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            regressions = compare(summaries, load_baseline(options['baseline']), options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
@@ -0,0 +1,65 @@
+import platform
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from news.benchmarks import CONCURRENCY_SCENARIOS, BenchContext, run_concurrency, save_results, results_as_dict
+
+MODES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the public read endpoints under many concurrent clients: threaded WSGI "
+        "against the async views on the ASGI handler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=CONCURRENCY_SCENARIOS, dest='scenarios',
+                            help="Run only this scenario (repeatable). Default: all.")
+        parser.add_argument('--mode', action='append', choices=MODES, dest='modes', help="Default: both.")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per scenario and mode.")
+        parser.add_argument('--concurrency', type=int, default=100, help="Clients with a request in flight.")
+        parser.add_argument('--workers', type=int, default=8, help="WSGI worker threads.")
+        parser.add_argument('--client-delay-ms', type=int, default=0,
+                            help="Time each client takes to read a response (slow mobile readers).")
+        parser.add_argument('--warm-cache', action='store_true',
+                            help="Use the configured cache instead of measuring the uncached path.")
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        try:
+            ctx = BenchContext()
+        except Exception as exc:
+            raise CommandError(str(exc))
+
+        results = []
+        self.stdout.write(
+            f"{'scenario':28} {'mode':>5} {'n':>5} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>7}"
+        )
+        for name in options['scenarios'] or CONCURRENCY_SCENARIOS:
+            for mode in options['modes'] or MODES:
+                result = run_concurrency(
+                    name, ctx, mode, requests=options['requests'], concurrency=options['concurrency'],
+                    workers=options['workers'], client_delay_ms=options['client_delay_ms'],
+                    warm_cache=options['warm_cache'],
+                )
+                results.append(result)
+                s = result.summary()
+                self.stdout.write(
+                    f"{name:28} {mode:>5} {s['requests']:>5} {s['errors']:>4} {s['p50_ms']:>8.2f} "
+                    f"{s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['throughput_rps']:>7}"
+                )
+
+        if options['output']:
+            save_results(options['output'], results_as_dict(results), {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'workers': options['workers'],
+                'client_delay_ms': options['client_delay_ms'],
+                'warm_cache': options['warm_cache'],
+            })
+            self.stdout.write(f"Results written to {options['output']}")
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from news.cache import invalidate
+from news.images import fetch_remote_image, process_image
+from news.models import Article
+
+
+def build(article):
+    # Already stored: download it once to measure it and compute the variants, no re-upload
+    data = fetch_remote_image(article.image.url)
+    _, variants = process_image(data, stored=(article.image, article.image.build_url(secure=True)))
+    return variants
+
+
+class Command(BaseCommand):
+    help = "Compute image_variants for articles whose image was uploaded before the image pipeline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Process at most this many articles.")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent downloads.")
+
+    def handle(self, *args, **options):
+        queryset = (
+            Article.objects.filter(image_variants={}).exclude(image__isnull=True).exclude(image='placeholder')
+            .only('id', 'image').order_by('id')
+        )
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+        articles = list(queryset)
+
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for article, future in [(article, executor.submit(build, article)) for article in articles]:
+                try:
+                    variants = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"Article {article.pk}: {exc}")
+                    continue
+                Article.objects.filter(pk=article.pk).update(image_variants=variants, updated_at=timezone.now())
+                done += 1
+        if done:
+            invalidate('articles')
+        self.stdout.write(self.style.SUCCESS(f"Built image variants for {done} article(s), {failed} failed."))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from news.models import Article, Review
+from users.models import PaymentTransaction
+
+
+def hot_queries():
+    """(label, queryset, index expected in its plan, or a tuple of accepted ones) for the main read paths."""
+    article = Article.objects.published()
+    return [
+        ('public feed', article.order_by('-published_at', '-id')[:10], 'news_article_feed_idx'),
+        ('category feed', article.filter(category_id=1).order_by('-published_at')[:10], 'news_article_cat_feed_idx'),
+        ('article reviews', Review.objects.filter(article_id=1).order_by('-created_at')[:10], 'news_review_art_created_idx'),
+        # Payment callbacks; tran_id is unique, so the index is named by the database:
+        # users_paymenttransaction_tran_id_key on PostgreSQL, sqlite_autoindex_users_paymenttransaction_N on SQLite
+        ('payment by tran_id', PaymentTransaction.objects.filter(tran_id='txn:1_1_0'),
+         ('users_paymenttransaction_tran_id', 'sqlite_autoindex_users_paymenttransaction')),
+    ]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot read queries and fail unless each one is served by its index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every query plan.")
+
+    def handle(self, *args, **options):
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small or empty tables make a sequential scan the cheapest plan;
+                # rule it out so the check is about index availability, not table size
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for label, queryset, indexes in hot_queries():
+                plan = queryset.explain()
+                if options['verbose_plans']:
+                    self.stdout.write(f"-- {label}\n{plan}\n")
+                indexes = (indexes,) if isinstance(indexes, str) else indexes
+                used = next((index for index in indexes if index in plan), None)
+                if used:
+                    self.stdout.write(f"ok    {label}: {used}")
+                else:
+                    self.stdout.write(self.style.ERROR(f"FAIL  {label}: expected {' or '.join(indexes)}"))
+                    failures.append(label)
+        if failures:
+            raise CommandError(f"{len(failures)} query plan(s) not using their index: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries use their indexes."))
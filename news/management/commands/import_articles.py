@@ -0,0 +1,46 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from news.ingest import ingest_articles, iter_ndjson
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Import articles from a JSON array or NDJSON file (use - for stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or - for stdin.")
+        parser.add_argument('--author', required=True, help="Email of the editor the articles are attributed to.")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--image-workers', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(email=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['author']}")
+
+        handle = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        with handle:
+            first = handle.read(1)
+            while first and first.isspace():
+                first = handle.read(1)
+            if first == '[':
+                records = json.loads(first + handle.read())
+            else:
+                # Stream NDJSON so huge feeds are never held in memory at once
+                records = iter_ndjson(self.lines(first, handle))
+            results = ingest_articles(records, author, options['batch_size'], options['image_workers'])
+
+        failed = [result for result in results if result['status'] != 'created']
+        for result in failed[:50]:
+            self.stderr.write(f"#{result['index']}: {json.dumps(result['errors'])}")
+        if len(failed) > 50:
+            self.stderr.write(f"... and {len(failed) - 50} more errors")
+        self.stdout.write(self.style.SUCCESS(f"Imported {len(results) - len(failed)} article(s), {len(failed)} failed."))
+
+    @staticmethod
+    def lines(first, handle):
+        yield first + handle.readline()
+        yield from handle
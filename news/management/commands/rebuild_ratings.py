@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from news.models import Article
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized review_count/rating_sum columns on Article."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--article', type=int, action='append', dest='article_ids',
+                            help="Only rebuild the given article id (repeatable).")
+
+    def handle(self, *args, **options):
+        queryset = Article.objects.all()
+        if options['article_ids']:
+            queryset = queryset.filter(pk__in=options['article_ids'])
+        updated = Article.rebuild_ratings(queryset)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates for {updated} article(s)."))
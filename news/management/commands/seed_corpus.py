@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from news.benchmarks import seed_corpus, flush_corpus
+
+
+class Command(BaseCommand):
+    help = "Seed a synthetic corpus of categories, articles, reviews and users for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--articles', type=int, default=1000)
+        parser.add_argument('--reviews', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--subscribed', type=float, default=0.2, help="Fraction of users with an active subscription.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--flush', action='store_true', help="Delete a previously seeded corpus first.")
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            flush_corpus()
+            self.stdout.write("Flushed previous benchmark corpus.")
+        counts = seed_corpus(
+            categories=options['categories'],
+            articles=options['articles'],
+            reviews=options['reviews'],
+            users=options['users'],
+            subscribed=options['subscribed'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded " + ", ".join(f"{count} {name}" for name, count in counts.items()) + "."
+        ))
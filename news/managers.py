@@ -0,0 +1,90 @@
+from django.db import models
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+# Columns each article serializer actually reads; keep in sync with news.serializers
+DETAIL_FIELDS = (
+    'id', 'headline', 'image', 'image_variants', 'body', 'published_at', 'review_count', 'rating_sum',
+    'category__id', 'category__name', 'category__description', 'category__is_premium',
+)
+LIST_FIELDS = ('id', 'category_id', 'headline', 'image', 'image_variants', 'body', 'published_at', 'author_id')
+CATEGORY_FIELDS = ('category__id', 'category__name', 'category__description', 'category__is_premium')
+# Serializer field name -> model columns it reads, for sparse fieldsets (see news.projections)
+PROJECTION_COLUMNS = {
+    'id': ('id',),
+    'headline': ('headline',),
+    'image': ('image', 'image_variants'),
+    'image_set': ('image_variants',),
+    'body': ('body',),
+    'published_at': ('published_at',),
+    'author': ('author_id',),
+    'rating': ('review_count', 'rating_sum'),
+    'rating_avg': ('review_count', 'rating_sum'),
+    'review_count': ('review_count',),
+}
+EXCERPT_LENGTH = 200
+
+
+class ArticleQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(is_published=True, assets_ready=True)
+
+    def pending_assets(self):
+        """Articles with an uploaded image that has not been processed yet (see news.uploads)."""
+        return self.exclude(pending_image='')
+
+    def scheduled(self):
+        """Unpublished articles with a publication time set (see Article.schedule)."""
+        return self.filter(is_published=False, published_at__isnull=False)
+
+    def due_for_publication(self, now=None):
+        return self.scheduled().filter(published_at__lte=now or timezone.now())
+
+    def for_detail(self):
+        """Shape for ArticleDetailSerializer: category joined, unused columns deferred."""
+        return self.select_related('category').only(*DETAIL_FIELDS)
+
+    def for_list(self):
+        """Shape for ArticleSerializer: category is rendered from its pk, no join needed."""
+        return self.only(*LIST_FIELDS)
+
+    def with_excerpt(self, length=EXCERPT_LENGTH):
+        """Annotate ``excerpt``: the start of the body, cut in SQL so the body itself can stay deferred."""
+        # One character over so the serializer can tell a cut body from a short one
+        return self.annotate(excerpt=Substr('body', 1, length + 1))
+
+    def project(self, fields, nested_category=False):
+        """Load only the columns ``fields`` (serializer field names) read, plus the pagination keys."""
+        columns = {'id', 'published_at'}
+        for name in fields:
+            columns.update(PROJECTION_COLUMNS.get(name, ()))
+        queryset = self
+        if 'category' in fields:
+            if nested_category:
+                queryset = queryset.select_related('category')
+                columns.update(CATEGORY_FIELDS)
+            else:
+                columns.add('category_id')
+        if 'excerpt' in fields:
+            queryset = queryset.with_excerpt()
+        return queryset.only(*columns)
+
+    def for_action(self, action, detail_actions=('list', 'retrieve', 'homepage')):
+        if action in detail_actions:
+            return self.for_detail()
+        return self
+
+
+class ReviewQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Shape for ReviewSerializer: article headline, user, subscription and plan in one join."""
+        return self.select_related('article', 'user__subscription__plan').defer(
+            'article__body', 'article__search_vector',
+        )
+
+    def for_public_listing(self):
+        """Shape for PublicReviewSerializer, which only shows the reviewer's name."""
+        return self.select_related('article', 'user').only(
+            'id', 'comment', 'ratings', 'created_at', 'article__id', 'article__headline',
+            'user__id', 'user__first_name', 'user__last_name',
+        )
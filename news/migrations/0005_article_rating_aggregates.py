@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_ratings(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    Review = apps.get_model('news', 'Review')
+    reviews = Review.objects.filter(article=OuterRef('pk')).order_by().values('article')
+    Article.objects.update(
+        review_count=Coalesce(Subquery(reviews.annotate(c=Count('pk')).values('c')), Value(0)),
+        rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum('ratings')).values('s')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_category_is_premium'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
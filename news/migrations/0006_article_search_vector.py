@@ -0,0 +1,69 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:13
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Mirrors news.search.SEARCH_CONFIG and its headline-over-body weighting
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION news_article_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.headline, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.body, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS news_article_search_vector_trigger ON news_article;
+CREATE TRIGGER news_article_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF headline, body ON news_article
+    FOR EACH ROW EXECUTE FUNCTION news_article_search_vector_update();
+
+UPDATE news_article SET search_vector =
+    setweight(to_tsvector('english', coalesce(headline, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(body, '')), 'B');
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS news_article_search_vector_trigger ON news_article;
+DROP FUNCTION IF EXISTS news_article_search_vector_update();
+"""
+
+
+def postgres_only(sql):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_article_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # GIN only exists on PostgreSQL; other backends use the in-process index in news.search
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='article',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='news_article_search_gin'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(
+                    postgres_only('CREATE INDEX news_article_search_gin ON news_article USING gin (search_vector);'),
+                    postgres_only('DROP INDEX IF EXISTS news_article_search_gin;'),
+                ),
+            ],
+        ),
+        migrations.RunPython(postgres_only(CREATE_TRIGGER), postgres_only(DROP_TRIGGER)),
+    ]
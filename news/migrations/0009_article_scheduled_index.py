@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_published', False), ('published_at__isnull', False)), fields=['published_at'], name='news_article_scheduled_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0011_article_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='assets_ready',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='pending_image',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def clear_retracted_published_at(apps, schema_editor):
+    # Unpublished articles keeping a past publication time were retracted before scheduling
+    # existed; left alone, publish_due_articles would treat them as due and republish them
+    Article = apps.get_model('news', 'Article')
+    Article.objects.filter(is_published=False, published_at__lte=timezone.now()).update(published_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0012_article_assets_ready'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_retracted_published_at, migrations.RunPython.noop),
+    ]
@@ -1,37 +1,162 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F,Sum,Count,OuterRef,Subquery,Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.core.validators import MinValueValidator,MaxValueValidator
 from django.utils import timezone
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from cloudinary.models import CloudinaryField
+from news.managers import ArticleQuerySet,ReviewQuerySet
+from news import search
+from news.cache import invalidate
 # Create your models here.
 class Category(models.Model):
     name = models.CharField(max_length=100,unique=True)
     description = models.CharField(max_length=250,blank=True,null=True)
     is_premium = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now_add=True)    
-    
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Articles embed their category, so both cached namespaces go stale
+        invalidate('categories', 'articles')
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate('categories', 'articles')
+        return result
+
 
 class Article(models.Model):
     headline = models.CharField(max_length=300)
     body = models.TextField()
     # image = models.ImageField(upload_to='article/',blank=True,null=True)
     image =CloudinaryField('article_image' ,default='placeholder', blank=True, null=True)
+    # Sizes, responsive variant URLs and placeholder computed at upload (see news.images)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # False while an uploaded image is being processed in the background (news.uploads);
+    # the article stays out of public feeds until then
+    assets_ready = models.BooleanField(default=True)
+    pending_image = models.CharField(max_length=500, blank=True, default='', editable=False)
     category = models.ForeignKey(Category,on_delete=models.CASCADE)
     author = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE)
     published_at = models.DateTimeField(blank=True,null=True)
     is_published= models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Backs the ETag/Last-Modified validators (news.conditional); set it in update() calls too
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized from Review so feeds can serve ratings without touching reviews
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    # Weighted headline/body tsvector, maintained by a trigger on PostgreSQL (see news.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ArticleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='news_article_search_gin'),
+            # Keyset pagination for public feeds (news.pagination.ArticleCursorPagination)
+            models.Index(
+                fields=['-published_at', '-id'],
+                name='news_article_feed_idx',
+                condition=models.Q(is_published=True),
+            ),
+            # Embargoed articles waiting for news.jobs.publish_due_articles
+            models.Index(
+                fields=['published_at'],
+                name='news_article_scheduled_idx',
+                condition=models.Q(is_published=False, published_at__isnull=False),
+            ),
+            # Per-category feeds (ArticleFilter.category_id + last_news)
+            models.Index(
+                fields=['category', '-published_at'],
+                name='news_article_cat_feed_idx',
+                condition=models.Q(is_published=True),
+            ),
+            # Max(updated_at) over the public feed for its validators
+            models.Index(
+                fields=['updated_at'],
+                name='news_article_pub_updated_idx',
+                condition=models.Q(is_published=True),
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.update_search_index(kwargs.get('update_fields'))
+        invalidate('articles')
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(lambda: search.remove_from_index(pk))
+        invalidate('articles')
+        return result
 
+    def update_search_index(self, update_fields=None):
+        """Refresh this article's entry in the fallback search index (news.search) once the save commits."""
+        indexed = {'headline', 'body'}
+        if update_fields is not None and not indexed & set(update_fields):
+            return
+        if indexed & self.get_deferred_fields():
+            # Not all of the text is loaded; let the next search rebuild from the table
+            search.invalidate_index()
+            return
+        pk, headline, body = self.pk, self.headline, self.body
+        transaction.on_commit(lambda: search.update_index(pk, headline, body))
 
-    def publish(self):
-        self.is_published = True
+    @property
+    def rating_avg(self):
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 2)
 
-        if not self.published_at:
-            self.published_at = timezone.now()
+    @classmethod
+    def adjust_rating(cls, article_id, count_delta, ratings_delta):
+        """Apply a review write to the stored aggregates in a single UPDATE."""
+        cls.objects.filter(pk=article_id).update(
+            review_count=F('review_count') + count_delta,
+            rating_sum=F('rating_sum') + ratings_delta,
+            updated_at=timezone.now(),
+        )
+        invalidate('articles')
+
+    @classmethod
+    def rebuild_ratings(cls, queryset=None):
+        """Recompute review_count/rating_sum from the reviews table, set-based."""
+        if queryset is None:
+            queryset = cls.objects.all()
+        reviews = Review.objects.filter(article=OuterRef('pk')).order_by().values('article')
+        updated = queryset.update(
+            review_count=Coalesce(Subquery(reviews.annotate(c=Count('pk')).values('c')), Value(0)),
+            rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum('ratings')).values('s')), Value(0)),
+            updated_at=timezone.now(),
+        )
+        invalidate('articles')
+        return updated
+
+    @property
+    def is_scheduled(self):
+        return not self.is_published and self.published_at is not None
+
+    def schedule(self, at=None):
+        """
+        Set the publication time without saving. A time in the future keeps the
+        article hidden (is_published=False) until the publish_due_articles job
+        flips it; a past or missing time publishes it now.
+        """
+        now = timezone.now()
+        self.published_at = at or self.published_at or now
+        self.is_published = self.published_at <= now
+
+    def publish(self, at=None):
+        self.schedule(at)
         self.save()
     def __str__(self):
         return self.headline
@@ -44,5 +169,12 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ReviewQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['article', '-created_at'], name='news_review_art_created_idx'),
+        ]
+
     def __str__(self):
         return f"Review by {self.user.first_name} on {self.article.headline}"
\ No newline at end of file
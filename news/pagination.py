@@ -0,0 +1,94 @@
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.settings import api_settings
+
+
+class ArticleCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (published_at, id); backed by news_article_feed_idx.
+
+    Not available for ``?search=``: the cursor's ordering would replace the
+    relevance ranking, so search results are paged by number only.
+    """
+    ordering = ('-published_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(api_settings.SEARCH_PARAM, '').strip():
+            raise ValidationError({'pagination': "Search results are ranked and cannot be cursor-paginated; use page numbers."})
+        # A cursor position cannot be built from a NULL published_at
+        return super().paginate_queryset(queryset.filter(published_at__isnull=False), request, view)
+
+
+class CursorPaginationOptInMixin:
+    """
+    Let clients opt into keyset pagination with ``?pagination=cursor``.
+
+    Follow-up requests carry ``?cursor=...`` (from the ``next``/``previous``
+    links), which keeps them in cursor mode. Otherwise the viewset's
+    ``pagination_class`` is used unchanged.
+    """
+    cursor_pagination_class = ArticleCursorPagination
+    pagination_mode_param = 'pagination'
+
+    def uses_cursor_pagination(self):
+        params = self.request.query_params
+        return (
+            params.get(self.pagination_mode_param) == 'cursor'
+            or self.cursor_pagination_class.cursor_query_param in params
+        )
+
+    def is_first_page(self):
+        params = self.request.query_params
+        if self.uses_cursor_pagination():
+            return not params.get(self.cursor_pagination_class.cursor_query_param)
+        return params.get('page', '1') in ('', '1')
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.uses_cursor_pagination():
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+
+async def apaginate_queryset(view, queryset):
+    """
+    ``view.paginate_queryset(queryset)`` for the async views in news.async_views.
+
+    Page-number pages are counted and fetched with the async ORM and leave the
+    paginator ready for ``view.get_paginated_response()``. Cursor pages (a
+    single query inside CursorPagination) go through ``sync_to_async``.
+    """
+    paginator = view.paginator
+    if paginator is None:
+        return None
+    if not isinstance(paginator, PageNumberPagination):
+        return await sync_to_async(view.paginate_queryset)(queryset)
+
+    request = view.request
+    paginator.request = request
+    page_size = paginator.get_page_size(request)
+    if not page_size:
+        return None
+
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    # Paginator.count is a cached_property; filling it in keeps page() from querying
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    page.object_list = [obj async for obj in page.object_list]
+    paginator.page = page
+    if django_paginator.num_pages > 1 and paginator.template is not None:
+        paginator.display_page_controls = True
+    return page.object_list
@@ -0,0 +1,14 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from news.ingest import iter_ndjson
+
+
+class NDJSONParser(BaseParser):
+    """Newline-delimited JSON: one object per line, parsed to a list."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return list(iter_ndjson(line.decode('utf-8') for line in stream))
+        except ValueError as exc:
+            raise ParseError(f"NDJSON parse error - {exc}")
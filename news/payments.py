@@ -0,0 +1,142 @@
+"""
+Payment gateway integration.
+
+Views talk to ``get_gateway()``, never to a provider SDK directly, so the
+provider is chosen by ``settings.PAYMENT_GATEWAY['BACKEND']``:
+
+- ``news.payments.SSLCommerzGateway``: SSLCommerz over a shared keep-alive
+  HTTP session with connect/read timeouts.
+- ``news.payments.FakeGateway``: no network; approves every session, for
+  tests, local development and benchmarks.
+"""
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class PaymentGateway:
+    """Interface every gateway backend implements."""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def create_session(self, post_body):
+        """
+        Open a hosted payment session.
+
+        Returns the provider's response as a dict; a successful one has
+        ``status == 'SUCCESS'`` and a ``GatewayPageURL`` to redirect to.
+        """
+        raise NotImplementedError
+
+
+_session_lock = threading.Lock()
+_http_session = None
+
+
+def get_http_session(pool_size=10):
+    """Process-wide requests.Session so connections to the gateway are reused."""
+    global _http_session
+    with _session_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+        return _http_session
+
+
+class SSLCommerzGateway(PaymentGateway):
+    def __init__(self, store_id, store_pass, issandbox=True, timeout=(3.05, 10), pool_size=10):
+        super().__init__(store_id=store_id, store_pass=store_pass, issandbox=issandbox)
+        self.timeout = tuple(timeout)
+        self.pool_size = pool_size
+        self.client = self._build_client(store_id, store_pass, issandbox)
+
+    def _build_client(self, store_id, store_pass, issandbox):
+        from sslcommerz_lib import SSLCOMMERZ
+
+        gateway = self
+
+        class PooledSSLCOMMERZ(SSLCOMMERZ):
+            # The SDK calls requests.post() with no timeout and a new connection each time
+            def call_api(self, method, url, payload):
+                session = get_http_session(gateway.pool_size)
+                if method == 'POST':
+                    response = session.post(url, data=payload, timeout=gateway.timeout)
+                else:
+                    response = session.get(url, params=payload, timeout=gateway.timeout)
+                response.raise_for_status()
+                return response.json()
+
+        return PooledSSLCOMMERZ({'store_id': store_id, 'store_pass': store_pass, 'issandbox': issandbox})
+
+    def create_session(self, post_body):
+        import requests
+
+        try:
+            return self.client.createSession(dict(post_body))
+        except (requests.RequestException, ValueError) as exc:
+            return {'status': 'FAILED', 'failedreason': str(exc)}
+
+
+class FakeGateway(PaymentGateway):
+    """Approves every session and points the customer straight at the success callback."""
+
+    def __init__(self, latency=0.0, **options):
+        super().__init__(**options)
+        self.latency = latency
+
+    def create_session(self, post_body):
+        if self.latency:
+            time.sleep(self.latency)
+        return {
+            'status': 'SUCCESS',
+            'sessionkey': f"fake-{post_body['tran_id']}",
+            'GatewayPageURL': f"{post_body['success_url']}?tran_id={post_body['tran_id']}",
+        }
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    config = settings.PAYMENT_GATEWAY
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def make_tran_id(user, plan):
+    # The random suffix keeps ids unique in the ledger for checkouts within the same second
+    return f"txn:{user.id}_{plan.id}_{int(timezone.now().timestamp())}_{uuid.uuid4().hex[:8]}"
+
+
+def build_session_request(user, plan, tran_id):
+    """The post body for a subscription checkout, shared by the sync and async views."""
+    return {
+        'total_amount': plan.price_cents,
+        'currency': "BDT",
+        'tran_id': tran_id,
+        'success_url': f"{settings.BACKEND_URL}/api/v1/payment/success",
+        'fail_url': f"{settings.BACKEND_URL}/api/v1/payment/fail",
+        'cancel_url': f"{settings.BACKEND_URL}/api/v1/payment/cancel",
+        'emi_option': 0,
+        'cus_name': f"{user.first_name} {user.last_name}",
+        'cus_email': user.email,
+        'cus_phone': "8978934",
+        'cus_add1': "None",
+        'cus_city': "Dhaka",
+        'cus_country': "Bangladesh",
+        'shipping_method': "NO",
+        'multi_card_name': "",
+        'num_of_item': 1,
+        'product_name': "News Subscription",
+        'product_category': "General",
+        'product_profile': "general",
+    }
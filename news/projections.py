@@ -0,0 +1,88 @@
+"""
+Sparse fieldsets for the article endpoints.
+
+Feed actions (list, homepage) return the compact representation unless
+asked otherwise:
+
+    ?view=compact            ArticleListSerializer: no body, a short excerpt instead (the default)
+    ?view=full               the viewset's regular serializer, body included
+    ?fields=id,headline      only these fields, from whichever serializer is in use
+
+Both apply to every article viewset mixing in ``ArticleProjectionMixin``. On
+list actions the queryset is narrowed to the columns the requested fields read
+(see ``ArticleQuerySet.project``), so dropped fields are not fetched either.
+"""
+from rest_framework.serializers import BaseSerializer
+
+VIEW_PARAM = 'view'
+FIELDS_PARAM = 'fields'
+COMPACT = 'compact'
+FULL = 'full'
+
+
+def requested_fields(request):
+    """The set of field names in ``?fields=``, or None when every field is wanted."""
+    if request is None:
+        return None
+    raw = request.query_params.get(FIELDS_PARAM)
+    if not raw:
+        return None
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    return names or None
+
+
+def requested_view(request, default=FULL):
+    view = request.query_params.get(VIEW_PARAM) if request is not None else None
+    return view if view in (COMPACT, FULL) else default
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin dropping every field not named in the request's ``?fields=``."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = requested_fields(self.context.get('request'))
+        if names:
+            for name in set(self.fields) - names:
+                self.fields.pop(name)
+
+
+class ArticleProjectionMixin:
+    """
+    Viewset mixin selecting the article representation from ``?view=``/``?fields=``.
+
+    ``compact_serializer_class`` is used for ``projection_actions`` unless
+    ``?view=full`` is passed; those actions also get their queryset trimmed
+    with ``project()``, so the body is never loaded for a feed page. Other
+    actions keep their usual serializer and only have the output fields
+    filtered.
+    """
+    compact_serializer_class = None
+    projection_actions = ('list', 'homepage')
+    default_view = COMPACT
+
+    def is_compact_view(self):
+        if self.action not in self.projection_actions:
+            return False
+        return requested_view(self.request, self.default_view) == COMPACT
+
+    def is_projected(self):
+        """True when this list request gets the compact view or asked for a subset of fields."""
+        if self.action not in self.projection_actions:
+            return False
+        return self.is_compact_view() or requested_fields(self.request) is not None
+
+    def project_queryset(self, queryset):
+        """Trim ``queryset`` to the columns the requested view and fields read."""
+        fields = requested_fields(self.request)
+        serializer_class = self.get_serializer_class()
+        serializer_fields = serializer_class.Meta.fields
+        if fields:
+            serializer_fields = [name for name in serializer_fields if name in fields]
+        nested_category = isinstance(serializer_class._declared_fields.get('category'), BaseSerializer)
+        return queryset.project(serializer_fields, nested_category=nested_category)
+
+    def get_serializer_class(self):
+        if self.is_compact_view():
+            return self.compact_serializer_class
+        return super().get_serializer_class()
@@ -0,0 +1,216 @@
+"""
+Full-text search over articles.
+
+On PostgreSQL the ``Article.search_vector`` column (kept current by a database
+trigger, see migration 0006) is matched with a GIN-indexed ``@@`` query and the
+results are ranked with headline matches weighted above body matches.
+
+Other databases (SQLite in local runs and tests) fall back to an in-process
+inverted index with the same query syntax and weighting. It is built from the
+article table on first use; ``Article.save()``/``delete()`` then update only
+that article's entry once the transaction commits, and bulk writes drop the
+index (``invalidate_index()``) so the next search rebuilds it.
+
+Query syntax:
+    storm flood        both terms must match
+    "prime minister"   exact phrase
+    elect*             prefix match
+"""
+import re
+import threading
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Case, F, FloatField, Value, When
+from rest_framework.filters import SearchFilter
+
+SEARCH_CONFIG = 'english'
+HEADLINE_WEIGHT = 1.0
+BODY_WEIGHT = 0.4
+
+QUERY_RE = re.compile(r'"([^"]+)"|(\S+)')
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def parse_query(text):
+    """Split a search string into ('term' | 'prefix' | 'phrase', value) pairs."""
+    terms = []
+    for phrase, word in QUERY_RE.findall(text or ''):
+        if phrase:
+            tokens = tokenize(phrase)
+            if len(tokens) > 1:
+                terms.append(('phrase', ' '.join(tokens)))
+            elif tokens:
+                terms.append(('term', tokens[0]))
+            continue
+        tokens = tokenize(word)
+        if not tokens:
+            continue
+        if word.endswith('*') and len(tokens) == 1:
+            terms.append(('prefix', tokens[0]))
+        else:
+            terms.extend(('term', token) for token in tokens)
+    return terms
+
+
+def _postgres_query(terms):
+    from django.contrib.postgres.search import SearchQuery
+
+    query = None
+    for kind, value in terms:
+        if kind == 'phrase':
+            part = SearchQuery(value, search_type='phrase', config=SEARCH_CONFIG)
+        elif kind == 'prefix':
+            # value is \w+ only, so it is safe to splice into tsquery syntax
+            part = SearchQuery(f"{value}:*", search_type='raw', config=SEARCH_CONFIG)
+        else:
+            part = SearchQuery(value, search_type='plain', config=SEARCH_CONFIG)
+        query = part if query is None else query & part
+    return query
+
+
+class InvertedIndex:
+    """Token -> {article_id: {field: [positions]}} postings built from the article table."""
+
+    def __init__(self, rows=()):
+        self.postings = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        # article_id -> its tokens, so one article can be dropped without a full scan
+        self.documents = {}
+        for pk, headline, body in rows:
+            self.add(pk, headline, body)
+
+    def add(self, pk, headline, body):
+        tokens = set()
+        for field, text in (('headline', headline), ('body', body)):
+            for position, token in enumerate(tokenize(text)):
+                self.postings[token][pk][field].append(position)
+                tokens.add(token)
+        self.documents[pk] = tokens
+
+    def remove(self, pk):
+        for token in self.documents.pop(pk, ()):
+            docs = self.postings.get(token)
+            if docs is not None:
+                docs.pop(pk, None)
+                if not docs:
+                    del self.postings[token]
+
+    def _matches(self, kind, value):
+        if kind == 'term':
+            return self.postings.get(value, {})
+        if kind == 'prefix':
+            merged = defaultdict(lambda: defaultdict(list))
+            for token, docs in self.postings.items():
+                if token.startswith(value):
+                    for pk, fields in docs.items():
+                        for field, positions in fields.items():
+                            merged[pk][field].extend(positions)
+            return merged
+        return self._phrase_matches(value.split())
+
+    def _phrase_matches(self, tokens):
+        first, rest = tokens[0], tokens[1:]
+        matches = defaultdict(lambda: defaultdict(list))
+        for pk, fields in self.postings.get(first, {}).items():
+            for field, positions in fields.items():
+                for start in positions:
+                    if all(
+                        start + offset in self.postings.get(token, {}).get(pk, {}).get(field, ())
+                        for offset, token in enumerate(rest, 1)
+                    ):
+                        matches[pk][field].append(start)
+        return matches
+
+    def search(self, terms):
+        """Return {article_id: rank} for articles matching every term."""
+        scores = None
+        for kind, value in terms:
+            matches = self._matches(kind, value)
+            term_scores = {
+                pk: HEADLINE_WEIGHT * len(fields.get('headline', ())) + BODY_WEIGHT * len(fields.get('body', ()))
+                for pk, fields in matches.items()
+            }
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {pk: score + term_scores[pk] for pk, score in scores.items() if pk in term_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def invalidate_index():
+    """Drop the in-process index; it is rebuilt on the next fallback search."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def update_index(pk, headline, body):
+    """Replace one article's entry; a no-op until the index is built (it will read the row then)."""
+    with _index_lock:
+        if _index is not None:
+            _index.remove(pk)
+            _index.add(pk, headline, body)
+
+
+def remove_from_index(pk):
+    with _index_lock:
+        if _index is not None:
+            _index.remove(pk)
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            from news.models import Article
+            _index = InvertedIndex(Article.objects.values_list('id', 'headline', 'body').iterator())
+        return _index
+
+
+def search_articles(queryset, text):
+    """Filter ``queryset`` down to articles matching ``text``, best match first."""
+    terms = parse_query(text)
+    if not terms:
+        return queryset
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchRank
+
+        query = _postgres_query(terms)
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F('search_vector'), query))
+            .order_by('-search_rank', '-published_at', '-id')
+        )
+    ranks = get_index().search(terms)
+    if not ranks:
+        return queryset.none()
+    # One WHEN per distinct score keeps the CASE small on large result sets
+    by_rank = defaultdict(list)
+    for pk, rank in ranks.items():
+        by_rank[round(rank, 3)].append(pk)
+    return (
+        queryset.filter(pk__in=ranks.keys())
+        .annotate(search_rank=Case(
+            *[When(pk__in=pks, then=Value(rank)) for rank, pks in by_rank.items()],
+            output_field=FloatField(),
+        ))
+        .order_by('-search_rank', '-published_at', '-id')
+    )
+
+
+class ArticleSearchFilter(SearchFilter):
+    """Drop-in for SearchFilter on article viewsets, backed by search_articles()."""
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        return search_articles(queryset, text)
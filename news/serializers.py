@@ -1,13 +1,17 @@
 from rest_framework import serializers
 from .models import Category,Article,Review
 from django.utils import timezone
-from users.serializers import CurrentUserSerializer
+from users.serializers import CurrentUserSerializer,ReviewerSerializer
+from news.managers import EXCERPT_LENGTH
+from news.projections import SparseFieldsetMixin
+from news.images import image_set,image_url,variant_url,inspect_image_header,pipeline_setting
+from news.uploads import stage_upload,schedule_image_processing
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields =['id','name','description','is_premium']
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # category = CategorySerializer(read_only=True)
     category = serializers.HyperlinkedRelatedField(
         queryset = Category.objects.all(),
@@ -19,9 +23,7 @@ class ArticleSerializer(serializers.ModelSerializer):
         fields =['id','category','headline','image','body','published_at','author']
         
     def get_image(self, obj):
-        if obj.image and obj.image.url != "placeholder":
-            return obj.image.url
-        return None
+        return image_url(obj)
 
     
 class ReviewSerializer(serializers.ModelSerializer):
@@ -33,56 +35,142 @@ class ReviewSerializer(serializers.ModelSerializer):
     def get_article_headline(self,obj):
         return getattr(obj.article,'headline',None)
 
-class ArticleDetailSerializer(serializers.ModelSerializer):
+class PublicReviewSerializer(ReviewSerializer):
+    user = ReviewerSerializer(read_only=True)
+
+class ArticleDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     # image=serializers.ImageField()
     image = serializers.SerializerMethodField()
 
+    image_set = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
+    rating_avg = serializers.FloatField(read_only=True)
     class Meta:
         model = Article
-        fields = ["id", "headline",'image',"body", "category", "rating", "published_at"]
+        fields = ["id", "headline",'image','image_set',"body", "category", "rating", "rating_avg", "review_count", "published_at"]
 
     def get_rating(self,obj):
-        reviews = obj.reviews.all()
-        if reviews.exists():
-            return round(sum([r.ratings for r in reviews]))
+        if obj.review_count:
+            return obj.rating_sum
         return None
     
     def get_image(self,obj):
-        if obj.image and obj.image.url != "placeholder":
-            return obj.image.url
-        return None
+        return image_url(obj)
+
+    def get_image_set(self,obj):
+        return image_set(obj)
+
+class ArticleListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Feed representation (`?view=compact`): an excerpt instead of the body."""
+    category = CategorySerializer(read_only=True)
+    image = serializers.SerializerMethodField()
+    image_set = serializers.SerializerMethodField()
+    excerpt = serializers.SerializerMethodField()
+    rating_avg = serializers.FloatField(read_only=True)
+    class Meta:
+        model = Article
+        fields = ["id", "headline", "image", "image_set", "excerpt", "category", "rating_avg", "review_count", "published_at"]
+
+    def get_excerpt(self,obj):
+        # Annotated by ArticleQuerySet.with_excerpt(); fall back to the body if it was not
+        text = getattr(obj, 'excerpt', None)
+        if text is None:
+            text = obj.body[:EXCERPT_LENGTH + 1]
+        if len(text) <= EXCERPT_LENGTH:
+            return text
+        cut = text[:EXCERPT_LENGTH].rsplit(None, 1)[0]
+        return cut.rstrip(' ,;:.') + "..."
+
+    def get_image(self,obj):
+        # Feeds show cards; the full-size original is for the article page
+        return variant_url(obj, 'card')
+
+    def get_image_set(self,obj):
+        return image_set(obj)
+
+class ImageUploadField(serializers.FileField):
+    """
+    An image upload checked from its header only (type, dimensions), unlike
+    ImageField which decodes the whole file inside the request. The full
+    check happens in the background with the rest of the processing.
+    """
+    def to_internal_value(self, data):
+        upload = super().to_internal_value(data)
+        try:
+            inspect_image_header(upload)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        if upload.size > pipeline_setting('MAX_BYTES', 20 * 1024 * 1024):
+            raise serializers.ValidationError("Image file is too large.")
+        return upload
 
 class ArticleWriteSerializer(serializers.ModelSerializer):
     # image=serializers.ImageField()
-    image = serializers.ImageField(required=False,allow_null=True)
+    image = ImageUploadField(required=False,allow_null=True)
 
     class Meta:
         model = Article
-        fields = ["id","headline",'image', "body", "category", "is_published","published_at"]
-        read_only_fields =['id',"published_at"]
+        fields = ["id","headline",'image', "body", "category", "is_published","published_at","assets_ready"]
+        read_only_fields =['id','assets_ready']
+        extra_kwargs = {
+            # With is_published, a future time schedules the article instead of publishing it now
+            'published_at': {'required': False, 'allow_null': True},
+        }
         
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['image'] = image_url(instance)
+        return data
+
+    def apply_image(self, article, upload):
+        """Stage an uploaded image for background processing (news.uploads); None clears the image."""
+        if upload is None:
+            article.image, article.image_variants = None, {}
+            article.pending_image, article.assets_ready = '', True
+            return
+        article.pending_image = stage_upload(upload)
+        if article._state.adding:
+            # New articles wait for their image; live ones keep the old image until the new one is ready
+            article.assets_ready = False
+
     def create(self, validated_data):
-        if validated_data.get("is_published") and not validated_data.get("published_at"):
-            validated_data['published_at'] = timezone.now()
-        return super().create(validated_data)
+        upload = validated_data.pop('image', None)
+        article = Article(**validated_data)
+        if upload is not None:
+            self.apply_image(article, upload)
+        if validated_data.get("is_published"):
+            article.schedule(validated_data.get("published_at"))
+        else:
+            article.published_at = None
+        article.save()
+        if article.pending_image:
+            schedule_image_processing(article)
+        return article
     
     def update(self, instance, validated_data):
-        if 'image' in validated_data:
-            instance.image = validated_data.get('image', instance.image)
-        
+        new_image = 'image' in validated_data
+        if new_image:
+            self.apply_image(instance, validated_data.pop('image'))
+
+
         is_published = validated_data.pop('is_published', None)
+        published_at = validated_data.pop('published_at', None)
         if is_published is True:
-            if not instance.published_at:
-                instance.published_at = timezone.now()
+            instance.schedule(published_at)
         elif is_published is False:
+            instance.is_published = False
             instance.published_at = None  
+        elif published_at and (instance.is_published or instance.is_scheduled):
+            # Reschedule (or backdate) without toggling publication
+            instance.schedule(published_at)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         
         instance.save()
+        if new_image and instance.pending_image:
+            schedule_image_processing(instance)
         return instance
 
 
@@ -1,3 +1,974 @@
-from django.test import TestCase
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import warnings
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+import requests
+from rest_framework.test import APIClient
+
+from news.benchmarks import BENCH_CATEGORY_PREFIX, compare, save_results
+from news.cache import get_version, invalidate
+from news.images import fetch_remote_image
+from news.models import Article, Category, Review
+from news.search import get_index, invalidate_index, parse_query, search_articles
+from news.uploads import process_staged_image
+from news_ique.db import ReadReplicaRouter, primary_reads, replica_reads
+from users.models import PaymentTransaction, SubscriptionPlan, User
+
+OLD_VARIANTS = {
+    'width': 800, 'height': 600, 'original': 'https://img.example/old.jpg',
+    'card': {'url': 'https://img.example/old_640w.jpg', 'width': 640, 'height': 480},
+}
+
+
+def jpeg_bytes(size=(64, 48)):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class StagedImageTests(TestCase):
+    def setUp(self):
+        self.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        self.category = Category.objects.create(name='World')
+        self.staging = tempfile.mkdtemp()
+
+    def make_article(self, pending, **fields):
+        return Article.objects.create(
+            headline='Headline', body='Body', category=self.category, author=self.editor,
+            is_published=True, pending_image=pending, **fields,
+        )
+
+    def stage(self, data):
+        path = os.path.join(self.staging, 'upload.jpg')
+        with open(path, 'wb') as handle:
+            handle.write(data)
+        return path
+
+    def assert_kept_old_image(self, article):
+        article.refresh_from_db()
+        self.assertEqual(article.image_variants, OLD_VARIANTS)
+        self.assertEqual(str(article.image), 'old-image')
+        self.assertEqual(article.pending_image, '')
+        self.assertTrue(article.assets_ready)
+
+    def test_missing_staged_file_leaves_article_pending(self):
+        path = os.path.join(self.staging, 'gone.jpg')
+        article = self.make_article(path, assets_ready=False)
+        with self.assertLogs('news.uploads', 'ERROR'):
+            self.assertFalse(process_staged_image(article.pk, path, 'gone.jpg'))
+        article.refresh_from_db()
+        self.assertEqual(article.pending_image, path)
+        self.assertFalse(article.assets_ready)
+        self.assertNotIn(article, Article.objects.published())
+
+    def test_missing_staged_file_keeps_live_image_pending(self):
+        path = os.path.join(self.staging, 'gone.jpg')
+        article = self.make_article(path, image='old-image', image_variants=OLD_VARIANTS)
+        with self.assertLogs('news.uploads', 'ERROR'):
+            self.assertFalse(process_staged_image(article.pk, path, 'gone.jpg'))
+        article.refresh_from_db()
+        self.assertEqual((str(article.image), article.image_variants), ('old-image', OLD_VARIANTS))
+        self.assertEqual(article.pending_image, path)
+
+    def test_corrupt_upload_keeps_live_image(self):
+        path = self.stage(jpeg_bytes()[:200])
+        article = self.make_article(path, image='old-image', image_variants=OLD_VARIANTS)
+        self.assertTrue(process_staged_image(article.pk, path, 'upload.jpg'))
+        self.assert_kept_old_image(article)
+        self.assertFalse(os.path.exists(path))
+
+    def test_corrupt_upload_releases_new_article_without_image(self):
+        path = self.stage(jpeg_bytes()[:200])
+        article = self.make_article(path, assets_ready=False)
+        process_staged_image(article.pk, path, 'upload.jpg')
+        article.refresh_from_db()
+        # The field stores its default for "no image"
+        self.assertEqual(str(article.image), 'placeholder')
+        self.assertEqual(article.image_variants, {})
+        self.assertTrue(article.assets_ready)
+
+    def test_valid_upload_replaces_image(self):
+        path = self.stage(jpeg_bytes())
+        article = self.make_article(path, image='old-image', image_variants=OLD_VARIANTS)
+        pipeline = {'BACKEND': 'news.images.LocalImageBackend', 'OPTIONS': {'location': self.staging}}
+        with override_settings(IMAGE_PIPELINE=pipeline):
+            from news.images import get_backend
+            get_backend.cache_clear()
+            try:
+                process_staged_image(article.pk, path, 'upload.jpg')
+            finally:
+                get_backend.cache_clear()
+        article.refresh_from_db()
+        self.assertNotEqual(article.image_variants, OLD_VARIANTS)
+        self.assertEqual(article.image_variants['width'], 64)
+
+
+class ArticleQueryCountTests(TestCase):
+    """Each read endpoint runs a fixed number of queries whatever the page size."""
+    page_sizes = (2, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        cls.category = Category.objects.create(name='World')
+        cls.articles = Article.objects.bulk_create(
+            Article(headline=f'Headline {index}', body='Body ' * 200, category=cls.category, author=cls.editor,
+                    is_published=True, published_at=timezone.now() - timezone.timedelta(minutes=index))
+            for index in range(12)
+        )
+
+    def setUp(self):
+        # Responses and validators are cached; every request has to reach the database
+        cache.clear()
+
+    def get(self, url, **params):
+        cache.clear()
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assert_queries_per_page(self, queries, url, **params):
+        for page_size in self.page_sizes:
+            with self.subTest(page_size=page_size), self.assertNumQueries(queries):
+                self.get(url, page_size=page_size, **params)
+
+    def test_public_list(self):
+        self.assert_queries_per_page(4, '/api/v1/public_articles/')
+        self.assert_queries_per_page(4, '/api/v1/public_articles/', view='full')
+
+    def test_public_list_defers_body(self):
+        data = self.get('/api/v1/public_articles/', page_size=2).data['results']
+        self.assertNotIn('body', data[0])
+        self.assertIn('excerpt', data[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.get('/api/v1/public_articles/', page_size=2)
+        sql = queries.captured_queries[-1]['sql'].replace('SUBSTR("news_article"."body"', '')
+        self.assertNotIn('"news_article"."body"', sql)
+
+    def test_homepage(self):
+        self.assert_queries_per_page(4, '/api/v1/public_articles/homepage/')
+        self.assert_queries_per_page(4, '/api/v1/public_articles/homepage/', view='full')
+
+    def test_public_retrieve(self):
+        for article in self.articles[:2]:
+            with self.subTest(article=article.pk), self.assertNumQueries(2):
+                self.get(f'/api/v1/public_articles/{article.pk}/')
+
+    def test_article_list(self):
+        self.assert_queries_per_page(2, '/api/v1/articles/')
+        self.assert_queries_per_page(2, '/api/v1/articles/', view='full')
+
+
+class CursorSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        category = Category.objects.create(name='World')
+        for headline in ('Storm warning', 'Election night', 'Storm passes'):
+            Article.objects.create(headline=headline, body='Body', category=category, author=editor,
+                                   is_published=True, published_at=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_search_rejects_cursor_pagination(self):
+        for url in ('/api/v1/public_articles/', '/api/v1/public_articles/homepage/', '/api/v1/async/public_articles/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'search': 'storm', 'pagination': 'cursor'})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('pagination', response.json())
+
+    def test_search_with_page_numbers(self):
+        response = self.client.get('/api/v1/public_articles/', {'search': 'storm'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_cursor_pagination_without_search(self):
+        response = self.client.get('/api/v1/public_articles/', {'pagination': 'cursor', 'search': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class ReviewRatingTests(TestCase):
+    def setUp(self):
+        editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        self.reader = User.objects.create_user('reader@example.com', 'pw')
+        category = Category.objects.create(name='World')
+        self.article = Article.objects.create(headline='Headline', body='Body', category=category, author=editor,
+                                              is_published=True, published_at=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        self.url = f'/api/v1/articles/{self.article.pk}/reviews/'
+
+    def test_review_and_rating_roll_back_together(self):
+        with mock.patch.object(Article, 'adjust_rating', side_effect=DatabaseError('rating update failed')):
+            with self.assertRaises(DatabaseError):
+                self.client.post(self.url, {'comment': 'Good', 'ratings': 4})
+        self.assertFalse(Review.objects.exists())
+
+    def test_delete_keeps_review_when_rating_fails(self):
+        self.client.post(self.url, {'comment': 'Good', 'ratings': 4})
+        review = Review.objects.get()
+        with mock.patch.object(Article, 'adjust_rating', side_effect=DatabaseError('rating update failed')):
+            with self.assertRaises(DatabaseError):
+                self.client.delete(f'{self.url}{review.pk}/')
+        self.assertTrue(Review.objects.filter(pk=review.pk).exists())
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.review_count, self.article.rating_sum), (1, 4))
+
+
+def resolves_to(*addresses):
+    return mock.patch('news.images.socket.getaddrinfo', return_value=[
+        (socket.AF_INET6 if ':' in address else socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, 443))
+        for address in addresses
+    ])
+
+
+class RemoteImageTests(SimpleTestCase):
+    def response(self, status=200, location=None, body=b'image'):
+        response = requests.Response()
+        response.status_code = status
+        response.raw = io.BytesIO(body)
+        if location:
+            response.headers['Location'] = location
+        return response
+
+    def test_rejects_non_http_schemes(self):
+        for url in ('file:///etc/passwd', 'ftp://example.com/a.jpg', 'gopher://example.com/', '/media/a.jpg'):
+            with self.subTest(url=url), self.assertRaisesMessage(ValueError, 'http'):
+                fetch_remote_image(url)
+
+    def test_rejects_internal_addresses(self):
+        for address in ('127.0.0.1', '10.1.2.3', '192.168.0.10', '169.254.169.254', '::1', 'fe80::1', '::ffff:127.0.0.1'):
+            with self.subTest(address=address), resolves_to('93.184.216.34', address):
+                with mock.patch('requests.Session.get') as get, self.assertRaisesMessage(ValueError, 'non-public'):
+                    fetch_remote_image('https://images.example.com/a.jpg')
+                get.assert_not_called()
+
+    def test_redirects_are_checked_hop_by_hop(self):
+        with resolves_to('93.184.216.34'), mock.patch('requests.Session.get') as get:
+            get.side_effect = [self.response(302, '/b.jpg'), self.response(body=b'jpeg')]
+            self.assertEqual(fetch_remote_image('https://images.example.com/a.jpg'), b'jpeg')
+        self.assertEqual(get.call_args_list[1].args, ('https://images.example.com/b.jpg',))
+        self.assertFalse(get.call_args.kwargs['allow_redirects'])
+
+        with mock.patch('requests.Session.get', return_value=self.response(302, 'http://169.254.169.254/latest/meta-data/')):
+            with mock.patch('news.images.socket.getaddrinfo', side_effect=[
+                [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('93.184.216.34', 443))],
+                [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('169.254.169.254', 80))],
+            ]), self.assertRaisesMessage(ValueError, 'non-public'):
+                fetch_remote_image('https://images.example.com/a.jpg')
+
+    def test_connects_to_the_vetted_address(self):
+        # Resolves to a public address when checked, to loopback afterwards (DNS rebinding)
+        resolver = mock.patch('socket.getaddrinfo', side_effect=[
+            [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('93.184.216.34', 443))],
+            [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 443))],
+        ])
+        connect = mock.patch('urllib3.util.connection.create_connection', side_effect=OSError('unreachable'))
+        with resolver as getaddrinfo, connect as create_connection, self.assertRaises(requests.ConnectionError):
+            fetch_remote_image('https://images.example.com/a.jpg')
+        self.assertEqual(getaddrinfo.call_count, 1)
+        self.assertEqual(create_connection.call_args.args[0], ('93.184.216.34', 443))
+
+    def test_pinned_request_keeps_the_hostname(self):
+        seen = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                seen['host'] = self.headers['Host']
+                self.send_response(200)
+                self.send_header('Content-Length', '4')
+                self.end_headers()
+                self.wfile.write(b'jpeg')
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        server.timeout = 5
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        self.addCleanup(server.server_close)
+        port = server.server_address[1]
+        # images.example.com does not resolve here; the pinned address is used instead
+        with mock.patch('news.images.check_remote_url', return_value='127.0.0.1'):
+            self.assertEqual(fetch_remote_image(f'http://images.example.com:{port}/a.jpg'), b'jpeg')
+        thread.join()
+        self.assertEqual(seen['host'], f'images.example.com:{port}')
+
+    @override_settings(IMAGE_PIPELINE={'MAX_REDIRECTS': 2})
+    def test_redirect_limit(self):
+        with resolves_to('93.184.216.34'), mock.patch('requests.Session.get', side_effect=lambda *a, **k: self.response(302, '/again.jpg')):
+            with self.assertRaisesMessage(ValueError, 'Too many redirects'):
+                fetch_remote_image('https://images.example.com/a.jpg')
+
+
+class ScheduledPublishingTests(TestCase):
+    def setUp(self):
+        self.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR', is_staff=True, is_superuser=True)
+        self.category = Category.objects.create(name='World')
+        self.client = APIClient()
+        self.client.force_authenticate(self.editor)
+
+    def make_article(self, **fields):
+        return Article.objects.create(headline='Headline', body='Body', category=self.category, author=self.editor, **fields)
+
+    def test_schedule(self):
+        now = timezone.now()
+        article = Article(published_at=None)
+        article.schedule(now + timezone.timedelta(hours=1))
+        self.assertFalse(article.is_published)
+        self.assertTrue(article.is_scheduled)
+        article.schedule(now - timezone.timedelta(hours=1))
+        self.assertTrue(article.is_published)
+        article = Article(published_at=None)
+        article.schedule()
+        self.assertTrue(article.is_published)
+        self.assertIsNotNone(article.published_at)
+
+    def test_publish_due_articles(self):
+        from news.jobs import publish_due_articles
+
+        now = timezone.now()
+        due = self.make_article(published_at=now - timezone.timedelta(minutes=1))
+        later = self.make_article(published_at=now + timezone.timedelta(hours=1))
+        draft = self.make_article()
+        self.assertEqual(publish_due_articles(), {'published': 1})
+        self.assertEqual(
+            set(Article.objects.filter(is_published=True).values_list('pk', flat=True)), {due.pk},
+        )
+        for article in (later, draft):
+            article.refresh_from_db()
+            self.assertFalse(article.is_published)
+
+    def test_serializer_schedules_future_publication(self):
+        at = timezone.now() + timezone.timedelta(hours=2)
+        response = self.client.post('/api/v1/articles/', {
+            'headline': 'Embargo', 'body': 'Body', 'category': self.category.pk,
+            'is_published': True, 'published_at': at.isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        article = Article.objects.get(pk=response.data['id'])
+        self.assertFalse(article.is_published)
+        self.assertEqual(article.published_at, at)
+
+    def test_serializer_unpublish_clears_publication_time(self):
+        article = self.make_article(is_published=True, published_at=timezone.now() - timezone.timedelta(days=1))
+        response = self.client.patch(f'/api/v1/articles/{article.pk}/', {'is_published': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        article.refresh_from_db()
+        self.assertFalse(article.is_published)
+        self.assertIsNone(article.published_at)
+
+    def test_serializer_reschedules_scheduled_article(self):
+        article = self.make_article(published_at=timezone.now() + timezone.timedelta(hours=1))
+        at = timezone.now() + timezone.timedelta(days=1)
+        self.client.patch(f'/api/v1/articles/{article.pk}/', {'published_at': at.isoformat()}, format='json')
+        article.refresh_from_db()
+        self.assertEqual((article.is_published, article.published_at), (False, at))
+
+    def test_admin_unpublish_is_not_republished(self):
+        from news.jobs import publish_due_articles
+
+        article = self.make_article(is_published=True, published_at=timezone.now() - timezone.timedelta(days=1))
+        self.client.force_login(self.editor)
+        response = self.client.post(f'/admin/news/article/{article.pk}/change/', {
+            'headline': article.headline, 'body': article.body, 'category': self.category.pk,
+            'author': self.editor.pk, 'published_at_0': '2020-01-01', 'published_at_1': '10:00:00',
+            'review_count': 0, 'rating_sum': 0, 'assets_ready': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+        article.refresh_from_db()
+        self.assertIsNone(article.published_at)
+        self.assertEqual(publish_due_articles(), {'published': 0})
+
+
+class BenchmarkTests(TestCase):
+    def seed(self):
+        out = io.StringIO()
+        call_command('seed_corpus', categories=2, articles=20, reviews=30, users=5, stdout=out)
+        return out.getvalue()
+
+    def test_seed_corpus_and_flush(self):
+        self.assertIn('20 articles', self.seed())
+        self.assertEqual(Article.objects.filter(category__name__startswith=BENCH_CATEGORY_PREFIX).count(), 20)
+        self.assertEqual(Review.objects.filter(article__category__name__startswith=BENCH_CATEGORY_PREFIX).count(), 30)
+        # Ratings are rebuilt after the bulk insert
+        self.assertEqual(sum(Article.objects.values_list('review_count', flat=True)), 30)
+        call_command('seed_corpus', flush=True, articles=0, reviews=0, users=0, categories=0, stdout=io.StringIO())
+        self.assertFalse(Article.objects.exists())
+        self.assertFalse(User.objects.filter(email__endswith='@bench.local').exclude(email__startswith='bench-').exists())
+
+    def test_bench_api_writes_results_and_compares(self):
+        self.seed()
+        output = os.path.join(tempfile.mkdtemp(), 'results.json')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            call_command('bench_api', scenario=['public_articles-list', 'public_articles-detail'], requests=3, warmup=1,
+                         output=output, stdout=io.StringIO())
+        self.assertFalse([w for w in caught if issubclass(w.category, UnorderedObjectListWarning)])
+        with open(output) as handle:
+            results = json.load(handle)['results']
+        self.assertEqual(set(results), {'public_articles-list', 'public_articles-detail'})
+        self.assertEqual(results['public_articles-list']['requests'], 3)
+        self.assertEqual(results['public_articles-list']['errors'], 0)
+
+        # A baseline that needed fewer queries turns the run into a failure
+        for summary in results.values():
+            summary['queries_per_request'] = 0
+        save_results(output, results, {})
+        with self.assertRaisesMessage(CommandError, 'queries/request'):
+            call_command('bench_api', scenario=['public_articles-list'], requests=2, warmup=0,
+                         baseline=output, stdout=io.StringIO())
+
+    def test_bench_api_without_corpus(self):
+        with self.assertRaisesMessage(CommandError, 'seed_corpus'):
+            call_command('bench_api', stdout=io.StringIO())
+
+    def test_compare(self):
+        baseline = {'list': {'p95_ms': 10.0, 'queries_per_request': 3}}
+        self.assertEqual(compare({'list': {'p95_ms': 11.9, 'queries_per_request': 3}}, baseline, 0.2), [])
+        self.assertEqual(compare({'other': {'p95_ms': 99.0, 'queries_per_request': 9}}, baseline), [])
+        regressions = compare({'list': {'p95_ms': 12.5, 'queries_per_request': 4}}, baseline, 0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('p95 12.5ms', regressions[0])
+
+
+class SearchFallbackTests(TestCase):
+    """The in-process inverted index used when the database is not PostgreSQL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        category = Category.objects.create(name='World')
+        now = timezone.now()
+
+        def article(headline, body, minutes):
+            return Article.objects.create(headline=headline, body=body, category=category, author=editor,
+                                          is_published=True, published_at=now - timezone.timedelta(minutes=minutes))
+
+        cls.minister_headline = article('Prime minister resigns', 'The cabinet met on Monday.', 3)
+        cls.minister_body = article('Cabinet news', 'The prime minister spoke to the press.', 1)
+        cls.scrambled = article('Minister meets prime suppliers', 'Election season.', 2)
+        cls.elections = article('Elections ahead', 'Voters register for the electoral roll.', 4)
+
+    def setUp(self):
+        # The index lives in the process; rolled-back test data must not linger in it
+        invalidate_index()
+
+    def search(self, text):
+        return list(search_articles(Article.objects.all(), text).values_list('pk', flat=True))
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query('storm "Prime Minister" elect* "flood"'), [
+            ('term', 'storm'), ('phrase', 'prime minister'), ('prefix', 'elect'), ('term', 'flood'),
+        ])
+
+    def test_phrase_matches_adjacent_words_only(self):
+        self.assertEqual(self.search('"prime minister"'), [self.minister_headline.pk, self.minister_body.pk])
+
+    def test_terms_must_all_match(self):
+        self.assertCountEqual(self.search('prime minister'),
+                              [self.minister_headline.pk, self.minister_body.pk, self.scrambled.pk])
+        self.assertEqual(self.search('prime voters'), [])
+
+    def test_prefix(self):
+        self.assertCountEqual(self.search('elect*'), [self.elections.pk, self.scrambled.pk])
+
+    def test_headline_matches_rank_first(self):
+        # Same score ties break on recency; headline hits outrank body hits
+        self.assertEqual(self.search('elect*')[0], self.elections.pk)
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.search('volcano'), [])
+        index = get_index()
+        article = self.elections
+        article.body = 'A volcano erupted.'
+        with self.captureOnCommitCallbacks(execute=True):
+            article.save()
+        self.assertEqual(self.search('volcano'), [article.pk])
+        self.assertEqual(self.search('voters'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            article.delete()
+        self.assertEqual(self.search('volcano'), [])
+        # Updated in place, never rebuilt from the table
+        self.assertIs(get_index(), index)
+        self.assertNotIn(article.pk, index.documents)
+
+    def test_writes_not_touching_the_text_leave_the_index_alone(self):
+        self.search('volcano')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.elections.save(update_fields=['is_published'])
+        self.assertEqual(callbacks, [])
+
+    def test_deferred_text_drops_the_index(self):
+        index = get_index()
+        article = Article.objects.only('id', 'headline').get(pk=self.elections.pk)
+        article.headline = 'Volcano watch'
+        article.save()
+        self.assertIsNot(get_index(), index)
+        self.assertEqual(self.search('volcano'), [article.pk])
+
+    def test_search_endpoint(self):
+        cache.clear()
+        response = self.client.get('/api/v1/public_articles/', {'search': '"prime minister"', 'view': 'full'})
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [self.minister_headline.pk, self.minister_body.pk])
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        self.category = Category.objects.create(name='World')
+        self.article = Article.objects.create(headline='First', body='Body', category=self.category, author=self.editor,
+                                              is_published=True, published_at=timezone.now())
+
+    def headlines(self):
+        return [item['headline'] for item in self.client.get('/api/v1/public_articles/').data['results']]
+
+    def test_invalidate_bumps_version(self):
+        before = get_version('articles')
+        invalidate('articles')
+        self.assertNotEqual(get_version('articles'), before)
+
+    def test_anonymous_list_is_served_from_cache(self):
+        self.assertEqual(self.headlines(), ['First'])
+        # update() skips the model hooks, so nothing invalidates the cached page
+        Article.objects.filter(pk=self.article.pk).update(headline='Changed')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.headlines(), ['First'])
+
+    def test_article_write_invalidates(self):
+        self.assertEqual(self.headlines(), ['First'])
+        self.article.headline = 'Changed'
+        self.article.save()
+        self.assertEqual(self.headlines(), ['Changed'])
+        Article.objects.create(headline='Second', body='Body', category=self.category, author=self.editor,
+                               is_published=True, published_at=timezone.now())
+        self.assertEqual(self.headlines(), ['Second', 'Changed'])
+        self.article.delete()
+        self.assertEqual(self.headlines(), ['Second'])
+
+    def test_category_write_invalidates_articles(self):
+        self.client.get(f'/api/v1/public_articles/{self.article.pk}/')
+        self.category.name = 'Politics'
+        self.category.save()
+        response = self.client.get(f'/api/v1/public_articles/{self.article.pk}/')
+        self.assertEqual(response.data['category']['name'], 'Politics')
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.headlines()
+        Article.objects.filter(pk=self.article.pk).update(headline='Changed')
+        client = APIClient()
+        client.force_authenticate(self.editor)
+        response = client.get('/api/v1/public_articles/')
+        self.assertEqual(response.data['results'][0]['headline'], 'Changed')
+
+
+class ArticleIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        cls.category = Category.objects.create(name='Wire')
+
+    def setUp(self):
+        cache.clear()
+        invalidate_index()
+        self.client = APIClient()
+        self.client.force_authenticate(self.editor)
+
+    def record(self, headline, **fields):
+        return {'headline': headline, 'body': 'Body', 'category': self.category.pk, **fields}
+
+    def test_bulk_json_array_reports_each_record(self):
+        records = [self.record('First'), {'headline': 'No body', 'category': self.category.pk},
+                   self.record('Unknown', category=0), self.record('Live', is_published=True)]
+        response = self.client.post('/api/v1/articles/bulk/', records, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 2))
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'error', 'error', 'created'])
+        self.assertIn('body', response.data['results'][1]['errors'])
+        self.assertEqual(response.data['results'][2]['errors'], {'category': ['Unknown category.']})
+        live = Article.objects.get(pk=response.data['results'][3]['id'])
+        self.assertTrue(live.is_published)
+        self.assertIsNotNone(live.published_at)
+        self.assertEqual(search_articles(Article.objects.all(), 'live').count(), 1)
+
+    def test_bulk_ndjson(self):
+        body = '\n'.join(json.dumps(self.record(f'Story {number}')) for number in range(3)) + '\n'
+        response = self.client.post('/api/v1/articles/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Article.objects.filter(author=self.editor).count(), 3)
+
+    def test_bulk_rejects_malformed_ndjson(self):
+        response = self.client.post('/api/v1/articles/bulk/', '{"headline": ', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(ARTICLE_IMPORT={'MAX_ITEMS': 2})
+    def test_bulk_limits_items(self):
+        response = self.client.post('/api/v1/articles/bulk/', [self.record('x')] * 3, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Article.objects.exists())
+
+    def test_image_url_is_validated_before_processing(self):
+        from PIL import Image
+
+        bmp = io.BytesIO()
+        Image.new('RGB', (8, 8)).save(bmp, 'BMP')
+        fetched = {'https://img.example/bad.bmp': bmp.getvalue(), 'https://img.example/cut.jpg': jpeg_bytes()[:200]}
+        records = [self.record('Bitmap', image_url='https://img.example/bad.bmp'),
+                   self.record('Truncated', image_url='https://img.example/cut.jpg')]
+        with mock.patch('news.ingest.fetch_remote_image', side_effect=fetched.__getitem__), \
+                mock.patch('news.ingest.process_image') as process:
+            response = self.client.post('/api/v1/articles/bulk/', records, format='json')
+        self.assertEqual(response.status_code, 400)
+        process.assert_not_called()
+        self.assertIn('Unsupported image format BMP', response.data['results'][0]['errors']['image_url'][0])
+        self.assertIn('corrupt', response.data['results'][1]['errors']['image_url'][0])
+
+    def test_image_url_is_processed(self):
+        with mock.patch('news.ingest.fetch_remote_image', return_value=jpeg_bytes()), \
+                mock.patch('news.ingest.process_image', return_value=('stored-image', OLD_VARIANTS)) as process:
+            response = self.client.post('/api/v1/articles/bulk/', [self.record('Photo', image_url='https://img.example/a/photo.jpg')], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(process.call_args.kwargs['name'], 'photo.jpg')
+        article = Article.objects.get()
+        self.assertEqual((str(article.image), article.image_variants), ('stored-image', OLD_VARIANTS))
+
+    def test_import_articles_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as handle:
+            handle.write('\n'.join(json.dumps(self.record(f'Wire {number}')) for number in range(5)))
+            handle.write('\n' + json.dumps({'headline': 'Broken'}) + '\n')
+        self.addCleanup(os.remove, handle.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_articles', handle.name, author=self.editor.email, batch_size=2, stdout=out, stderr=err)
+        self.assertIn('Imported 5 article(s), 1 failed.', out.getvalue())
+        self.assertIn('#5:', err.getvalue())
+        self.assertEqual(Article.objects.count(), 5)
+
+    def test_import_articles_json_array(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as handle:
+            json.dump([self.record('One'), self.record('Two')], handle)
+        self.addCleanup(os.remove, handle.name)
+        call_command('import_articles', handle.name, author=self.editor.email, stdout=io.StringIO())
+        self.assertEqual(sorted(Article.objects.values_list('headline', flat=True)), ['One', 'Two'])
+
+    def test_import_articles_unknown_author(self):
+        with self.assertRaisesMessage(CommandError, 'No user with email'):
+            call_command('import_articles', '-', author='nobody@example.com')
+
+
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        cls.category = Category.objects.create(name='World')
+        cls.article = Article.objects.create(headline='Headline', body='Body ' * 100, category=cls.category,
+                                             author=cls.editor, is_published=True, published_at=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+
+    def first_result(self, **params):
+        return self.client.get('/api/v1/public_articles/', params).data['results'][0]
+
+    def test_views(self):
+        self.assertIn('excerpt', self.first_result())
+        self.assertNotIn('body', self.first_result())
+        full = self.first_result(view='full')
+        self.assertIn('body', full)
+        self.assertNotIn('excerpt', full)
+
+    def test_fields_on_list(self):
+        self.assertEqual(set(self.first_result(fields='id,headline')), {'id', 'headline'})
+        self.assertEqual(set(self.first_result(fields='id, body', view='full')), {'id', 'body'})
+        # Names the serializer does not have are ignored
+        self.assertEqual(set(self.first_result(fields='id,password')), {'id'})
+
+    def test_fields_narrow_the_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/v1/public_articles/', {'fields': 'id,headline', 'view': 'full'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"news_article"."headline"', sql)
+        self.assertNotIn('"news_article"."body"', sql)
+        self.assertNotIn('"news_category"', sql)
+
+    def test_fields_on_retrieve(self):
+        response = self.client.get(f'/api/v1/public_articles/{self.article.pk}/', {'fields': 'id,body'})
+        self.assertEqual(set(response.data), {'id', 'body'})
+
+    def test_fields_on_homepage(self):
+        data = self.client.get('/api/v1/public_articles/homepage/', {'fields': 'id'}).data['results']
+        self.assertEqual(data['featured'], {'id': self.article.pk})
+        self.assertEqual(data['articles'], [{'id': self.article.pk}])
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        self.category = Category.objects.create(name='World')
+        self.premium = Category.objects.create(name='Investigations', is_premium=True)
+        self.article = Article.objects.create(headline='First', body='Body', category=self.category, author=self.editor,
+                                              is_published=True, published_at=timezone.now() - timezone.timedelta(hours=1))
+
+    def test_list_validators_and_304(self):
+        response = self.client.get('/api/v1/public_articles/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        # Validators and the 304 come from the cache; nothing reaches the database
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/public_articles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/v1/public_articles/', HTTP_IF_NONE_MATCH='W/"other"').status_code, 200)
+
+    def test_if_modified_since(self):
+        response = self.client.get(f'/api/v1/public_articles/{self.article.pk}/')
+        last_modified = response['Last-Modified']
+        response = self.client.get(f'/api/v1/public_articles/{self.article.pk}/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        stale = http_date(self.article.updated_at.timestamp() - 60)
+        response = self.client.get(f'/api/v1/public_articles/{self.article.pk}/', HTTP_IF_MODIFIED_SINCE=stale)
+        self.assertEqual(response.status_code, 200)
+
+    def test_write_changes_the_etag(self):
+        etag = self.client.get('/api/v1/public_articles/')['ETag']
+        self.article.headline = 'Changed'
+        self.article.save()
+        response = self.client.get('/api/v1/public_articles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_the_query_string(self):
+        first = self.client.get('/api/v1/public_articles/')['ETag']
+        self.assertNotEqual(self.client.get('/api/v1/public_articles/', {'view': 'full'})['ETag'], first)
+
+    def test_premium_detail_etag_depends_on_the_caller(self):
+        article = Article.objects.create(headline='Leak', body='Body', category=self.premium, author=self.editor,
+                                         is_published=True, published_at=timezone.now())
+        url = f'/api/v1/public_articles/{article.pk}/'
+        anonymous = self.client.get(url)
+        self.assertEqual(anonymous.status_code, 403)
+        self.assertNotIn('ETag', anonymous)
+        reader = User.objects.create_user('reader@example.com', 'pw')
+        client = APIClient()
+        client.force_authenticate(reader)
+        with mock.patch('news.conditional.has_premium_access', return_value=True), \
+                mock.patch('news.views.has_premium_access', return_value=True):
+            subscriber = client.get(url)
+        self.assertEqual(subscriber.status_code, 200)
+        self.assertIn('Authorization', subscriber['Vary'])
+        with mock.patch('news.conditional.has_premium_access', return_value=False):
+            # A reader without access never gets the subscriber's ETag matched
+            response = client.get(url, HTTP_IF_NONE_MATCH=subscriber['ETag'])
+        self.assertEqual(response.status_code, 403)
+
+    def test_missing_article_is_404(self):
+        self.assertEqual(self.client.get('/api/v1/public_articles/999999/').status_code, 404)
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        self.category = Category.objects.create(name='World')
+        self.article = Article.objects.create(headline='First', body='Body', category=self.category, author=self.editor,
+                                              is_published=True, published_at=timezone.now())
+        cache.clear()
+        self.router = ReadReplicaRouter()
+
+    def record_reads(self):
+        """Record where each read would go with a replica configured; the reads still run on default."""
+        aliases = []
+        original = ReadReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            aliases.append(original(router, model, **hints))
+            return 'default'
+
+        patches = [mock.patch('news_ique.db.replica_configured', return_value=True),
+                   mock.patch('news.cache.replica_configured', return_value=True),
+                   mock.patch.object(ReadReplicaRouter, 'db_for_read', db_for_read)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        return aliases
+
+    def test_router(self):
+        self.assertEqual(self.router.db_for_read(Article), 'default')
+        with replica_reads():
+            # No replica alias in DATABASES
+            self.assertEqual(self.router.db_for_read(Article), 'default')
+            with mock.patch('news_ique.db.replica_configured', return_value=True):
+                self.assertEqual(self.router.db_for_read(Article), 'replica')
+                self.assertEqual(self.router.db_for_write(Article), 'default')
+                with primary_reads():
+                    self.assertEqual(self.router.db_for_read(Article), 'default')
+                self.assertEqual(self.router.db_for_read(Article), 'replica')
+        self.assertFalse(self.router.allow_migrate('replica', 'news'))
+        self.assertTrue(self.router.allow_migrate('default', 'news'))
+
+    def test_safe_requests_read_from_the_replica(self):
+        aliases = self.record_reads()
+        self.assertEqual(self.client.get('/api/v1/public_articles/').status_code, 200)
+        self.assertEqual(set(aliases), {'replica'})
+        self.assertEqual(self.router.db_for_read(Article), 'default')
+
+    def test_other_viewsets_read_from_the_primary(self):
+        aliases = self.record_reads()
+        client = APIClient()
+        client.force_authenticate(self.editor)
+        self.assertEqual(client.get('/api/v1/articles/').status_code, 200)
+        self.assertEqual(set(aliases), {'default'})
+
+    def test_misses_after_a_write_read_from_the_primary(self):
+        aliases = self.record_reads()
+        self.article.headline = 'Changed'
+        self.article.save()
+        self.client.get('/api/v1/public_articles/')
+        self.assertEqual(set(aliases), {'default'})
+
+        # Once the window has passed the replica has caught up
+        aliases.clear()
+        cache.clear()
+        self.client.get('/api/v1/public_articles/')
+        self.assertEqual(set(aliases), {'replica'})
+
+    @override_settings(REPLICA_LAG_WINDOW=0)
+    def test_window_can_be_disabled(self):
+        aliases = self.record_reads()
+        invalidate('articles')
+        self.client.get('/api/v1/public_articles/')
+        self.assertEqual(set(aliases), {'replica'})
+
+    def test_async_misses_after_a_write_read_from_the_primary(self):
+        aliases = self.record_reads()
+        invalidate('articles')
+        self.assertEqual(self.client.get('/api/v1/async/public_articles/').status_code, 200)
+        self.assertEqual(set(aliases), {'default'})
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_index()
+        self.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR')
+        self.category = Category.objects.create(name='World')
+        self.premium = Category.objects.create(name='Investigations', is_premium=True)
+        now = timezone.now()
+        self.articles = [
+            Article.objects.create(headline=f'Storm {index}', body='Body ' * 80, category=self.category, author=self.editor,
+                                   is_published=True, published_at=now - timezone.timedelta(minutes=index))
+            for index in range(3)
+        ]
+        self.leak = Article.objects.create(headline='Leak', body='Secret ' * 80, category=self.premium, author=self.editor,
+                                           is_published=True, published_at=now - timezone.timedelta(hours=1))
+
+    def assert_same_as_sync(self, path, **params):
+        async_response = self.client.get(f'/api/v1/async/{path}', params)
+        sync_response = self.client.get(f'/api/v1/{path}', params)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        # Pagination links point at each route's own URL
+        async_data, sync_data = async_response.json(), sync_response.json()
+        for data in (async_data, sync_data):
+            if isinstance(data, dict):
+                data.pop('next', None)
+                data.pop('previous', None)
+        self.assertEqual(async_data, sync_data)
+        return async_response
+
+    def test_same_responses_as_the_viewsets(self):
+        self.assert_same_as_sync('public_articles/')
+        self.assert_same_as_sync('public_articles/', view='full', page_size=2, page=2)
+        self.assert_same_as_sync('public_articles/', fields='id,headline', search='storm')
+        self.assert_same_as_sync('public_articles/', pagination='cursor', page_size=2)
+        self.assert_same_as_sync('public_articles/homepage/', page_size=2)
+        self.assert_same_as_sync(f'public_articles/{self.articles[0].pk}/')
+        self.assert_same_as_sync('categories/')
+        self.assert_same_as_sync(f'categories/{self.category.pk}/')
+
+    def test_paywall(self):
+        response = self.assert_same_as_sync(f'public_articles/{self.leak.pk}/')
+        self.assertEqual(response.status_code, 403)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('reader@example.com', 'pw'))
+        with mock.patch('news.async_views.has_premium_access', return_value=True), \
+                mock.patch('news.conditional.has_premium_access', return_value=True):
+            response = client.get(f'/api/v1/async/public_articles/{self.leak.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Secret', response.json()['body'])
+
+    def test_missing_rows_are_404(self):
+        self.assertEqual(self.client.get('/api/v1/async/public_articles/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/async/categories/999999/').status_code, 404)
+
+    def test_conditional_and_cached(self):
+        etag = self.client.get('/api/v1/async/public_articles/')['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/v1/async/public_articles/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get('/api/v1/async/public_articles/').status_code, 200)
+
+    def test_reads_only(self):
+        self.assertEqual(self.client.post('/api/v1/async/public_articles/', {}).status_code, 405)
+
+
+class AsyncPaymentTests(TestCase):
+    def setUp(self):
+        from news.payments import get_gateway
+
+        get_gateway.cache_clear()
+        self.addCleanup(get_gateway.cache_clear)
+        self.user = User.objects.create_user('reader@example.com', 'pw', first_name='Reader')
+        self.plan = SubscriptionPlan.objects.create(name='Monthly', price_cents=500)
+
+    def post(self, data, user=None):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        headers = {}
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'JWT {RefreshToken.for_user(user).access_token}'
+        return self.client.post('/api/v1/payment/initiate/async', data, content_type='application/json', **headers)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.post({'plan_id': self.plan.pk}).status_code, 401)
+
+    @override_settings(PAYMENT_GATEWAY={'BACKEND': 'news.payments.FakeGateway'})
+    def test_initiates_a_checkout(self):
+        response = self.post({'plan_id': self.plan.pk}, self.user)
+        self.assertEqual(response.status_code, 200)
+        txn = PaymentTransaction.objects.get(user=self.user)
+        self.assertEqual((txn.plan, txn.amount_cents, txn.status), (self.plan, 500, 'PENDING'))
+        self.assertIn(f'tran_id={txn.tran_id}', response.json()['payment_url'])
+
+    @override_settings(PAYMENT_GATEWAY={'BACKEND': 'news.payments.FakeGateway'})
+    def test_unknown_plan(self):
+        self.assertEqual(self.post({}, self.user).status_code, 400)
+        self.assertEqual(self.post({'plan_id': 999999}, self.user).status_code, 404)
+        self.assertFalse(PaymentTransaction.objects.exists())
+
+    def test_gateway_failure_closes_the_transaction(self):
+        with mock.patch('news.async_views.get_gateway') as get_gateway:
+            get_gateway.return_value.create_session.return_value = {'status': 'FAILED', 'failedreason': 'down'}
+            response = self.post({'plan_id': self.plan.pk}, self.user)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(PaymentTransaction.objects.get(user=self.user).status, 'FAILED')
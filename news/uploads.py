@@ -0,0 +1,119 @@
+"""
+Background processing of article image uploads.
+
+The write endpoints only check the image header and move the upload (already
+streamed to disk by Django's upload handlers for large files) into a staging
+directory, mark the article ``assets_ready=False`` and return. After the
+transaction commits, a worker from a small in-process pool runs the image
+pipeline (news.images: store the original, compute variants) and flips
+``assets_ready`` back on, which is when the article shows up in public feeds.
+
+Staged files are recorded in ``Article.pending_image``; the
+``process_pending_images`` job retries any that a worker did not finish (for
+instance because the process was recycled). The job may run on another host
+than the one that took the upload, so with more than one host
+``IMAGE_PIPELINE['STAGING_DIR']`` must be on storage they all mount. A staged
+file that cannot be found is logged as an error and its article stays pending;
+it is never released without the image.
+"""
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.move import file_move_safe
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from news.cache import invalidate
+from news.images import UNREADABLE_IMAGE_ERRORS, pipeline_setting, process_image, verify_image
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=pipeline_setting('WORKERS', 2), thread_name_prefix='image-pipeline',
+            )
+        return _executor
+
+
+def staging_dir():
+    path = pipeline_setting('STAGING_DIR', None) or os.path.join(tempfile.gettempdir(), 'news-ique-uploads')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def stage_upload(upload):
+    """Move (or stream, chunk by chunk) an UploadedFile into the staging directory; returns its path."""
+    _, ext = os.path.splitext(upload.name or '')
+    path = os.path.join(staging_dir(), f"{uuid.uuid4().hex}{ext.lower()}")
+    if hasattr(upload, 'temporary_file_path'):
+        file_move_safe(upload.temporary_file_path(), path)
+    else:
+        with open(path, 'wb') as handle:
+            for chunk in upload.chunks():
+                handle.write(chunk)
+    return path
+
+
+def schedule_image_processing(article):
+    """Process ``article.pending_image`` once the current transaction commits."""
+    path, name = article.pending_image, os.path.basename(article.pending_image)
+    if pipeline_setting('WORKERS', 2):
+        transaction.on_commit(lambda: get_executor().submit(run_in_worker, article.pk, path, name))
+    else:
+        transaction.on_commit(lambda: process_staged_image(article.pk, path, name))
+
+
+def run_in_worker(article_id, path, name):
+    close_old_connections()
+    try:
+        process_staged_image(article_id, path, name)
+    except Exception:
+        logger.exception("Processing image %s for article %s failed; left for retry", path, article_id)
+    finally:
+        close_old_connections()
+
+
+def process_staged_image(article_id, path, name):
+    """Run the pipeline on a staged file and publish the result onto the article it belongs to."""
+    from news.models import Article
+
+    try:
+        with open(path, 'rb') as handle:
+            data = handle.read()
+    except FileNotFoundError:
+        # e.g. staged on another host's local disk: leave the article pending rather than lose the upload
+        logger.error(
+            "Staged image %s for article %s is missing; the article stays pending. "
+            "Is IMAGE_PIPELINE['STAGING_DIR'] shared between hosts?", path, article_id,
+        )
+        return False
+
+    # Once the file is read the article is released; only a processed image replaces the current one
+    fields = {'pending_image': '', 'assets_ready': True, 'updated_at': timezone.now()}
+    try:
+        verify_image(data)
+    except UNREADABLE_IMAGE_ERRORS as exc:
+        # The header looked fine but the file is corrupt: keep whatever image the article had
+        logger.warning("Dropping unreadable image %s for article %s: %s", path, article_id, exc)
+    else:
+        # Storage/network errors propagate and leave the upload pending for a retry
+        fields['image'], fields['image_variants'] = process_image(data, name=name)
+
+    # Matching on pending_image drops the result if a newer upload replaced this one meanwhile
+    updated = Article.objects.filter(pk=article_id, pending_image=path).update(**fields)
+    if updated:
+        invalidate('articles')
+    if os.path.exists(path):
+        os.remove(path)
+    return bool(updated)
@@ -2,22 +2,37 @@ from rest_framework.response import Response
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from news.models import Category,Article,Review
-from news.serializers import CategorySerializer,ArticleSerializer,ArticleWriteSerializer,ArticleDetailSerializer,ReviewSerializer
+from news.serializers import CategorySerializer,ArticleSerializer,ArticleWriteSerializer,ArticleDetailSerializer,ArticleListSerializer,ReviewSerializer,PublicReviewSerializer
 from rest_framework.permissions import IsAuthenticatedOrReadOnly,IsAdminUser,AllowAny,IsAuthenticated
-from django.core.mail import send_mail
+from api.mail import enqueue_mail
+from api.throttling import SearchThrottle,ReviewCreateThrottle,PaymentInitiateThrottle
 from django.conf import settings as main_settings
 from drf_yasg.utils import swagger_auto_schema
 from news.filters import ArticleFilter
 from rest_framework.filters import SearchFilter
+from news.search import ArticleSearchFilter
+from news.ingest import ingest_articles,import_setting
+from news.parsers import NDJSONParser
+from rest_framework.parsers import JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
 from news.permissions import IsAdminOrEditor
-from sslcommerz_lib import SSLCOMMERZ 
+from news.pagination import CursorPaginationOptInMixin
+from news.projections import ArticleProjectionMixin
+from news_ique.db import ReplicaReadMixin
+from news.cache import cache_response
+from news.conditional import (
+    conditional_response,article_list_validators,article_detail_validators,category_list_validators,
+    category_detail_validators,plan_list_validators,plan_detail_validators,
+)
+from news.payments import get_gateway,build_session_request,make_tran_id
 from rest_framework import status
-from rest_framework.decorators import api_view,permission_classes
-from users.models import User,SubscriptionPlan,Subscription
+from rest_framework.decorators import api_view,permission_classes,throttle_classes
+from users.models import User,SubscriptionPlan,Subscription,PaymentTransaction
 from users.serializers import SubscriptionPlanSerializer
+from users.entitlements import has_premium_access
 from django.utils import timezone
+from django.db import transaction
 from django.shortcuts import redirect,HttpResponseRedirect
 # Create your views here.
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -56,8 +71,18 @@ class CategoryViewSet(viewsets.ModelViewSet):
         if self.request.method == "GET":
             return [AllowAny()]
         return [IsAdminUser()]
+
+    @conditional_response(category_list_validators, 'categories')
+    @cache_response('categories')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response(category_detail_validators, 'categories')
+    @cache_response('categories')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
-class ArticleViewSet(viewsets.ModelViewSet):
+class ArticleViewSet(ArticleProjectionMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing news articles.
 
@@ -71,6 +96,8 @@ class ArticleViewSet(viewsets.ModelViewSet):
     Filtering and search options:
     - Filter by category, author, or publication date
     - Search by title or content keywords
+    - Lists carry an excerpt instead of the body; `?view=full` for the body,
+      `?fields=id,headline,...` for a subset of fields
 
     Permissions:
     - Authenticated Editor can create and update articles
@@ -87,10 +114,11 @@ class ArticleViewSet(viewsets.ModelViewSet):
  
     queryset = Article.objects.all()
     filterset_class = ArticleFilter
-    search_fields = ['headline', 'body','category__name']
+    compact_serializer_class = ArticleListSerializer
 
 
-    filter_backends=[DjangoFilterBackend,SearchFilter]  
+    filter_backends=[DjangoFilterBackend,ArticleSearchFilter]  
+    throttle_classes = [SearchThrottle]
     # serializer_class=ArticleSerializer
     def get_permissions(self):
         if self.request.method == "GET":
@@ -101,11 +129,23 @@ class ArticleViewSet(viewsets.ModelViewSet):
             return [IsAdminUser()]
         return [IsAuthenticatedOrReadOnly()]
         
+    def get_queryset(self):
+        queryset = Article.objects.all()
+        if self.is_projected():
+            return self.project_queryset(queryset)
+        if self.action == 'list':
+            return queryset.for_list()
+        if self.action == 'retrieve':
+            return queryset.for_detail()
+        return queryset
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
     def get_serializer_class(self):
+        if self.is_compact_view():
+            return self.compact_serializer_class
         if self.action in ['list']:
             return ArticleSerializer
         elif self.action in ['retrieve']:
@@ -126,58 +166,115 @@ class ArticleViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         """ Only Editor can Create an article """
         return super().create(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+            operation_summary ="Bulk import articles (JSON array or NDJSON) by editor"
+    )
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        Import many articles in one request.
+
+        Each item: `headline`, `body`, `category` (id), optional `is_published`,
+        `published_at` and `image_url`. Returns one result per item, in order.
+        """
+        records = request.data
+        if isinstance(records, dict):
+            records = [records]
+        if not isinstance(records, list):
+            return Response({"error":"Expected a JSON array or NDJSON body"},status=status.HTTP_400_BAD_REQUEST)
+        max_items = import_setting('MAX_ITEMS', 5000)
+        if len(records) > max_items:
+            return Response({"error":f"At most {max_items} articles per request"},status=status.HTTP_400_BAD_REQUEST)
+
+        results = ingest_articles(records, author=request.user)
+        created = sum(1 for result in results if result['status'] == 'created')
+        failed = len(results) - created
+        if not failed:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"created":created,"failed":failed,"results":results},status=response_status)
     
 
 
 
-class PublicArticleViewSet(viewsets.ReadOnlyModelViewSet):
-    search_fields = ['headline', 'body', 'category__name']
+def paywall_response(article):
+    paywall_data = {
+        "detail":"This article is premium. An active subscription is required to read the full article.",
+        "article_headline":article.headline,
+        "is_premium":True,
+        "teaser":article.body[:300] + "....",
+        "subscribe_url":"/api/v1/payment/initiate"
+    }
+    return Response(paywall_data,status=status.HTTP_403_FORBIDDEN)
+
+
+class PublicArticleViewSet(ReplicaReadMixin, ArticleProjectionMixin, CursorPaginationOptInMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Published articles for readers, served from the read replica when one is configured.
+
+    List and homepage return an excerpt instead of the body unless `?view=full`
+    is passed, and accept `?fields=id,headline,...` to return only the named fields.
+    """
     pagination_class = PageNumberPagination
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, ArticleSearchFilter]
     filterset_class = ArticleFilter
-    queryset = Article.objects.filter(is_published=True)
+    throttle_classes = [SearchThrottle]
+    queryset = Article.objects.published()
     serializer_class = ArticleDetailSerializer
+    compact_serializer_class = ArticleListSerializer
+
+    def get_queryset(self):
+        # An explicit order keeps page-number pages and list ETags deterministic
+        queryset = Article.objects.published().order_by('-published_at', '-id')
+        if self.is_projected():
+            return self.project_queryset(queryset)
+        return queryset.for_action(self.action)
+
+    @conditional_response(article_list_validators, 'articles')
+    @cache_response('articles')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
+    @conditional_response(article_detail_validators, 'articles')
+    @cache_response('articles')
     def retrieve(self, request, *args, **kwargs):
         article = self.get_object()
-        user = request.user
         is_article_premium = article.category.is_premium
         if is_article_premium:
-            is_subscribed = False
-            if user.is_authenticated:
-                try:
-                    user_subscription = user.subscription
-                    is_subscribed = user_subscription.is_active
-                except:
-                    is_subscribed= False
-            if not is_subscribed:
-                paywall_data = {
-                    "detail":"This article is premium. An active subscription is required to read the full article.",
-                    "article_headline":article.headline,
-                    "is_premium":True,
-                    "teaser":article.body[:300] + "....",
-                    "subscribe_url":"/api/v1/payment/initiate"
-                }
-                return Response(paywall_data,status=status.HTTP_403_FORBIDDEN)
+            if not has_premium_access(request.user):
+                return paywall_response(article)
         serializer= self.get_serializer(article)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @conditional_response(article_list_validators, 'articles')
+    @cache_response('articles')
     def homepage(self, request):
         """
         Homepage endpoint: Featured article + paginated articles
+
+        The featured article is the newest one, taken from the first page
+        itself; later pages return `featured: null`.
+        Pass `?pagination=cursor` for keyset pagination.
         """
-        qs = self.get_queryset().order_by("-published_at")
+        # Paginate articles
+        page = self.paginate_queryset(self.homepage_queryset())
+        return self.homepage_response(page)
+
+    def homepage_queryset(self):
+        return self.get_queryset().order_by("-published_at", "-id")
+
+    def homepage_response(self, page):
+        articles_data = self.get_serializer(page, many=True).data if page else []
 
         # Featured article
-        featured_article = qs.first()
         featured_data = None
-        if featured_article:
-            featured_data = ArticleDetailSerializer(featured_article).data
-
-        # Paginate articles
-        page = self.paginate_queryset(qs)
-        articles_data = ArticleDetailSerializer(page, many=True).data if page else []
+        if articles_data and self.is_first_page():
+            featured_data = articles_data[0]
 
         return self.get_paginated_response({
             "featured": featured_data,
@@ -213,30 +310,57 @@ class ReviewViewSet(viewsets.ModelViewSet):
     
     serializer_class = ReviewSerializer
     permission_classes=[IsAuthenticatedOrReadOnly]
+    throttle_classes = [ReviewCreateThrottle]
     
+    def is_public_route(self):
+        return 'public_article_pk' in self.kwargs
+
+    def get_serializer_class(self):
+        if self.is_public_route():
+            return PublicReviewSerializer
+        return ReviewSerializer
+
     def get_queryset(self):
         article_id = (
             self.kwargs.get('article_pk') or self.kwargs.get('public_article_pk')
         )
+        queryset = Review.objects.all()
+        if self.request.method == 'GET':
+            queryset = queryset.for_public_listing() if self.is_public_route() else queryset.for_listing()
         if article_id:
-            return Review.objects.filter(article_id=article_id)
-        return Review.objects.all()
+            return queryset.filter(article_id=article_id).order_by('-created_at', '-id')
+        return queryset
     def perform_create(self, serializer):
         article_id = (
             self.kwargs.get('article_pk') or self.kwargs.get('public_article_pk')
         )
         article = Article.objects.filter(pk=article_id).first()
-        review = serializer.save(user=self.request.user, article=article)
+        # The review and the article's stored aggregates change together or not at all
+        with transaction.atomic():
+            review = serializer.save(user=self.request.user, article=article)
+            Article.adjust_rating(review.article_id, 1, review.ratings)
         headline = article.headline if article else 'Unknown Article'
-        send_mail(
+        enqueue_mail(
             subject = 'Thanks for your review',
             message=f"Hi {self.request.user.first_name},\n\n Thanks for your reviewing: {headline}.\nYour feedback means a lot!",
             from_email=main_settings.EMAIL_HOST_USER,
             recipient_list=[self.request.user.email],
-            fail_silently=True
         )
 
-class SubscriptionPlanViewSet(viewsets.ReadOnlyModelViewSet):
+    def perform_update(self, serializer):
+        previous = serializer.instance.ratings
+        with transaction.atomic():
+            review = serializer.save()
+            if review.ratings != previous:
+                Article.adjust_rating(review.article_id, 0, review.ratings - previous)
+
+    def perform_destroy(self, instance):
+        article_id, ratings = instance.article_id, instance.ratings
+        with transaction.atomic():
+            instance.delete()
+            Article.adjust_rating(article_id, -1, -ratings)
+
+class SubscriptionPlanViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint to list and retrieve Subscription Plans.
     Plans are public and read-only.
@@ -245,9 +369,20 @@ class SubscriptionPlanViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = SubscriptionPlan.objects.all().order_by('price_cents')
     permission_classes = [AllowAny]
 
+    @conditional_response(plan_list_validators, 'plans')
+    @cache_response('plans')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response(plan_detail_validators, 'plans')
+    @cache_response('plans')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([PaymentInitiateThrottle])
 def initiate_payment(request):
     user = request.user
     user_id = user.id
@@ -260,79 +395,36 @@ def initiate_payment(request):
         amount = plan.price_cents
     except:
         return Response({"error":"Invalid subscription plan"}, status=status.HTTP_404_NOT_FOUND)
-    tran_id = f"txn:{user.id}_{plan.id}_{int(timezone.now().timestamp())}"
-    settings = { 'store_id': 'phima68e15b8a44795', 'store_pass': 'phima68e15b8a44795@ssl', 'issandbox': True }
-    sslcz = SSLCOMMERZ(settings)
-    post_body = {}
-    post_body['total_amount'] = amount
-    post_body['currency'] = "BDT"
-    post_body['tran_id'] = tran_id
-    post_body['success_url'] = f"{main_settings.BACKEND_URL}/api/v1/payment/success"
-    post_body['fail_url'] = f"{main_settings.BACKEND_URL}/api/v1/payment/fail"
-    post_body['cancel_url'] = f"{main_settings.BACKEND_URL}/api/v1/payment/cancel"
-    post_body['emi_option'] = 0
-    post_body['cus_name'] = f"{user.first_name} {user.last_name}"
-    post_body['cus_email'] = user.email
-    post_body['cus_phone'] = "8978934"
-    post_body['cus_add1'] = "None"
-    post_body['cus_city'] = "Dhaka" 
-    post_body['cus_country'] = "Bangladesh"
-    post_body['shipping_method'] = "NO"
-    post_body['multi_card_name'] = ""
-    post_body['num_of_item'] = 1
-    post_body['product_name'] = "News Subscription"
-    post_body['product_category'] = "General"
-    post_body['product_profile'] = "general"
-
-
-    response = sslcz.createSession(post_body) # API response
+    tran_id = make_tran_id(user, plan)
+    PaymentTransaction.objects.create(tran_id=tran_id, user=user, plan=plan, amount_cents=amount)
+    post_body = build_session_request(user, plan, tran_id)
+    response = get_gateway().create_session(post_body) # API response
     if response.get('status') == 'SUCCESS':
         return Response({'payment_url':response['GatewayPageURL']})
+    PaymentTransaction.close(tran_id, 'FAILED', response)
     return Response({"error":"payment initation failed"},status=status.HTTP_400_BAD_REQUEST)
 
+def callback_payload(request):
+    return {key: request.data.get(key) for key in request.data.keys()}
+
 @api_view(['POST'])
 def payment_success(request):
     tran_id = request.data.get('tran_id')
     if not tran_id:
         return Response({"error": "Transaction ID not provided"}, status=status.HTTP_400_BAD_REQUEST)
-    
-    txn_parts = tran_id.replace('txn:', '').split('_')
-    if len(txn_parts) != 3:
-        return Response({"error": "Invalid transaction ID"}, status=status.HTTP_400_BAD_REQUEST)
-    
-    user_id, plan_id, timestamp = txn_parts
-    
-    try:
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    plan = SubscriptionPlan.objects.get(id=plan_id)
-    
-    subscription, created = Subscription.objects.get_or_create(
-        user=user,
-        defaults={
-            "plan": plan,
-            "tran_id": tran_id,
-            "started_at": timezone.now(),
-            "ends_at": timezone.now() + timezone.timedelta(days=30),
-            "is_active": True
-        }
-    )
 
-    if not created:
-        # Update existing subscription
-        subscription.plan = plan
-        subscription.tran_id = tran_id
-        subscription.started_at = timezone.now()
-        subscription.ends_at = timezone.now() + timezone.timedelta(days=30)
-        subscription.is_active = True
-        subscription.save()
+    try:
+        # Retried or concurrent callbacks for the same tran_id are no-ops
+        PaymentTransaction.complete(tran_id, callback_payload(request))
+    except PaymentTransaction.DoesNotExist:
+        return Response({"error": "Invalid transaction ID"}, status=status.HTTP_404_NOT_FOUND)
 
     return HttpResponseRedirect(f"{main_settings.FRONTEND_URL}/payment/success")
 @api_view(['POST'])
 def payment_cancel(request):
+    PaymentTransaction.close(request.data.get('tran_id'), 'CANCELLED', callback_payload(request))
     return HttpResponseRedirect(f"{main_settings.FRONTEND_URL}/subscription/plan")
 @api_view(['POST'])
 def payment_failed(request):
+    PaymentTransaction.close(request.data.get('tran_id'), 'FAILED', callback_payload(request))
     return HttpResponseRedirect(f"{main_settings.FRONTEND_URL}/subscription/plan")
@@ -2,6 +2,8 @@
 ASGI config for news_ique project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The async read endpoints (news.async_views, under /api/v1/async/) run on the
+event loop here; see DB_CONN_MAX_AGE in settings for connection handling.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -0,0 +1,137 @@
+"""
+Database connection helpers: replica routing and connection/pool metrics.
+
+Persistent connections, health checks and the optional psycopg pool are plain
+``DATABASES`` settings (see news_ique/settings.py). This module adds:
+
+- ``ReadReplicaRouter``: sends reads to the ``replica`` alias, when one is
+  configured, but only inside ``replica_reads()`` (entered by
+  ``ReplicaReadMixin`` for GET requests on read-only viewsets). Everything
+  else, including reads made while handling a write, stays on ``default``.
+  ``primary_reads()`` puts a block back on ``default`` inside a replica
+  request, e.g. to rebuild a cache entry right after a write (news.cache).
+- ``connection_stats()``: connections opened per alias, plus the psycopg pool's
+  size, waits and checkout latency when pooling is enabled.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+REPLICA_ALIAS = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """Route ORM reads in this block (and this thread/task only) to the replica, if there is one."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Route ORM reads in this block back to ``default``, even inside ``replica_reads()``."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured():
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+class ReplicaReadMixin:
+    """Viewset mixin: serve safe-method requests from the read replica."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+
+_stats_lock = threading.Lock()
+_opened = {}
+
+
+def _count_connection(sender, connection, **kwargs):
+    with _stats_lock:
+        stats = _opened.setdefault(connection.alias, {'opened': 0, 'last_opened_at': None})
+        stats['opened'] += 1
+        stats['last_opened_at'] = time.time()
+
+
+def track_connections():
+    """Count new connections per alias; called once from ApiConfig.ready()."""
+    connection_created.connect(_count_connection, dispatch_uid='news_ique.db.track_connections')
+
+
+def pool_stats(alias=DEFAULT_DB_ALIAS):
+    """The psycopg pool's counters for ``alias``, or None when it is not pooled."""
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    waits = stats.get('requests_num', 0)
+    return {
+        'min_size': stats.get('pool_min'),
+        'max_size': stats.get('pool_max'),
+        'size': stats.get('pool_size'),
+        'available': stats.get('pool_available'),
+        'waiting': stats.get('requests_waiting', 0),
+        'checkouts': waits,
+        'checkout_wait_ms_total': stats.get('requests_wait_ms', 0),
+        'checkout_wait_ms_avg': round(stats.get('requests_wait_ms', 0) / waits, 2) if waits else 0,
+        'checkout_timeouts': stats.get('requests_errors', 0),
+        'connections_opened': stats.get('connections_num', 0),
+        'connect_ms_total': stats.get('connections_ms', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+    }
+
+
+def connection_stats():
+    """Per-alias connection settings and counters for this process."""
+    result = {}
+    for alias in connections:
+        settings_dict = connections[alias].settings_dict
+        with _stats_lock:
+            opened = dict(_opened.get(alias, {'opened': 0, 'last_opened_at': None}))
+        result[alias] = {
+            'vendor': connections[alias].vendor,
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': settings_dict.get('CONN_HEALTH_CHECKS'),
+            'pooled': bool(settings_dict.get('OPTIONS', {}).get('pool')),
+            'connections_opened': opened['opened'],
+            'last_opened_at': opened['last_opened_at'],
+            'pool': pool_stats(alias),
+        }
+    return result
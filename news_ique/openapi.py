@@ -0,0 +1,69 @@
+"""
+Swagger/ReDoc views, built on first use.
+
+drf_yasg's views, schema generator and inspectors are only imported when a
+docs URL is hit, so ordinary API cold starts do not pay for them. (Boot still
+loads the drf_yasg app and ``drf_yasg.utils``, for ``swagger_auto_schema`` in
+news.views; both are light.) When the schema artifact
+written by ``manage.py export_openapi`` exists (``settings.OPENAPI_SCHEMA_FILE``),
+``?format=openapi`` is answered from that file instead of regenerating the
+schema on every request.
+"""
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse
+from rest_framework import permissions
+
+API_INFO = {
+    'title': "NewsIque API",
+    'default_version': 'v1',
+    'description': "API documentation for NEWSIQUE project",
+    'terms_of_service': "https://www.google.com/policies/terms/",
+    'contact_email': "contact@newsique.local",
+    'license_name': "BSD License",
+}
+
+
+def get_api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title=API_INFO['title'],
+        default_version=API_INFO['default_version'],
+        description=API_INFO['description'],
+        terms_of_service=API_INFO['terms_of_service'],
+        contact=openapi.Contact(email=API_INFO['contact_email']),
+        license=openapi.License(name=API_INFO['license_name']),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_schema_view():
+    from drf_yasg.views import get_schema_view as yasg_schema_view
+
+    return yasg_schema_view(get_api_info(), public=True, permission_classes=(permissions.AllowAny,))
+
+
+@lru_cache(maxsize=None)
+def get_ui_view(renderer):
+    return get_schema_view().with_ui(renderer, cache_timeout=0)
+
+
+def static_schema_path():
+    path = getattr(settings, 'OPENAPI_SCHEMA_FILE', None)
+    if path and Path(path).is_file():
+        return Path(path)
+    return None
+
+
+def schema_ui(renderer):
+    """A URL view for the ``renderer`` ('swagger' or 'redoc') UI and its ``?format=openapi`` spec."""
+    def view(request, *args, **kwargs):
+        path = static_schema_path()
+        if path is not None and request.GET.get('format') == 'openapi':
+            return FileResponse(path.open('rb'), content_type='application/json')
+        return get_ui_view(renderer)(request, *args, **kwargs)
+    view.__name__ = f"{renderer}_ui"
+    return view
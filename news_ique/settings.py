@@ -54,9 +54,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover the rest of the stack
+    'api.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise, async-capable so ASGI requests stay on the event loop
+    "news_ique.middleware.StaticFilesMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -119,11 +122,69 @@ DATABASES = {
         'USER': config('user',default =''),
         'PASSWORD': config('password',default=''),
         'HOST': config('host',default='localhost'),
-        'PORT': config('port',cast=int)
+        'PORT': config('port',cast=int),
+        # Keep connections open between requests (seconds; 0 closes after each request)
+        # and ping them before reuse so a dropped connection is replaced, not raised.
+        # Under ASGI each request runs its ORM calls on a thread of its own, so persistent
+        # connections pile up there: serve news_ique.asgi with DB_CONN_MAX_AGE=0 or DB_POOL=1
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
     }
 }
 
+# In-process connection pool (psycopg 3 and psycopg-pool, both in requirements.txt).
+# Replaces persistent connections; pooled connections are health checked on checkout.
+if config('DB_POOL', default=False, cast=bool):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            # Seconds a request waits for a free connection before failing
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            # Seconds before a connection is recycled, and before an idle one is closed
+            'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=1800, cast=float),
+            'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+        },
+    }
+
+# Optional read replica for GET requests on read-only viewsets (news_ique.db.ReadReplicaRouter)
+if config('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT'], cast=int),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['news_ique.db.ReadReplicaRouter']
+# Seconds after a write (news.cache.invalidate) during which cache misses for the
+# written data are rebuilt from the primary, so replica lag can't be cached
+REPLICA_LAG_WINDOW = config('DB_REPLICA_LAG_WINDOW', default=5, cast=int)
+
+
+
+# Cache
+# Local memory by default; point CACHE_BACKEND at
+# django.core.cache.backends.filebased.FileBasedCache (LOCATION = a directory) or
+# django.core.cache.backends.db.DatabaseCache (LOCATION = a table, run createcachetable)
+# to share entries between worker processes. run_scheduler refuses to start on
+# locmem, since its invalidations would never reach the web workers (api.W001, reported by check --deploy).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='news-ique'),
+        'TIMEOUT': 300,
+    }
+}
 
+# Seconds an anonymous response stays cached (news.cache.cache_response),
+# keyed by "<route basename>-<action>" or by the basename alone
+RESPONSE_CACHE_TTLS = {
+    'public_articles-homepage': 30,
+    'public_articles': 60,
+    'category': 300,
+    'subscription-plan': 600,
+}
 
 # Configuration  for cloudinary storage  
 cloudinary.config( 
@@ -193,6 +254,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE_QUERY_PARAM': 'page_size',
     'PAGE_SIZE':10,
+    # Views that set their own throttle_classes (search, reviews, payments) replace this
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.AuthThrottle'],
+    # Reverse proxies in front of the app; anonymous clients are throttled by the address the
+    # outermost of them saw (X-Forwarded-For). 0 = use REMOTE_ADDR and ignore the header
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
      
     #  "DEFAULT_PERMISSION_CLASSES": (
     #     "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -233,12 +299,111 @@ DJOSER = {
 
 
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Outgoing mail (including Djoser's) is queued in the database by api.mail and
+# delivered by `manage.py send_queued_mail` through MAIL_DELIVERY_BACKEND
+EMAIL_BACKEND = 'api.mail.OutboxEmailBackend'
+MAIL_DELIVERY_BACKEND = config('MAIL_DELIVERY_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+MAIL_QUEUE = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 60,
+}
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_USE_TLS = config('EMAIL_USE_TLS',cast=bool)
 EMAIL_PORT = config('EMAIL_PORT')
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 
+# Bulk article import (news.ingest): POST articles/bulk/ and `manage.py import_articles`
+ARTICLE_IMPORT = {
+    'BATCH_SIZE': 500,
+    'IMAGE_WORKERS': 8,
+    'MAX_ITEMS': 5000,
+}
+
+# Article image processing (news.images): where originals go and which widths are precomputed.
+# news.images.LocalImageBackend keeps everything under MEDIA_ROOT, for offline runs
+IMAGE_PIPELINE = {
+    'BACKEND': config('IMAGE_BACKEND', default='news.images.CloudinaryImageBackend'),
+    'OPTIONS': {},
+    'VARIANTS': {'thumb': 320, 'card': 640, 'hero': 1280},
+    'MAX_BYTES': 20 * 1024 * 1024,
+    'MAX_PIXELS': 50_000_000,
+    # Redirects followed when importing by image_url; each hop must resolve to a public address
+    'MAX_REDIRECTS': 5,
+    # Uploads are processed by this many background threads per process (0 = inline, after commit);
+    # news.jobs.process_pending_images retries any left unfinished after STALE_AFTER seconds
+    'WORKERS': config('IMAGE_WORKERS', default=2, cast=int),
+    # With several hosts this must be shared storage, or a retry on another host can't find the file
+    'STAGING_DIR': config('IMAGE_STAGING_DIR', default='') or None,
+    'STALE_AFTER': 300,
+}
+
+# Per-route request timings (api.instrumentation): Server-Timing headers, GET ops/metrics
+# (Prometheus text; staff or `Authorization: Bearer <METRICS_TOKEN>`) and ops/metrics/summary
+INSTRUMENTATION = {
+    'ENABLED': config('INSTRUMENTATION_ENABLED', default=True, cast=bool),
+    'SERVER_TIMING': config('SERVER_TIMING', default=True, cast=bool),
+    # Queries at least this slow are sampled (at SLOW_QUERY_SAMPLE_RATE) with normalized SQL
+    'SLOW_QUERY_MS': config('SLOW_QUERY_MS', default=100, cast=int),
+    'SLOW_QUERY_SAMPLE_RATE': 1.0,
+    'MAX_SLOW_QUERIES': 200,
+    'WINDOW': 500,
+}
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Prebuilt schema served for /swagger/?format=openapi (news_ique.openapi); regenerate it with
+# `manage.py export_openapi` whenever the API changes
+OPENAPI_SCHEMA_FILE = config('OPENAPI_SCHEMA_FILE', default=str(STATIC_ROOT / 'openapi.json'))
+
+# `manage.py profile_startup` fails when booting the WSGI app takes longer than this
+STARTUP_BUDGET_MS = config('STARTUP_BUDGET_MS', default=1500, cast=int)
+
+# Request throttling (api.throttling). Per scope: the algorithm and a "<requests>/<period>"
+# rate per tier: anon (per IP), user (signed in), subscriber (active subscription) and
+# editor (editors/admins); a tier left out is not limited. Counters live in the CACHE
+# alias: per process with locmem, shared between workers with the file or db backend
+# (not atomically: with N worker processes a client can get up to about N times its rate)
+THROTTLING = {
+    'ENABLED': config('THROTTLING_ENABLED', default=True, cast=bool),
+    'CACHE': config('THROTTLE_CACHE', default='default'),
+    'SCOPES': {
+        'search': {
+            'algorithm': 'token_bucket',
+            'rates': {'anon': '30/min', 'user': '60/min', 'subscriber': '120/min', 'editor': '600/min'},
+        },
+        'review_create': {
+            'algorithm': 'token_bucket',
+            'rates': {'anon': '5/hour', 'user': '10/hour', 'subscriber': '30/hour', 'editor': '120/hour'},
+        },
+        'payment_initiate': {
+            'algorithm': 'token_bucket',
+            'rates': {'anon': '5/hour', 'user': '10/hour', 'subscriber': '10/hour', 'editor': '30/hour'},
+        },
+        'auth': {
+            'algorithm': 'sliding_window',
+            'rates': {'anon': '10/min', 'user': '20/min', 'subscriber': '20/min', 'editor': '60/min'},
+        },
+    },
+}
+
+# users.jobs.send_renewal_reminders
+SUBSCRIPTION_REMINDER_DAYS = 3
+SUBSCRIPTION_REMINDER_BATCH_SIZE = 500
+
+# Payment provider used by news.payments.get_gateway(); set PAYMENT_GATEWAY_BACKEND to
+# news.payments.FakeGateway for tests, local development and benchmarks
+PAYMENT_GATEWAY = {
+    'BACKEND': config('PAYMENT_GATEWAY_BACKEND', default='news.payments.SSLCommerzGateway'),
+    'OPTIONS': {
+        'store_id': config('SSLCOMMERZ_STORE_ID', default='phima68e15b8a44795'),
+        'store_pass': config('SSLCOMMERZ_STORE_PASS', default='phima68e15b8a44795@ssl'),
+        'issandbox': config('SSLCOMMERZ_SANDBOX', default=True, cast=bool),
+        # (connect, read) seconds
+        'timeout': (3.05, 10),
+        'pool_size': 10,
+    },
+}
+
 BACKEND_URL = config('BACKEND_URL')
 FRONTEND_URL = config('FRONTEND_URL')
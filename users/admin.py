@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from users.models import User, UserProfile
+from users.models import User, UserProfile, PaymentTransaction
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -30,3 +30,10 @@ class CustomUserAdmin(UserAdmin):
     ordering = ('email',)
 
 admin.site.register(User, CustomUserAdmin)
+
+
+@admin.register(PaymentTransaction)
+class PaymentTransactionAdmin(admin.ModelAdmin):
+    list_display = ('tran_id', 'user', 'plan', 'amount_cents', 'status', 'created_at', 'processed_at')
+    list_filter = ('status',)
+    search_fields = ('tran_id', 'user__email')
@@ -0,0 +1,50 @@
+"""
+Premium entitlement checks.
+
+``has_premium_access(user)`` answers "may this user read premium articles"
+with one query on the first call and from the cache afterwards. A positive
+answer is cached until the subscription's ``ends_at``, so it lapses exactly
+when the subscription does; a negative one is cached briefly. Saving or
+deleting a Subscription (payment_success, admin edits, the expiry sweeper)
+drops the cached answer for that user.
+"""
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+ENTITLEMENT_KEY = 'entitlement:premium:{}'
+NEGATIVE_TTL = 60
+OPEN_ENDED_TTL = 60 * 60
+
+
+def subscription_is_current(is_active, ends_at, now=None):
+    now = now or timezone.now()
+    return bool(is_active) and (ends_at is None or ends_at > now)
+
+
+def has_premium_access(user):
+    if user is None or not user.is_authenticated:
+        return False
+    key = ENTITLEMENT_KEY.format(user.pk)
+    allowed = cache.get(key)
+    if allowed is not None:
+        return allowed
+
+    from users.models import Subscription
+
+    now = timezone.now()
+    # Always the primary: a replica lagging behind payment_success would cache a false "no"
+    subscription = Subscription.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user.pk).values('is_active', 'ends_at').first()
+    allowed = bool(subscription) and subscription_is_current(subscription['is_active'], subscription['ends_at'], now)
+    if not allowed:
+        ttl = NEGATIVE_TTL
+    elif subscription['ends_at'] is None:
+        ttl = OPEN_ENDED_TTL
+    else:
+        ttl = max(int((subscription['ends_at'] - now).total_seconds()), 1)
+    cache.set(key, allowed, ttl)
+    return allowed
+
+
+def invalidate_entitlement(*user_ids):
+    cache.delete_many([ENTITLEMENT_KEY.format(user_id) for user_id in user_ids])
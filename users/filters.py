@@ -0,0 +1,13 @@
+from django_filters import rest_framework as filters
+from users.models import User
+
+
+class UserFilter(filters.FilterSet):
+    role = filters.ChoiceFilter(choices=User.ROLE_CHOICES)
+    is_premium = filters.BooleanFilter(field_name='is_premium')
+    is_active = filters.BooleanFilter()
+    email = filters.CharFilter(lookup_expr='icontains')
+
+    class Meta:
+        model = User
+        fields = ['role', 'is_premium', 'is_active', 'email']
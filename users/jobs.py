@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.scheduler import job
+from users.entitlements import invalidate_entitlement
+from users.models import Subscription
+
+
+@job(interval=60)
+def expire_subscriptions():
+    """Flip every lapsed subscription to inactive in one UPDATE."""
+    lapsed = Subscription.objects.filter(is_active=True, ends_at__lte=timezone.now())
+    user_ids = list(lapsed.values_list('user_id', flat=True))
+    if not user_ids:
+        return {'expired': 0}
+    expired = lapsed.filter(user_id__in=user_ids).update(is_active=False)
+    # update() skips Subscription.save(), so drop the cached entitlements here
+    invalidate_entitlement(*user_ids)
+    return {'expired': expired}
+
+
+@job(interval=60 * 60)
+def send_renewal_reminders():
+    """Queue one reminder per subscription term for subscriptions ending within SUBSCRIPTION_REMINDER_DAYS."""
+    now = timezone.now()
+    days = getattr(settings, 'SUBSCRIPTION_REMINDER_DAYS', 3)
+    batch_size = getattr(settings, 'SUBSCRIPTION_REMINDER_BATCH_SIZE', 500)
+    due = (
+        Subscription.objects.filter(is_active=True, ends_at__gt=now, ends_at__lte=now + timezone.timedelta(days=days))
+        .filter(Q(renewal_reminder_sent_at__isnull=True) | Q(renewal_reminder_sent_at__lt=F('started_at')))
+        .select_related('user', 'plan')
+        .order_by('pk')
+    )
+    queued = last_pk = 0
+    while True:
+        batch = list(due.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        send_mass_mail([
+            (
+                'Your NewsIque subscription is ending soon',
+                f"Hi {subscription.user.first_name},\n\nYour {getattr(subscription.plan, 'name', 'NewsIque')} subscription "
+                f"ends on {subscription.ends_at:%d %B %Y}. Renew to keep reading premium articles.\n\n"
+                f"{settings.FRONTEND_URL}/subscription/plan",
+                settings.EMAIL_HOST_USER,
+                [subscription.user.email],
+            )
+            for subscription in batch
+        ])
+        Subscription.objects.filter(pk__in=[subscription.pk for subscription in batch]).update(renewal_reminder_sent_at=now)
+        queued += len(batch)
+    return {'reminders_queued': queued}
@@ -1,6 +1,21 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
+from django.db.models import Case, When, Q, Value
+from django.utils import timezone
 
-class CustomUserManager(BaseUserManager):
+
+class UserQuerySet(models.QuerySet):
+    def with_premium_status(self):
+        """Annotate is_premium: an active subscription that has not passed ends_at."""
+        current = Q(subscription__is_active=True) & (
+            Q(subscription__ends_at__isnull=True) | Q(subscription__ends_at__gt=timezone.now())
+        )
+        return self.annotate(
+            is_premium=Case(When(current, then=Value(True)), default=Value(False), output_field=models.BooleanField())
+        )
+
+
+class CustomUserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError("Email must be set")
@@ -0,0 +1,14 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:17
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_subscription_tran_id'),
+    ]
+
+    # Subscription.tran_id needs no index: payment callbacks look transactions up
+    # by PaymentTransaction.tran_id (unique) instead
+    operations = []
@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models,transaction
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from .managers import CustomUserManager
+from news.cache import invalidate
+from users.entitlements import subscription_is_current,invalidate_entitlement
 # Create your models here.
 
 class User(AbstractUser):
@@ -36,6 +39,17 @@ class SubscriptionPlan(models.Model):
     name = models.CharField(max_length=100)
     price_cents= models.PositiveIntegerField(default=0)
     features = models.JSONField(default=dict,blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate('plans')
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate('plans')
+        return result
+
 class Subscription(models.Model):
     user    = models.OneToOneField(User,on_delete=models.CASCADE,related_name='subscription')
     plan = models.ForeignKey(SubscriptionPlan,on_delete=models.SET_NULL,null=True)
@@ -43,4 +57,88 @@ class Subscription(models.Model):
     tran_id = models.CharField(max_length=250,blank=True,null=True)
     started_at = models.DateTimeField(null=True,blank=True)
     ends_at = models.DateTimeField(null=True,blank=True)
-    
\ No newline at end of file
+    renewal_reminder_sent_at = models.DateTimeField(null=True,blank=True)
+
+    class Meta:
+        indexes = [
+            # Expiry sweeps and renewal reminders (users.jobs)
+            models.Index(fields=['ends_at'], name='users_sub_active_ends_idx', condition=models.Q(is_active=True)),
+        ]
+
+    @property
+    def is_current(self):
+        return subscription_is_current(self.is_active, self.ends_at)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # After commit, so a concurrent read can't cache the old entitlement again
+        transaction.on_commit(lambda: invalidate_entitlement(self.user_id))
+
+    def delete(self, *args, **kwargs):
+        user_id = self.user_id
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(lambda: invalidate_entitlement(user_id))
+        return result
+
+
+class PaymentTransaction(models.Model):
+    """Ledger of checkout sessions; one row per gateway tran_id."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SUCCESS', 'Success'),
+        ('FAILED', 'Failed'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+    SUBSCRIPTION_DAYS = 30
+
+    tran_id = models.CharField(max_length=250,unique=True)
+    user = models.ForeignKey(User,on_delete=models.CASCADE,related_name='payment_transactions')
+    plan = models.ForeignKey(SubscriptionPlan,on_delete=models.SET_NULL,null=True)
+    amount_cents = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10,choices=STATUS_CHOICES,default='PENDING')
+    gateway_payload = models.JSONField(default=dict,blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True,blank=True)
+
+    def __str__(self):
+        return f"{self.tran_id} ({self.status})"
+
+    @classmethod
+    def complete(cls, tran_id, payload=None):
+        """
+        Apply a successful gateway callback exactly once.
+
+        The ledger row is locked for the whole transaction, so duplicate or
+        concurrent callbacks for the same tran_id queue behind the first one
+        and then find it no longer PENDING. Only a PENDING transaction is
+        applied: a late success for one already FAILED or CANCELLED grants
+        nothing. Returns ``(transaction, applied)``; raises ``DoesNotExist``
+        for an unknown tran_id.
+        """
+        with transaction.atomic():
+            txn = cls.objects.select_for_update().get(tran_id=tran_id)
+            if txn.status != 'PENDING':
+                return txn, False
+            now = timezone.now()
+            Subscription.objects.update_or_create(
+                user_id=txn.user_id,
+                defaults={
+                    "plan_id": txn.plan_id,
+                    "tran_id": txn.tran_id,
+                    "started_at": now,
+                    "ends_at": now + timezone.timedelta(days=cls.SUBSCRIPTION_DAYS),
+                    "is_active": True,
+                },
+            )
+            txn.status = 'SUCCESS'
+            txn.processed_at = now
+            txn.gateway_payload = payload or {}
+            txn.save(update_fields=['status', 'processed_at', 'gateway_payload'])
+            return txn, True
+
+    @classmethod
+    def close(cls, tran_id, status, payload=None):
+        """Mark a still-pending transaction FAILED or CANCELLED; a no-op otherwise."""
+        return cls.objects.filter(tran_id=tran_id, status='PENDING').update(
+            status=status, processed_at=timezone.now(), gateway_payload=payload or {},
+        )
@@ -39,13 +39,20 @@ class CurrentUserSerializer(BaseUserSerializer):
         fields =['id','first_name','last_name','email','phone_number','role','subscription']
         read_only_fields=['role','subscription']
 
+class ReviewerSerializer(serializers.ModelSerializer):
+    """Public face of a review author: no contact or subscription data."""
+    class Meta:
+        model = User
+        fields =['id','first_name','last_name']
+
 class UserListSerializer(serializers.ModelSerializer):
     is_premium = serializers.SerializerMethodField()
     class Meta:
         model = User
         fields =['id','first_name','last_name','email','phone_number','role','is_active','is_premium']
     def get_is_premium(self,obj):
+        # Annotated in SQL by User.objects.with_premium_status() on list reads
+        if hasattr(obj,'is_premium'):
+            return obj.is_premium
         subscription = getattr(obj,'subscription',None)
-        if subscription and subscription.is_active:
-            return True
-        return False
+        return bool(subscription and subscription.is_current)
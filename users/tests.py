@@ -1,3 +1,282 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.core import mail
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.entitlements import NEGATIVE_TTL, has_premium_access
+from users.jobs import expire_subscriptions, send_renewal_reminders
+from users.models import PaymentTransaction, Subscription, SubscriptionPlan, User
+from users.views import EXPORT_FIELDS
+
+
+# Needs real row locks (PostgreSQL); SQLite serializes whole tables instead
+@skipUnlessDBFeature('has_select_for_update')
+class CompletePaymentConcurrencyTests(TransactionTestCase):
+    callers = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader@example.com', 'pw')
+        self.plan = SubscriptionPlan.objects.create(name='Monthly', price_cents=500)
+        PaymentTransaction.objects.create(tran_id='TRAN-1', user=self.user, plan=self.plan, amount_cents=500)
+
+    def test_concurrent_callbacks_apply_once(self):
+        results, errors, writes = [], [], []
+        lock = threading.Lock()
+        start = threading.Barrier(self.callers)
+
+        def record_write(sender, instance, **kwargs):
+            with lock:
+                writes.append(instance.pk)
+
+        def callback():
+            try:
+                start.wait()
+                _, applied = PaymentTransaction.complete('TRAN-1', {'status': 'VALID'})
+                with lock:
+                    results.append(applied)
+            except Exception as exc:
+                with lock:
+                    errors.append(exc)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        post_save.connect(record_write, sender=Subscription)
+        try:
+            threads = [threading.Thread(target=callback) for _ in range(self.callers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            post_save.disconnect(record_write, sender=Subscription)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(results), [False] * (self.callers - 1) + [True])
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(Subscription.objects.filter(user=self.user, is_active=True).count(), 1)
+        self.assertEqual(PaymentTransaction.objects.get(tran_id='TRAN-1').status, 'SUCCESS')
+
+
+class CompletePaymentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader@example.com', 'pw')
+        self.plan = SubscriptionPlan.objects.create(name='Monthly', price_cents=500)
+
+    def make_transaction(self, status):
+        return PaymentTransaction.objects.create(
+            tran_id=f'TRAN-{status}', user=self.user, plan=self.plan, amount_cents=500, status=status,
+        )
+
+    def test_late_success_after_failure_or_cancel_grants_nothing(self):
+        for status in ('FAILED', 'CANCELLED'):
+            with self.subTest(status=status):
+                self.make_transaction(status)
+                txn, applied = PaymentTransaction.complete(f'TRAN-{status}', {'status': 'VALID'})
+                self.assertFalse(applied)
+                self.assertEqual(txn.status, status)
+                self.assertFalse(Subscription.objects.filter(user=self.user).exists())
+
+    def test_entitlement_invalidated_on_commit(self):
+        self.make_transaction('PENDING')
+        with mock.patch('users.models.invalidate_entitlement') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                PaymentTransaction.complete('TRAN-PENDING')
+                invalidate.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        invalidate.assert_called_once_with(self.user.pk)
+
+
+class PremiumAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader@example.com', 'pw')
+        self.plan = SubscriptionPlan.objects.create(name='Monthly', price_cents=500)
+
+    def subscribe(self, **fields):
+        fields.setdefault('is_active', True)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Subscription.objects.update_or_create(user=self.user, defaults={'plan': self.plan, **fields})[0]
+
+    def test_anonymous_and_unsubscribed(self):
+        self.assertFalse(has_premium_access(AnonymousUser()))
+        self.assertFalse(has_premium_access(self.user))
+
+    def test_current_subscription(self):
+        self.subscribe(ends_at=timezone.now() + timedelta(days=3))
+        self.assertTrue(has_premium_access(self.user))
+
+    def test_expired_or_inactive_subscription(self):
+        self.subscribe(ends_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(has_premium_access(self.user))
+        self.subscribe(is_active=False, ends_at=timezone.now() + timedelta(days=3))
+        self.assertFalse(has_premium_access(self.user))
+
+    def test_positive_answer_is_cached_until_expiry(self):
+        self.subscribe(ends_at=timezone.now() + timedelta(hours=2))
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.assertTrue(has_premium_access(self.user))
+        ttl = cache_set.call_args.args[2]
+        self.assertTrue(2 * 60 * 60 - 5 <= ttl <= 2 * 60 * 60)
+        with self.assertNumQueries(0):
+            self.assertTrue(has_premium_access(self.user))
+
+    def test_negative_answer_is_cached_briefly(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.assertFalse(has_premium_access(self.user))
+        self.assertEqual(cache_set.call_args.args[2], NEGATIVE_TTL)
+
+    def test_subscription_change_drops_cached_answer(self):
+        self.assertFalse(has_premium_access(self.user))
+        self.subscribe(ends_at=timezone.now() + timedelta(days=30))
+        self.assertTrue(has_premium_access(self.user))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.subscription.delete()
+        self.assertFalse(has_premium_access(self.user))
+
+    def test_paywall(self):
+        from news.models import Article, Category
+
+        category = Category.objects.create(name='Investigations', is_premium=True)
+        article = Article.objects.create(headline='Leak', body='Body ' * 100, category=category, author=self.user,
+                                         is_published=True, published_at=timezone.now())
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f'/api/v1/public_articles/{article.pk}/')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.data['is_premium'])
+        self.subscribe(ends_at=timezone.now() + timedelta(days=30))
+        response = client.get(f'/api/v1/public_articles/{article.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('body', response.data)
+
+
+class UserDirectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'pw')
+        cls.editor = User.objects.create_user('editor@example.com', 'pw', role='EDITOR', first_name='Ed')
+        cls.premium = User.objects.create_user('premium@example.com', 'pw', first_name='Pat')
+        cls.lapsed = User.objects.create_user('lapsed@example.com', 'pw')
+        cls.open_ended = User.objects.create_user('open@example.com', 'pw')
+        now = timezone.now()
+        Subscription.objects.create(user=cls.premium, is_active=True, ends_at=now + timedelta(days=5))
+        Subscription.objects.create(user=cls.lapsed, is_active=True, ends_at=now - timedelta(days=1))
+        Subscription.objects.create(user=cls.open_ended, is_active=True, ends_at=None)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_premium_annotation(self):
+        premium = dict(User.objects.with_premium_status().values_list('email', 'is_premium'))
+        self.assertEqual(premium, {
+            'admin@example.com': False, 'editor@example.com': False, 'premium@example.com': True,
+            'lapsed@example.com': False, 'open@example.com': True,
+        })
+
+    def test_list_in_constant_queries(self):
+        # Session/auth lookups aside, one count and one page query whatever the page holds
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/users_list/')
+        self.assertEqual(response.data['count'], 5)
+        by_email = {user['email']: user['is_premium'] for user in response.data['results']}
+        self.assertTrue(by_email['premium@example.com'])
+        self.assertFalse(by_email['lapsed@example.com'])
+
+    def test_filters(self):
+        def emails(**params):
+            return sorted(user['email'] for user in self.client.get('/api/v1/users_list/', params).data['results'])
+
+        self.assertEqual(emails(is_premium='true'), ['open@example.com', 'premium@example.com'])
+        self.assertEqual(emails(role='EDITOR'), ['editor@example.com'])
+        self.assertEqual(emails(email='laps'), ['lapsed@example.com'])
+
+    def test_csv_export(self):
+        response = self.client.get('/api/v1/users_list/export/', {'is_premium': 'true'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], EXPORT_FIELDS)
+        self.assertEqual(sorted(row[3] for row in rows[1:]), ['open@example.com', 'premium@example.com'])
+        self.assertEqual({row[-1] for row in rows[1:]}, {'True'})
+
+    def test_ndjson_export(self):
+        response = self.client.get('/api/v1/users_list/export/', {'file_format': 'ndjson', 'role': 'EDITOR'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines, [{
+            'id': self.editor.pk, 'first_name': 'Ed', 'last_name': '', 'email': 'editor@example.com',
+            'phone_number': '', 'role': 'EDITOR', 'is_active': True, 'is_premium': False,
+        }])
+
+    def test_export_rejects_unknown_format(self):
+        self.assertEqual(self.client.get('/api/v1/users_list/export/', {'file_format': 'xml'}).status_code, 400)
+
+    def test_directory_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(self.editor)
+        self.assertEqual(client.get('/api/v1/users_list/').status_code, 403)
+
+
+@override_settings(FRONTEND_URL='https://newsique.example', EMAIL_HOST_USER='billing@example.com')
+class SubscriptionJobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plan = SubscriptionPlan.objects.create(name='Monthly', price_cents=500)
+
+    def subscribe(self, email, ends_in, **fields):
+        user = User.objects.create_user(email, 'pw', first_name=email.split('@')[0].title())
+        now = timezone.now()
+        return Subscription.objects.create(
+            user=user, plan=self.plan, is_active=True, started_at=now - timedelta(days=30), ends_at=now + ends_in, **fields,
+        )
+
+    def test_expire_subscriptions(self):
+        lapsed = self.subscribe('lapsed@example.com', -timedelta(minutes=1))
+        current = self.subscribe('current@example.com', timedelta(days=1))
+        # Warm the cached entitlement so the job has something to drop
+        self.assertTrue(has_premium_access(current.user))
+        self.assertFalse(has_premium_access(lapsed.user))
+        with mock.patch('users.jobs.invalidate_entitlement') as invalidate:
+            self.assertEqual(expire_subscriptions(), {'expired': 1})
+        invalidate.assert_called_once_with(lapsed.user_id)
+        lapsed.refresh_from_db()
+        current.refresh_from_db()
+        self.assertFalse(lapsed.is_active)
+        self.assertTrue(current.is_active)
+        self.assertEqual(expire_subscriptions(), {'expired': 0})
+
+    def test_reminders_sent_once_per_term(self):
+        due = self.subscribe('due@example.com', timedelta(days=2))
+        self.subscribe('later@example.com', timedelta(days=20))
+        self.subscribe('lapsed@example.com', -timedelta(days=1))
+        self.assertEqual(send_renewal_reminders(), {'reminders_queued': 1})
+        self.assertEqual([message.to for message in mail.outbox], [['due@example.com']])
+        self.assertIn('Monthly subscription', mail.outbox[0].body)
+        self.assertIn('https://newsique.example/subscription/plan', mail.outbox[0].body)
+        self.assertEqual(send_renewal_reminders(), {'reminders_queued': 0})
+
+        # A renewal starts a new term, which gets its own reminder
+        Subscription.objects.filter(pk=due.pk).update(started_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(send_renewal_reminders(), {'reminders_queued': 1})
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(SUBSCRIPTION_REMINDER_BATCH_SIZE=2)
+    def test_reminders_are_batched(self):
+        for number in range(5):
+            self.subscribe(f'reader{number}@example.com', timedelta(days=1))
+        with mock.patch('users.jobs.send_mass_mail', wraps=mail.send_mass_mail) as send:
+            self.assertEqual(send_renewal_reminders(), {'reminders_queued': 5})
+        self.assertEqual([len(call.args[0]) for call in send.call_args_list], [2, 2, 1])
+        self.assertFalse(Subscription.objects.filter(renewal_reminder_sent_at__isnull=True).exists())
@@ -1,12 +1,68 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
+from rest_framework import status
 from users.serializers import UserListSerializer
 from users.models import User
+from users.filters import UserFilter
 from rest_framework.permissions import IsAdminUser
 # Create your views here.
 
+EXPORT_FIELDS = ['id','first_name','last_name','email','phone_number','role','is_active','is_premium']
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for streaming csv.writer output."""
+    def write(self, value):
+        return value
+
 
 class UserListView (ModelViewSet):
+    """
+    Admin directory of users.
+
+    Filters:
+    - `role`: ADMIN, EDITOR or SUBSCRIBER
+    - `is_premium`: active subscription that has not expired
+    - `is_active`, `email` (contains)
+
+    `GET export/?file_format=csv|ndjson` streams every matching user without
+    loading the table into memory.
+    """
     queryset = User.objects.all()
     serializer_class = UserListSerializer
-    permission_classes =[IsAdminUser]
\ No newline at end of file
+    permission_classes =[IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = UserFilter
+
+    def get_queryset(self):
+        return User.objects.with_premium_status().order_by('id')
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in ('csv', 'ndjson'):
+            return Response({"error": "file_format must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+        # iterator() uses a server-side cursor on PostgreSQL, so memory stays flat
+        rows = self.filter_queryset(self.get_queryset()).values_list(*EXPORT_FIELDS).iterator(chunk_size=2000)
+
+        if file_format == 'ndjson':
+            lines = (json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in rows)
+            response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        else:
+            writer = csv.writer(Echo())
+            lines = (writer.writerow(row) for row in _with_header(EXPORT_FIELDS, rows))
+            response = StreamingHttpResponse(lines, content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="users.{file_format}"'
+        return response
+
+
+def _with_header(header, rows):
+    yield header
+    yield from rows